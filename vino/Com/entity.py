@@ -0,0 +1,354 @@
+# SDL in ANL Entity Base Version 1.0
+
+"""
+Entity base class built from EntityV1Tem.
+
+The ZMQ loop never blocks inside an action: every host command is handed to a worker
+thread, and the loop keeps polling the SUB socket so Status, Cancel and Heartbeat are
+answered while a long action (a MiR mission, a UR5e program, a 48 h snapshot run) is
+still going. Only the loop thread touches the sockets; it publishes the final reply of
+an action once the worker's future is done.
+
+Commands are looked up in a dict, never walked through an if/elif chain:
+
+    @command('Home')            fixed handlers, methods returning the reply text
+    def home(self): ...
+
+    table = 'MiR250Commands.json'   rows {"GPC": "<mission id>", ...} handed to
+    def run_row(self, cmd, row):    run_row, so a new mission or .urp program is a new
+        ...                         line in the JSON file; the file is re-read when its
+                                    mtime changes, without restarting the entity
+
+Handlers raise EntityError on failure. Long waits should use self.sleep(), which returns
+early with Cancelled when the host cancels the action, and self.report(text) sends the host
+a Progress reply for the running action.
+
+Every action has its own cancel event, so with several workers a Cancel only stops what it
+names: 'Cancel' cancels every queued or running action, 'Cancel <cmd_id>' or
+'Cancel <command>' only the matching ones.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import zmq
+
+from vino.Com import protocol
+
+
+class EntityError(Exception):
+    pass
+
+
+class Cancelled(EntityError):
+    pass
+
+
+def command(name):
+    """Register the decorated Entity method as the handler for host command ``name``."""
+    def decorator(func):
+        func.command_name = name
+        return func
+    return decorator
+
+
+class CommandTable:
+    """
+    JSON object mapping command name -> row, re-read whenever the file's mtime changes.
+    A broken edit keeps the last good table so a typo never takes the entity down.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.mtime = None
+        self.rows = {}
+        self.refresh()
+
+    def refresh(self):
+        try:
+            mtime = os.stat(self.file_path).st_mtime_ns
+        except OSError as e:
+            print(f'Command table unavailable: {e}')
+            return
+        if mtime == self.mtime:
+            return
+        self.mtime = mtime
+        try:
+            with open(self.file_path, 'r') as file:
+                rows = json.load(file)
+            if not isinstance(rows, dict):
+                raise ValueError('expected a JSON object of command -> row')
+        except ValueError as e:
+            print(f'Command table {self.file_path} not loaded: {e}')
+            return
+        self.rows = rows
+        print(f'Loaded {len(rows)} commands from {self.file_path}')
+
+    def get(self, cmd):
+        self.refresh()
+        return self.rows.get(cmd)
+
+    def __contains__(self, cmd):
+        return self.get(cmd) is not None
+
+
+class Entity:
+    STATUS = 'Status'
+    CANCEL = 'Cancel'
+    HEARTBEAT = 'Heartbeat'
+
+    POLL_MS = 100
+
+    table = None  # command table file name, relative to the subclass's module
+
+    def __init__(self, name, sub_addr, sub_port, pub_addr, pub_port, max_workers=1, table=None):
+        """
+        :param max_workers: actions run at the same time, 1 keeps the old one-at-a-time order
+        :param table: command table path, overrides the class attribute
+        """
+        self.name = name
+        self.sub_addr = sub_addr
+        self.sub_port = sub_port
+        self.pub_addr = pub_addr
+        self.pub_port = pub_port
+        self.max_workers = max_workers
+        self.context = None
+        self.sub = None
+        self.pub = None
+        self.running = {}  # future -> command Message, oldest first
+        self.cancel_events = {}  # cmd_id -> cancel Event of a queued or running action
+        self.stopping = threading.Event()  # set when the loop exits, cancels every action
+        # on_cancel runs here, so an instrument that is slow to abort never stalls Status or Heartbeat
+        self.cancel_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'{name}-cancel')
+        self.cancelling = {}  # on_cancel future -> Cancel Message waiting for its reply
+        self.progress = {}  # cmd_id -> latest report() text of a running action
+        self.outbox = queue.SimpleQueue()  # (Message, text) reports waiting for the loop thread
+        self.local = threading.local()  # command Message of the action on this worker
+        self.started = time.time()
+        self.handlers = self._collect_handlers()
+        self.commands = self._open_table(table or self.table)
+
+    @classmethod
+    def _collect_handlers(cls):
+        handlers = {}
+        for klass in reversed(cls.__mro__):  # subclasses override their bases
+            for attr in vars(klass).values():
+                name = getattr(attr, 'command_name', None)
+                if name is not None:
+                    handlers[name] = attr
+        return handlers
+
+    def _open_table(self, file_path):
+        if file_path is None:
+            return None
+        if not os.path.isabs(file_path):
+            module = sys.modules[type(self).__module__]
+            base = os.path.dirname(os.path.abspath(getattr(module, '__file__', '.')))
+            file_path = os.path.join(base, file_path)
+        return CommandTable(file_path)
+
+    # --- overridables ---
+
+    def setup(self):
+        """Open instrument connections. Raise to abort start up."""
+
+    def teardown(self):
+        """Close instrument connections."""
+
+    def run_row(self, cmd, row):
+        """
+        Run a command found in the command table.
+
+        :param row: the table value for cmd, e.g. a mission id or a .urp file name
+        """
+        raise EntityError(f'{self.name} has no handler for table command {cmd}')
+
+    def execute(self, cmd):
+        """
+        Run one host command on a worker thread.
+
+        :return: reply text published with status Completed
+        :raises EntityError: published with status Error
+        """
+        handler = self.handlers.get(cmd)
+        if handler is not None:
+            return handler(self)
+        if self.commands is not None:
+            row = self.commands.get(cmd)
+            if row is not None:
+                return self.run_row(cmd, row)
+        raise EntityError(f'{self.name} Error in Host Command')
+
+    def on_cancel(self):
+        """
+        Called when the host cancels running actions, e.g. to abort the instrument. Runs on its own
+        thread, one call at a time; the host gets the Cancel reply once it returns or raises.
+        """
+
+    # --- helpers for execute ---
+
+    def _cancel_event(self):
+        """:return: cancel Event of the action on this thread, the stop event outside actions"""
+        msg = getattr(self.local, 'msg', None)
+        if msg is None:
+            return self.stopping
+        return self.cancel_events.get(msg.cmd_id, self.stopping)
+
+    @property
+    def cancelled(self):
+        return self._cancel_event().is_set()
+
+    def sleep(self, seconds):
+        """time.sleep that raises Cancelled as soon as the host cancels the action."""
+        if self._cancel_event().wait(seconds):
+            raise Cancelled(f'{self.name} Cancelled')
+
+    def report(self, text):
+        """
+        Publish a Progress reply for the action running on this thread. The text also
+        shows up in Status replies until the action finishes.
+        """
+        msg = getattr(self.local, 'msg', None)
+        if msg is None:
+            print(text)
+            return
+        self.progress[msg.cmd_id] = text
+        self.outbox.put((msg, text))
+
+    # --- loop ---
+
+    def connect(self):
+        self.context = zmq.Context()
+        self.sub = self.context.socket(zmq.SUB)
+        self.pub = self.context.socket(zmq.PUB)
+        try:
+            self.sub.connect(f"tcp://{self.sub_addr}:{self.sub_port}")
+            self.sub.setsockopt_string(zmq.SUBSCRIBE, self.name)
+            self.pub.bind(f"tcp://{self.pub_addr}:{self.pub_port}")
+            self.setup()
+            print(f"{self.name} Connected to the Host")
+            return True
+        except (zmq.ZMQError, OSError) as e:
+            self.close()
+            print(f"{self.name} Connection Fail: {e}")
+            return False
+
+    def close(self):
+        self.teardown()
+        self.sub.close()
+        self.pub.close()
+        self.context.term()
+
+    def status(self):
+        if not self.running:
+            return f'{self.name} Ready'
+        now = time.time()
+        actions = ', '.join(f'{msg.cmd} ({now - msg.started_at:.0f}s{self._progress_text(msg)})'
+                            if future.running() else f'{msg.cmd} (queued)'
+                            for future, msg in self.running.items())
+        return f'{self.name} Busy: {actions}'
+
+    def _progress_text(self, msg):
+        text = self.progress.get(msg.cmd_id)
+        return f': {text}' if text else ''
+
+    def _run_action(self, msg):
+        if self.cancel_events[msg.cmd_id].is_set():  # cancelled while queued
+            raise Cancelled(f'{self.name} Cancelled')
+        msg.started_at = time.time()
+        self.local.msg = msg
+        try:
+            return self.execute(msg.cmd)
+        finally:
+            self.local.msg = None
+
+    def _publish_progress(self):
+        while True:
+            try:
+                msg, text = self.outbox.get_nowait()
+            except queue.Empty:
+                return
+            self.pub.send_multipart(msg.reply(protocol.PROGRESS, text))
+            print(text)
+
+    def _publish_done(self):
+        for future in [future for future in self.running if future.done()]:
+            msg = self.running.pop(future)
+            self.progress.pop(msg.cmd_id, None)
+            self.cancel_events.pop(msg.cmd_id, None)
+            try:
+                detail = future.result()
+                self.pub.send_multipart(msg.reply(protocol.COMPLETED, detail))
+                print(f'{detail}\n')
+            except Exception as e:
+                self.pub.send_multipart(msg.reply(protocol.ERROR, str(e) or repr(e)))
+                print(f'{self.name} {msg.cmd} failed: {e!r}\n')
+
+    def _publish_cancelled(self):
+        for future in [future for future in self.cancelling if future.done()]:
+            msg = self.cancelling.pop(future)
+            try:
+                future.result()
+                self.pub.send_multipart(msg.reply(protocol.COMPLETED, f'{self.name} Cancel Requested'))
+            except Exception as e:
+                self.pub.send_multipart(msg.reply(protocol.ERROR, f'{self.name} Cancel Failed: {e}'))
+
+    def _handle(self, msg, pool):
+        if msg.cmd == self.HEARTBEAT:
+            self.pub.send_multipart(msg.reply(protocol.COMPLETED, f'{self.name} Alive {time.time() - self.started:.0f}s'))
+        elif msg.cmd == self.STATUS:
+            self.pub.send_multipart(msg.reply(protocol.COMPLETED, self.status()))
+        elif (msg.cmd or '').split(' ', 1)[0] == self.CANCEL:
+            targets = self._cancel_targets(msg.cmd[len(self.CANCEL):].strip())
+            if targets:
+                for target in targets.values():
+                    self.cancel_events[target.cmd_id].set()
+                if any(future.running() for future in targets):  # queued ones never reach the instrument
+                    self.cancelling[self.cancel_pool.submit(self.on_cancel)] = msg
+                else:
+                    self.pub.send_multipart(msg.reply(protocol.COMPLETED, f'{self.name} Cancel Requested'))
+            else:
+                self.pub.send_multipart(msg.reply(protocol.COMPLETED, f'{self.name} Nothing to Cancel'))
+        else:
+            if msg.cmd_id is None:  # plain string host, give the action an id of its own
+                msg.cmd_id = uuid.uuid4().hex
+            self.cancel_events[msg.cmd_id] = threading.Event()
+            self.pub.send_multipart(msg.reply(protocol.ACCEPTED))
+            self.running[pool.submit(self._run_action, msg)] = msg
+
+    def _cancel_targets(self, target):
+        """:return: {future: command Message} of the actions a Cancel names, all of them if target is empty"""
+        return {future: msg for future, msg in self.running.items()
+                if not target or target in (msg.cmd_id, msg.cmd)}
+
+    def run(self):
+        print(f"{self.name} Start")
+        if not self.connect():
+            return
+        poller = zmq.Poller()
+        poller.register(self.sub, zmq.POLLIN)
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while True:
+                if poller.poll(self.POLL_MS):
+                    msg = protocol.parse_command(self.sub.recv_multipart())
+                    print(msg.entity, msg.cmd)
+                    self._handle(msg, pool)
+                self._publish_progress()
+                self._publish_done()
+                self._publish_cancelled()
+        except KeyboardInterrupt:
+            print(f"{self.name} Stop")
+        finally:
+            self.stopping.set()
+            for event in list(self.cancel_events.values()):
+                event.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+            self.cancel_pool.shutdown(wait=True)
+            self.close()
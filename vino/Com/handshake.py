@@ -0,0 +1,175 @@
+# SDL in ANL File Handshake Version 1.0
+
+"""
+Token file handshake with instruments that are driven by their own software (ChemSpeed).
+
+The entity drops <start_dir>/<token>.txt, the instrument picks the job up and writes
+<finished_dir>/<token>.txt when it is done. Each Job records how long it took. Jobs can
+use their own tokens, so several can be queued at once, only if the instrument is told which
+token to answer; ChemSpeed's .bat applications wait for one fixed name.
+
+Finished tokens are noticed through OS file-change notifications when the optional
+watchdog package is installed, otherwise (and as a slow safety net) by listing the
+finished folder, one listing for all waiting jobs.
+"""
+
+import os
+import time
+import itertools
+import threading
+
+try:
+    from watchdog.observers import Observer
+except ModuleNotFoundError:
+    Observer = None
+
+
+class HandshakeTimeout(Exception):
+    pass
+
+
+class Job:
+
+    def __init__(self, token, start_file, finished_file):
+        self.token = token
+        self.start_file = start_file
+        self.finished_file = finished_file
+        self.submitted = time.time()
+        self.finished = None
+        self.event = threading.Event()
+
+    def __repr__(self):
+        return f'Job({self.token!r})'
+
+    @property
+    def elapsed(self):
+        end = self.finished if self.finished is not None else time.time()
+        return end - self.submitted
+
+
+class _Notify:
+    # watchdog only needs an object with dispatch(event)
+
+    def __init__(self, handshake):
+        self.handshake = handshake
+
+    def dispatch(self, event):
+        if event.event_type in ('created', 'moved', 'modified'):
+            self.handshake._seen(os.path.basename(getattr(event, 'dest_path', '') or event.src_path))
+
+
+class FileHandshake:
+
+    def __init__(self, start_dir, finished_dir, poll=0.2, safety_poll=5.0, notify=True):
+        """
+        :param poll: folder listing interval when no notifications are available
+        :param safety_poll: listing interval next to notifications, in case one is missed
+        :param notify: use watchdog notifications if the package is installed
+        """
+        self.start_dir = start_dir
+        self.finished_dir = finished_dir
+        self.notify = notify and Observer is not None
+        self.poll = safety_poll if self.notify else poll
+        self.lock = threading.Lock()
+        self.pending = {}  # finished file name -> Job
+        self.counter = itertools.count(1)
+        self.observer = None
+        self.thread = None
+
+    def _start(self):
+        if self.thread is not None:
+            return
+        if self.notify:
+            self.observer = Observer()
+            self.observer.schedule(_Notify(self), self.finished_dir, recursive=False)
+            self.observer.daemon = True
+            self.observer.start()
+        self.thread = threading.Thread(target=self._poll, daemon=True)
+        self.thread.start()
+
+    def _seen(self, name):
+        with self.lock:
+            job = self.pending.pop(name, None)
+        if job is not None:
+            job.finished = time.time()
+            job.event.set()
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll)
+            with self.lock:
+                if not self.pending:
+                    continue
+            try:
+                names = os.listdir(self.finished_dir)
+            except OSError as e:
+                print(f'Handshake cannot list {self.finished_dir}: {e}')
+                continue
+            for name in names:
+                self._seen(name)
+
+    def submit(self, token=None):
+        """
+        Hand a job to the instrument.
+
+        :param token: token file name without .txt, None picks a unique one
+        :return: Job to pass to wait()
+        """
+        if token is None:
+            token = f'{time.strftime("%Y%m%d%H%M%S")}_{next(self.counter)}'
+        name = f'{token}.txt'
+        job = Job(token, os.path.join(self.start_dir, name), os.path.join(self.finished_dir, name))
+        self._start()
+        with self.lock:
+            if name in self.pending:
+                raise FileExistsError(f'Job {token} is already waiting')
+            self.pending[name] = job
+        if os.path.exists(job.finished_file):  # stale token from an earlier run
+            os.remove(job.finished_file)
+        try:
+            fp = open(job.start_file, 'x')
+            fp.close()
+        except OSError:
+            with self.lock:
+                self.pending.pop(name, None)
+            raise
+        return job
+
+    def wait(self, job, timeout=None, check=None):
+        """
+        Block until the instrument writes the job's finished token, then remove the token.
+
+        :param check: called about twice a second while waiting, may raise to give up
+        :return: seconds from submit to finished
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        try:
+            while not job.event.wait(0.5):
+                if check is not None:
+                    check()
+                if deadline is not None and time.time() > deadline:
+                    raise HandshakeTimeout(f'Job {job.token} not finished after {timeout}s')
+        except BaseException:
+            with self.lock:
+                self.pending.pop(os.path.basename(job.finished_file), None)
+            raise
+        self._remove(job.finished_file)
+        return job.elapsed
+
+    @staticmethod
+    def _remove(file_path, attempts=50):
+        # the writer may still hold the file open for a moment (Windows)
+        for _ in range(attempts):
+            try:
+                os.remove(file_path)
+                return
+            except FileNotFoundError:
+                return
+            except PermissionError:
+                time.sleep(0.02)
+        os.remove(file_path)
+
+    def close(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer = None
@@ -0,0 +1,136 @@
+# SDL in ANL Host Link Version 1.0
+
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import zmq
+
+from vino.Com import protocol
+
+
+class HostLink:
+    """
+    Owns the host PUB/SUB pair. Every command goes out with its own cmd_id and a Future;
+    a background thread reads the entity replies and resolves the matching Future, so any
+    number of commands can be in flight across entities at once.
+    """
+
+    POLL_MS = 100
+    REPLY_TIMEOUT = 3600  # seconds send_and_wait waits for the final reply by default
+
+    def __init__(self, pub, sub, on_message=None, log=print):
+        """
+        :param pub: bound PUB socket commands are sent on
+        :param sub: SUB socket connected to every entity
+        :param on_message: optional callback(Message) run on the receive thread for every reply
+        """
+        self.pub = pub
+        self.sub = sub
+        self.on_message = on_message
+        self.log = log
+        self._send_lock = threading.Lock()  # zmq sockets are not thread safe
+        self._lock = threading.Lock()
+        self._pending = {}  # cmd_id -> (Message, Future)
+        self._legacy = {}  # entity -> deque of cmd_ids, oldest first, for replies without an id
+        self._running = True
+        self._thread = threading.Thread(target=self._receive, daemon=True)
+        self._thread.start()
+
+    def _match_legacy(self, reply):
+        # old entities answer with a plain string that starts with the entity name
+        if reply.entity is None:
+            names = [name for name, ids in self._legacy.items() if ids and reply.detail.startswith(name)]
+            if not names:
+                return None
+            reply.entity = max(names, key=len)
+        ids = self._legacy.get(reply.entity)
+        return ids[0] if ids else None
+
+    def _resolve(self, reply):
+        with self._lock:
+            cmd_id = reply.cmd_id
+            if cmd_id is None and reply.is_final:
+                cmd_id = self._match_legacy(reply)
+            if cmd_id not in self._pending:
+                return
+            command, future = self._pending[cmd_id]
+            if reply.entity is None:
+                reply.entity = command.entity
+            if not reply.is_final:
+                return
+            del self._pending[cmd_id]
+            ids = self._legacy.get(command.entity)
+            if ids and cmd_id in ids:
+                ids.remove(cmd_id)
+        reply.cmd_id = cmd_id
+        reply.cmd = reply.cmd or command.cmd
+        future.set_result(reply)
+
+    def _receive(self):
+        poller = zmq.Poller()
+        poller.register(self.sub, zmq.POLLIN)
+        while self._running:
+            try:
+                if not poller.poll(self.POLL_MS):
+                    continue
+                reply = protocol.parse_reply(self.sub.recv_multipart())
+            except zmq.ZMQError as e:
+                self.log(f'HostLink receive error: {e}')
+                break
+            self._resolve(reply)
+            if self.on_message is not None:
+                self.on_message(reply)
+        self.sub.close()
+
+    def submit(self, entity, cmd):
+        """
+        :return: Future resolved with the entity's final reply Message
+        """
+        command = protocol.Message.command(entity, cmd)
+        future = Future()
+        with self._lock:
+            self._pending[command.cmd_id] = (command, future)
+            self._legacy.setdefault(entity, deque()).append(command.cmd_id)
+        with self._send_lock:
+            self.pub.send_multipart(command.to_frames())
+        return future
+
+    def send_and_wait(self, entity, cmd, timeout=REPLY_TIMEOUT):
+        """
+        :param timeout: seconds, None waits forever
+        :return: final reply Message, or None on timeout; a reply arriving later is dropped
+        """
+        future = self.submit(entity, cmd)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            self.discard(future)
+            return None
+
+    def discard(self, future):
+        """Stop waiting for the reply of a submitted command, e.g. after a timeout."""
+        with self._lock:
+            for cmd_id, (command, pending) in list(self._pending.items()):
+                if pending is future:
+                    del self._pending[cmd_id]
+                    ids = self._legacy.get(command.entity)
+                    if ids and cmd_id in ids:
+                        ids.remove(cmd_id)
+                    future.cancel()  # under the lock, _resolve can no longer be setting its result
+                    return
+
+    @property
+    def in_flight(self):
+        with self._lock:
+            return [command for command, _ in self._pending.values()]
+
+    def close(self):
+        self._running = False
+        self._thread.join()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for command, future in pending.values():
+            future.cancel()
+        with self._send_lock:
+            self.pub.close()
@@ -0,0 +1,127 @@
+# SDL in ANL Host/Entity Message Protocol Version 1.0
+
+"""
+Every message is a two frame ZMQ multipart: [entity name, JSON envelope].
+
+The host sends a command envelope carrying a fresh cmd_id. The entity answers with the
+same cmd_id, first with status Accepted when it picks the command up, optionally with
+Progress updates while it runs, then with a final Completed or Error, so the host can keep
+many commands in flight and still match every reply to the command that caused it.
+
+Plain-string frames from entities that have not been updated yet are still understood.
+"""
+
+import json
+import time
+import uuid
+
+ACCEPTED = 'Accepted'
+PROGRESS = 'Progress'
+COMPLETED = 'Completed'
+ERROR = 'Error'
+FINAL = (COMPLETED, ERROR)
+
+
+class Message:
+
+    def __init__(self, entity, cmd, cmd_id=None, status=None, detail='',
+                 sent_at=None, started_at=None, finished_at=None):
+        self.entity = entity
+        self.cmd = cmd
+        self.cmd_id = cmd_id
+        self.status = status
+        self.detail = detail
+        self.sent_at = sent_at  # host clock
+        self.started_at = started_at  # entity clock
+        self.finished_at = finished_at  # entity clock
+
+    def __repr__(self):
+        return f'Message({self.entity!r}, {self.cmd!r}, id={self.cmd_id}, status={self.status})'
+
+    @property
+    def is_final(self):
+        return self.status in FINAL
+
+    @property
+    def elapsed(self):
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    @classmethod
+    def command(cls, entity, cmd):
+        return cls(entity, cmd, cmd_id=uuid.uuid4().hex, sent_at=time.time())
+
+    def as_dict(self):
+        return {
+            'cmd_id': self.cmd_id,
+            'entity': self.entity,
+            'cmd': self.cmd,
+            'status': self.status,
+            'detail': self.detail,
+            'sent_at': self.sent_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+    def to_frames(self):
+        return [self.entity.encode(), json.dumps(self.as_dict()).encode()]
+
+    def reply(self, status, detail=''):
+        """
+        Build the entity's answer to this command.
+
+        :param str status: ACCEPTED, PROGRESS, COMPLETED or ERROR
+        :param str detail: human readable text, e.g. 'MiR250: To GPC Completed'
+        :return: multipart frames ready for pub.send_multipart
+        """
+        if self.started_at is None:
+            self.started_at = time.time()
+        finished_at = time.time() if status in FINAL else None
+        reply = Message(self.entity, self.cmd, cmd_id=self.cmd_id, status=status, detail=detail,
+                        sent_at=self.sent_at, started_at=self.started_at, finished_at=finished_at)
+        return reply.to_frames()
+
+
+def _load_envelope(frame):
+    try:
+        envelope = json.loads(frame.decode())
+    except (UnicodeDecodeError, ValueError):
+        return None
+    return envelope if isinstance(envelope, dict) else None
+
+
+def parse_command(frames):
+    """
+    Entity side: turn the frames received on the SUB socket into a Message.
+    """
+    topic, payload = frames[0].decode(), frames[-1]
+    envelope = _load_envelope(payload)
+    if envelope is None:  # plain 'entity;cmd' sender
+        return Message(topic, payload.decode(), started_at=time.time())
+    return Message(envelope.get('entity', topic), envelope.get('cmd'), cmd_id=envelope.get('cmd_id'),
+                   sent_at=envelope.get('sent_at'), started_at=time.time())
+
+
+def parse_reply(frames):
+    """
+    Host side: turn the frames published by an entity into a Message.
+
+    Legacy single frame strings come back with entity None and the text in detail; their
+    status is guessed from the text the old entity loops used to send.
+    """
+    envelope = _load_envelope(frames[-1])
+    if envelope is None:
+        text = frames[-1].decode(errors='replace').strip()
+        entity = frames[0].decode() if len(frames) > 1 else None
+        if COMPLETED in text:
+            status = COMPLETED
+        elif ERROR in text:
+            status = ERROR
+        else:
+            status = None  # e.g. a bare 'Ready'/'Executing' state frame
+        return Message(entity, None, status=status, detail=text)
+    return Message(envelope.get('entity'), envelope.get('cmd'), cmd_id=envelope.get('cmd_id'),
+                   status=envelope.get('status'), detail=envelope.get('detail', ''),
+                   sent_at=envelope.get('sent_at'), started_at=envelope.get('started_at'),
+                   finished_at=envelope.get('finished_at'))
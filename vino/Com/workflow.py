@@ -0,0 +1,236 @@
+# SDL in ANL Workflow DAG Executor Version 1.0
+
+"""
+Workflow files hold one step per line. Two line formats are accepted:
+
+    entity;command                       legacy step, runs after the previous line
+    @step_id;entity;command;dep1,dep2    step that runs once all listed steps completed
+
+Blank lines and lines starting with '#' are ignored, as are trailing empty fields
+(`entity;command;` is a legacy step). A file that only holds legacy lines therefore
+loads as a linear chain, exactly as the old line-by-line runner did. Legacy steps get
+numeric ids past the highest numeric id used in the file.
+
+Example (MiR250 and ChemSpeed work in parallel, UR5e waits for both):
+
+    @drive;MiR250;ChemSpeed;
+    @prep;ChemSpeed;SimDemo;
+    @load;UR5e;LoadVial2ChemS;drive,prep
+"""
+
+import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class WorkflowError(Exception):
+    pass
+
+
+class Step:
+    PENDING = 'Pending'
+    RUNNING = 'Running'
+    COMPLETED = 'Completed'
+    FAILED = 'Failed'
+    SKIPPED = 'Skipped'
+
+    def __init__(self, step_id, entity, cmd, after=()):
+        self.step_id = str(step_id)
+        self.entity = entity
+        self.cmd = cmd
+        self.after = tuple(str(dep) for dep in after)
+        self.state = self.PENDING
+        self.started = None
+        self.finished = None
+
+    def __repr__(self):
+        return f'{self.step_id}:{self.entity};{self.cmd}'
+
+    @property
+    def elapsed(self):
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+
+class Workflow:
+
+    def __init__(self):
+        self.steps = {}  # step_id -> Step, kept in file order
+
+    def __iter__(self):
+        return iter(self.steps.values())
+
+    def __len__(self):
+        return len(self.steps)
+
+    def add_step(self, step_id, entity, cmd, after=()):
+        step = Step(step_id, entity, cmd, after)
+        if step.step_id in self.steps:
+            raise WorkflowError(f'Duplicate step id {step.step_id}')
+        self.steps[step.step_id] = step
+        return step
+
+    @classmethod
+    def linear(cls, commands):
+        """
+        :param commands: iterable of (entity, cmd) pairs
+        :return: Workflow where every step depends on the previous one
+        """
+        workflow = cls()
+        prev = None
+        for i, (entity, cmd) in enumerate(commands, start=1):
+            prev = workflow.add_step(i, entity, cmd, after=() if prev is None else (prev.step_id,))
+        return workflow
+
+    @classmethod
+    def parse(cls, lines):
+        records = []  # (step_id or None for legacy, entity, cmd, after or None for legacy)
+        for line_n, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            explicit = line.startswith('@')
+            parts = [part.strip() for part in line.lstrip('@').split(';')]
+            while parts and not parts[-1]:
+                parts.pop()
+            if explicit and len(parts) in (3, 4) and all(parts[:3]):
+                deps = parts[3] if len(parts) == 4 else ''
+                records.append((parts[0], parts[1], parts[2], [dep.strip() for dep in deps.split(',') if dep.strip()]))
+            elif not explicit and len(parts) == 2 and all(parts):
+                records.append((None, parts[0], parts[1], None))
+            else:
+                raise WorkflowError(f'Line {line_n}: expected entity;command or @id;entity;command;deps, '
+                                    f'got {line!r}')
+
+        # legacy ids count on from the highest numeric id, so they never collide with explicit ones
+        used = {record[0] for record in records if record[0] is not None}
+        next_id = max((int(step_id) for step_id in used if step_id.isdigit()), default=0) + 1
+        workflow = cls()
+        prev = None
+        for step_id, entity, cmd, after in records:
+            if step_id is None:
+                while str(next_id) in used:
+                    next_id += 1
+                step_id = next_id
+                next_id += 1
+                after = () if prev is None else (prev.step_id,)
+            prev = workflow.add_step(step_id, entity, cmd, after)
+        workflow.validate()
+        return workflow
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, 'r') as file:
+            return cls.parse(file)
+
+    def validate(self):
+        for step in self:
+            for dep in step.after:
+                if dep not in self.steps:
+                    raise WorkflowError(f'Step {step.step_id} depends on unknown step {dep}')
+        # Kahn's algorithm, anything left over sits on a cycle
+        indegree = {step_id: len(step.after) for step_id, step in self.steps.items()}
+        children = {step_id: [] for step_id in self.steps}
+        for step in self:
+            for dep in step.after:
+                children[dep].append(step.step_id)
+        ready = [step_id for step_id, n in indegree.items() if n == 0]
+        visited = 0
+        while ready:
+            step_id = ready.pop()
+            visited += 1
+            for child in children[step_id]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+        if visited != len(self.steps):
+            cyclic = [step_id for step_id, n in indegree.items() if n > 0]
+            raise WorkflowError(f'Dependency cycle between steps {cyclic}')
+
+
+def timestamp():
+    return datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y')
+
+
+class WorkflowExecutor:
+    """
+    Runs every step whose dependencies have completed, at most one step per entity at a time.
+
+    dispatch(step) runs a single step to completion and returns True on success. Steps for
+    entities listed in ``inline`` (e.g. 'Host' pop-ups) are dispatched on the calling thread,
+    everything else on a worker thread so independent entities work concurrently.
+    """
+
+    def __init__(self, workflow, dispatch, inline=('Host',), max_workers=None, stop_on_failure=True, log=print):
+        self.workflow = workflow
+        self.dispatch = dispatch
+        self.inline = set(inline)
+        self.max_workers = max_workers
+        self.stop_on_failure = stop_on_failure
+        self.log = log
+        self.busy = set()  # entities with a step in flight
+
+    def _ready_steps(self):
+        for step in self.workflow:
+            if step.state != Step.PENDING or step.entity in self.busy:
+                continue
+            dep_states = [self.workflow.steps[dep].state for dep in step.after]
+            if all(state == Step.COMPLETED for state in dep_states):
+                yield step
+
+    def _run_step(self, step):
+        step.started = time.time()
+        try:
+            ok = bool(self.dispatch(step))
+        except Exception as e:
+            self.log(f'Step {step} raised {e!r}', timestamp(), '\n')
+            ok = False
+        step.finished = time.time()
+        return ok
+
+    def _finish(self, step, ok):
+        self.busy.discard(step.entity)
+        step.state = Step.COMPLETED if ok else Step.FAILED
+        self.log(f'Step {step} {step.state} in {step.elapsed:.1f}s', timestamp(), '\n')
+        return ok
+
+    def run(self):
+        """
+        :return: True if every step completed
+        """
+        failed = False
+        running = {}  # future -> step
+        max_workers = self.max_workers or max(1, len({step.entity for step in self.workflow}))
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while True:
+                if not failed:
+                    for step in list(self._ready_steps()):
+                        if step.entity in self.busy:
+                            continue  # an earlier ready step took this entity
+                        step.state = Step.RUNNING
+                        self.busy.add(step.entity)
+                        if step.entity in self.inline:
+                            if not self._finish(step, self._run_step(step)) and self.stop_on_failure:
+                                failed = True
+                                break
+                        else:
+                            running[pool.submit(self._run_step, step)] = step
+                    if not failed and any(True for _ in self._ready_steps()):
+                        continue  # an inline step unblocked more work
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if not self._finish(running.pop(future), future.result()) and self.stop_on_failure:
+                        failed = True
+
+        for step in self.workflow:
+            if step.state == Step.PENDING:
+                step.state = Step.SKIPPED
+        completed = all(step.state == Step.COMPLETED for step in self.workflow)
+        self.log(f'Workflow {"completed" if completed else "stopped"} in {time.time() - start:.1f}s',
+                 timestamp(), '\n')
+        return completed
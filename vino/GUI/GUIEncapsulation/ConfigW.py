@@ -2,6 +2,7 @@ import PySimpleGUI as sg
 import sys
 import zmq
 import glv
+from vino.Com.host import HostLink
 
 
 def configuration():
@@ -93,6 +94,7 @@ def init():
     glv.g_host_sub.connect(f"tcp://{glv.N92_ip}:{glv.N92_port}")
     
     glv.g_host_sub.setsockopt_string(zmq.SUBSCRIBE, '')
+    glv.g_host_link = HostLink(glv.g_host_pub, glv.g_host_sub)
 
     print('server initialization done')
     
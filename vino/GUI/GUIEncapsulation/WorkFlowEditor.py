@@ -2,6 +2,8 @@ import PySimpleGUI as sg
 import glv
 import time
 import datetime
+from vino.Com import protocol
+from vino.Com.workflow import Workflow, WorkflowError, WorkflowExecutor
 
 import shutil
 import os
@@ -95,6 +97,58 @@ def make_window(theme):
     return window_WFNEW
 
 
+def now():
+    return datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y')
+
+
+def run_step(step):
+    name = step.entity
+    msg = step.cmd
+
+    if name == 'Host':
+        if msg == 'PauseToRefill':
+            refill = sg.popup_ok_cancel('Do you finish the refill work?', 'Press Ok to proceed',
+                                        'Press cancel to stop', title='OkCancel')
+            if refill == 'OK':
+                print('Refill work done and continue', now(), '\n')
+                return True
+            print('Refill work not finished has to stop, stop in 3 sec', now(), '\n')
+            time.sleep(3)
+            return False
+
+        elif msg == 'SafetyCheck':
+            safetycheck = sg.popup_ok_cancel('Do you finish the safety check work?', 'Press Ok to proceed',
+                                             'Press cancel to stop', title='OkCancel')
+            if safetycheck == 'OK':
+                print('Safety check work done and continue', now(), '\n')
+                return True
+            print('Safety issues found, stop in 3 sec', now(), '\n')
+            time.sleep(3)
+            return False
+
+        elif msg == 'Wait':
+            # time.sleep(2*60*60)
+            print('Host Wait now', now(), '\n')
+            time.sleep(3)
+            print('Host Wait Finished', now(), '\n')
+            return True
+
+        print('CMD for Host incorrect, will exit', now(), '\n')
+        return False
+
+    reply = glv.g_host_link.send_and_wait(name, msg, timeout=glv.g_host_link.REPLY_TIMEOUT)
+    if reply is None:
+        print(f'{name} did not reply to {msg} in {glv.g_host_link.REPLY_TIMEOUT}s', now(), '\n')
+        return False
+    print(reply.detail, now(), '\n')
+    return reply.status == protocol.COMPLETED
+
+
+def run_workflow(wf):
+    # steps on independent entities run concurrently, Host steps stay on the GUI thread
+    return WorkflowExecutor(wf, run_step).run()
+
+
 def workflow():
     window = make_window(sg.theme('Lightgreen'))
 
@@ -103,72 +157,13 @@ def workflow():
         if event == "Exit" or event == 'Exit ' or event == sg.WIN_CLOSED:
             break
         elif event == 'Online_Edit_Done':
+            commands = []
             i = 0
-            while True:
-                name = values[i]
-                if len(name) == 0:
-                    time.sleep(1)
-                    break
-                msg = values[i + 1]
- 
-                if name == 'Host':
-                    if msg == 'PauseToRefill':
-                        refill = sg.popup_ok_cancel('Do you finish the refill work?', 'Press Ok to proceed',
-                                                    'Press cancel to stop', title='OkCancel')
-                        if refill == 'OK':
-
-                            print('Refill work done and continue',
-                                  datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                            i += 2
-                        elif refill == 'Cancel':
-
-                            print('Refill work not finished has to stop, stop in 3 sec',
-                                  datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                            time.sleep(3)
-                            break
-
-                    elif msg == 'SafetyCheck':
-                        safetycheck = sg.popup_ok_cancel('Do you finish the safety check work?', 'Press Ok to proceed',
-                                                         'Press cancel to stop', title='OkCancel')
-                        if safetycheck == 'OK':
-
-                            print('Safety check work done and continue',
-                                  datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                            i += 2
-                        elif safetycheck == 'Cancel':
-
-                            print('Safety issues found, stop in 3 sec',
-                                  datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                            time.sleep(3)
-                            break
-
-                    elif msg == 'Wait':
-                        # time.sleep(2*60*60)
-                        print('Host Wait now',
-                              datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                        time.sleep(3)
-                        print('Host Wait Finished',
-                              datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                        i += 2
-                    else:
-                        print('CMD for Host incorrect, will exit',
-                              datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                        break
-
-                else:
-                    glv.g_host_pub.send_multipart([name.encode(), msg.encode()])
-                    feedback = glv.g_host_sub.recv_string()
-                    if 'Completed' in feedback:
-                        time.sleep(1)
-                        print(feedback,
-                              datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                        i += 2
-                    else:
-                        time.sleep(1)
-                        print(feedback,
-                              datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                        break
-        
+            while values.get(i):
+                commands.append((values[i], values[i + 1]))
+                i += 2
+            run_workflow(Workflow.linear(commands))
+
         elif event == 'Upload_to_ChemSpeed':
             print('Going to upload the predefined Config to ChemSpeed!',
                   datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
@@ -205,70 +200,12 @@ def workflow():
             Predefined_WF = sg.popup_get_file('Choose your file', keep_on_top=True)
             sg.popup("You chose: " + str(Predefined_WF), keep_on_top=True)
 
-            with open(Predefined_WF, 'r') as file:
-                for line in file:
-                    parts = line.split(';')
-                    if len(parts) >= 2:
-                        name = parts[0]
-                        msg = parts[1].rstrip("\n")
-                    else:
-                        print('CMD error',
-                              datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                        break
-
-                    if name == 'Host':
-                        if msg == 'PauseToRefill':
-                            refill = sg.popup_ok_cancel('Do you finish the refill work?', 'Press Ok to proceed',
-                                                        'Press cancel to stop', title='OkCancel')
-                            if refill == 'OK':
-
-                                print('Refill work done and continue',
-                                      datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                            elif refill == 'Cancel':
-
-                                print('Refill work not finished has to stop, stop in 3 sec',
-                                      datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                                time.sleep(3)
-                                break
-
-                        elif msg == 'SafetyCheck':
-                            safetycheck = sg.popup_ok_cancel('Do you finish the safety check work?', 'Press Ok to proceed',
-                                                        'Press cancel to stop', title='OkCancel')
-                            if safetycheck == 'OK':
-
-                                print('Safety check work done and continue',
-                                      datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                            elif safetycheck == 'Cancel':
-
-                                print('Safety issues found, stop in 3 sec',
-                                      datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                                time.sleep(3)
-                                break
-
-                        elif msg == 'Wait':
-                            # time.sleep(2*60*60)
-                            print('Host Wait now',
-                                  datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                            time.sleep(3)
-                            print('Host Wait Finished',
-                                  datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                        else:
-                            print('CMD for Host incorrect, will exit',
-                                  datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                            break
-
-                    else:
-                        glv.g_host_pub.send_multipart([name.encode(), msg.encode()])
-                        feedback = glv.g_host_sub.recv_string()
-                        if 'Completed' in feedback:
-                            time.sleep(1)
-                            print(feedback,
-                                  datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                        else:
-                            time.sleep(1)
-                            print(feedback,
-                                  datetime.datetime.now().strftime('%H:%M:%S %d-%m-%Y'), '\n')
-                            break
+            try:
+                wf = Workflow.load(Predefined_WF)
+            except WorkflowError as e:
+                print('CMD error', e, now(), '\n')
+            else:
+                run_workflow(wf)
 
         elif event == 'Test Progress bar':
             print("[LOG] Clicked Test Progress Bar!")
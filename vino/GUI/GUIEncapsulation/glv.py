@@ -30,3 +30,4 @@ N92_port = None
 context = None
 g_host_pub = None
 g_host_sub = None
+g_host_link = None
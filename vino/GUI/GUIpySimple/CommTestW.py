@@ -24,10 +24,11 @@ def communication():
         topic = values[0]
         msg = values[1]
 
-        glv.g_host_pub.send_multipart([topic.encode(), msg.encode()])
-
-        feedback = glv.g_host_sub.recv_string()
-        sg.Popup('Entity:', topic, 'Message received:', feedback)
+        reply = glv.g_host_link.send_and_wait(topic, msg, timeout=glv.g_host_link.REPLY_TIMEOUT)
+        if reply is None:
+            sg.Popup('Entity:', topic, f'No reply in {glv.g_host_link.REPLY_TIMEOUT}s')
+            continue
+        sg.Popup('Entity:', topic, 'Message received:', reply.detail, 'Status:', reply.status)
     window_Smsg.close()
     
 if __name__ == '__main__':
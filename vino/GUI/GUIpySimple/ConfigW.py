@@ -4,6 +4,7 @@ import sys
 import socket
 import zmq
 import glv
+from vino.Com.host import HostLink
 import time
 
 
@@ -46,6 +47,7 @@ def init():
     glv.g_host_sub.connect("tcp://192.168.12.248:11110")  # TestPC Calculator
     #glv.g_host_sub.connect("tcp://192.168.12.250:56686")  # Unknow 2
     glv.g_host_sub.setsockopt_string(zmq.SUBSCRIBE, '')
+    glv.g_host_link = HostLink(glv.g_host_pub, glv.g_host_sub)
 
     # 4 Bat part
     # glv.g_socket_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
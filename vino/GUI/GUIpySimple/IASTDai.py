@@ -30,8 +30,7 @@ def main():
     while True:
         event, values = window_main.read()
         if event == sg.WIN_CLOSED or event == 'Exit':          
-            glv.g_host_pub.close()
-            glv.g_host_sub.close()
+            glv.g_host_link.close()
             glv.context.term()
 
             break
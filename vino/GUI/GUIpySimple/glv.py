@@ -10,3 +10,4 @@ g_conn_poolkukabatinfos = []
 context = None
 g_host_pub = None
 g_host_sub = None
+g_host_link = None
@@ -5,6 +5,8 @@ import time
 import zmq
 import os
 
+from vino.Com import protocol
+
 def start_entity_ChemSpeed(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
     print(f"{Entity_name} Start")
 
@@ -25,9 +27,10 @@ def start_entity_ChemSpeed(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
         return
 
     while True:
-        topic, cmd = sub.recv_multipart()
-        print(topic.decode(), cmd.decode())
-        cmd = cmd.decode()
+        msg = protocol.parse_command(sub.recv_multipart())
+        print(msg.entity, msg.cmd)
+        cmd = msg.cmd
+        pub.send_multipart(msg.reply(protocol.ACCEPTED))
         if cmd == 'SimDemo':
             
             app_dir = r'C:\Users\Operator\Desktop\AutoWF\ChemBat\SimChemTDai.bat'
@@ -44,7 +47,7 @@ def start_entity_ChemSpeed(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
                     #print('Busy')
             os.remove(r'C:\Users\Operator\Desktop\AutoWF\finished\1.txt')
             
-            pub.send_string(f'{Entity_name} SimulationDemo Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} SimulationDemo Completed'))
             print(f'{Entity_name} SimulationDemo Completed\n')
         elif cmd == 'CapDemo':
             
@@ -62,13 +65,13 @@ def start_entity_ChemSpeed(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
                     #print('Busy')
             os.remove(r'C:\Users\Operator\Desktop\AutoWF\finished\1.txt')
             
-            pub.send_string(f'{Entity_name} CappingDemo Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} CappingDemo Completed'))
             print(f'{Entity_name} CappingDemo Completed\n')
         elif cmd == '3':
-            pub.send_string(f'{Entity_name} 3 Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} 3 Completed'))
         else:
             print('Error! Plz rerun this file. Exit in 3 secs')
-            pub.send_string(f'{Entity_name} Error in Host Command\n')
+            pub.send_multipart(msg.reply(protocol.ERROR, f'{Entity_name} Error in Host Command'))
             time.sleep(3)
             sys.exit(1)
 
@@ -1,76 +1,46 @@
 # SDL in ANL Entity ChemSpeed Version 1.0 by TDai
 
-import sys
-import time
-import zmq
 import os
 
-def start_entity_ChemSpeed(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
-    print(f"{Entity_name} Start")
+from vino.Com.entity import Entity, command
+from vino.Com.handshake import FileHandshake
+
+class EntityChemSpeed(Entity):
+
+    # command -> ChemSpeed .bat application, edit the JSON file to add applications
+    table = 'ChemSpeedCommands.json'
 
-    context = zmq.Context()
-    sub = context.socket(zmq.SUB)
-    pub = context.socket(zmq.PUB)
+    def __init__(self, Entity_name, sub_addr, sub_port, pub_addr, pub_port, token='1'):
+        """
+        :param token: start/finished token name the ChemSpeed application waits for. The .bat
+                      applications only know this one name, so jobs run one at a time.
+        """
+        if not token:
+            raise ValueError('ChemSpeed needs the token name its applications wait for')
+        super().__init__(Entity_name, sub_addr, sub_port, pub_addr, pub_port)
+        self.token = token
+        self.handshake = FileHandshake(r'C:\Users\Operator\Desktop\AutoWF\start',
+                                       r'C:\Users\Operator\Desktop\AutoWF\finished')
 
-    try:
-        sub.connect(f"tcp://{sub_addr}:{sub_port}")
-        sub.setsockopt_string(zmq.SUBSCRIBE, Entity_name)
-        pub.bind(f"tcp://{pub_addr}:{pub_port}")
-        print(f"{Entity_name} Connected to the Host")
-    except zmq.ZMQError as e:
-        sub.close()
-        pub.close()
-        context.term()
-        print(f"{Entity_name} Connection Fail: {e}")
-        return
+    def teardown(self):
+        self.handshake.close()
 
-    while True:
-        topic, cmd = sub.recv_multipart()
-        print(topic.decode(), cmd.decode())
-        cmd = cmd.decode()
-        if cmd == 'SimDemo':
-            
-            app_dir = r'C:\Users\Operator\Desktop\AutoWF\ChemBat\SimChemTDai.bat'
-            os.startfile(app_dir)
-            fp = open(r'C:\Users\Operator\Desktop\AutoWF\start\1.txt', 'x')
-            fp.close()
+    def run_bat(self, app_dir):
+        os.startfile(app_dir)
+        job = self.handshake.submit(self.token)
+        return self.handshake.wait(job, check=lambda: self.sleep(0))
 
-            while True:
-                if os.path.exists(r'C:\Users\Operator\Desktop\AutoWF\finished\1.txt'):
-                    time.sleep(1)
-                    break
-                else:
-                    time.sleep(1)
-                    #print('Busy')
-            os.remove(r'C:\Users\Operator\Desktop\AutoWF\finished\1.txt')
-            
-            pub.send_string(f'{Entity_name} SimulationDemo Completed\n')
-            print(f'{Entity_name} SimulationDemo Completed\n')
-        elif cmd == 'CapDemo':
-            
-            app_dir = r'C:\Users\Operator\Desktop\AutoWF\ChemBat\CappingDemo.bat'
-            os.startfile(app_dir)
-            fp = open(r'C:\Users\Operator\Desktop\AutoWF\start\1.txt', 'x')
-            fp.close()
+    def run_row(self, cmd, app_dir):
+        seconds = self.run_bat(app_dir)
+        return f'{self.name} {cmd} Completed in {seconds:.0f}s'
 
-            while True:
-                if os.path.exists(r'C:\Users\Operator\Desktop\AutoWF\finished\1.txt'):
-                    time.sleep(1)
-                    break
-                else:
-                    time.sleep(1)
-                    #print('Busy')
-            os.remove(r'C:\Users\Operator\Desktop\AutoWF\finished\1.txt')
-            
-            pub.send_string(f'{Entity_name} CappingDemo Completed\n')
-            print(f'{Entity_name} CappingDemo Completed\n')
-        elif cmd == '3':
-            pub.send_string(f'{Entity_name} 3 Completed\n')
-        else:
-            print('Error! Plz rerun this file. Exit in 3 secs')
-            pub.send_string(f'{Entity_name} Error in Host Command\n')
-            time.sleep(3)
-            sys.exit(1)
+    @command('3')
+    def test(self):
+        return f'{self.name} 3 Completed'
+
+
+def start_entity_ChemSpeed(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
+    EntityChemSpeed(Entity_name, sub_addr, sub_port, pub_addr, pub_port).run()
 
 if __name__ == "__main__":
     Entity_name = "ChemSpeed"
@@ -5,6 +5,8 @@ import time
 import zmq
 import os
 
+from vino.Com import protocol
+
 def start_entity_KLA(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
     print(f"{Entity_name} Start")
 
@@ -25,21 +27,22 @@ def start_entity_KLA(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
         return
 
     while True:
-        topic, cmd = sub.recv_multipart()
-        print(topic.decode(), cmd.decode())
-        cmd = cmd.decode()
+        msg = protocol.parse_command(sub.recv_multipart())
+        print(msg.entity, msg.cmd)
+        cmd = msg.cmd
+        pub.send_multipart(msg.reply(protocol.ACCEPTED))
         if cmd == '1':
             time.sleep(4)
-            pub.send_string(f'{Entity_name} 1 Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} 1 Completed'))
             print(f'{Entity_name} 1 Completed\n')
         elif cmd == '2':
             time.sleep(4)
-            pub.send_string(f'{Entity_name} 2 Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} 2 Completed'))
         elif cmd == '3':
-            pub.send_string(f'{Entity_name} 3 Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} 3 Completed'))
         else:
             print('Error! Plz rerun this file. Exit in 3 secs')
-            pub.send_string(f'{Entity_name} Error in Host Command\n')
+            pub.send_multipart(msg.reply(protocol.ERROR, f'{Entity_name} Error in Host Command'))
             time.sleep(3)
             sys.exit(1)
 
@@ -6,6 +6,8 @@ import zmq
 import os
 import n91
 
+from vino.Com import protocol
+
 
 def start_entity_N91(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
     print(f"{Entity_name} Start")
@@ -27,23 +29,24 @@ def start_entity_N91(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
         return
 
     while True:
-        topic, cmd = sub.recv_multipart()
-        print(topic.decode(), cmd.decode())
-        cmd = cmd.decode()
+        msg = protocol.parse_command(sub.recv_multipart())
+        print(msg.entity, msg.cmd)
+        cmd = msg.cmd
+        pub.send_multipart(msg.reply(protocol.ACCEPTED))
         if cmd == 'Home':
 
-            pub.send_string(f'{Entity_name} Home Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} Home Completed'))
             print(f'{Entity_name} Home Completed\n')
         elif cmd == 'Move':
             n91.move()
-            pub.send_string(f'{Entity_name} Manully Move Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} Manully Move Completed'))
         elif cmd == 'Measure':
             n91.measure()
-            pub.send_string(f'{Entity_name} Measurement Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} Measurement Completed'))
             print(f'{Entity_name} Measurement Completed\n')
         else:
             print('Error! Plz rerun this file. Exit in 3 secs')
-            pub.send_string(f'{Entity_name} Error in Host Command\n')
+            pub.send_multipart(msg.reply(protocol.ERROR, f'{Entity_name} Error in Host Command'))
             time.sleep(3)
             sys.exit(1)
 
@@ -1,54 +1,34 @@
 # SDL in ANL Entity N9_2 Version 1.0 by TDai
 
-import sys
-import time
-import zmq
-import os
 import n92
 
+from vino.Com.entity import Entity, command
+
+
+class EntityN92(Entity):
+
+    @command('Home')
+    def home(self):
+        n92.home_robot()
+        return f'{self.name} Home Completed'
+
+    @command('SelfHealing')
+    def self_healing(self):
+        self.sleep(4)
+        n92.self_healing_wf()
+        return f'{self.name} SelfHealing Completed'
+
+    @command('Snapshot')
+    def snapshot(self):
+        folder = 'captured_photos'
+        interval = 30  # every 30mins
+        duration = 48   # last for 48h
+        n92.snapshot(folder, interval, duration, self.sleep)
+        return f'{self.name} Snapshot Completed'
+
 
 def start_entity_N92(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
-    print(f"{Entity_name} Start")
-
-    context = zmq.Context()
-    sub = context.socket(zmq.SUB)
-    pub = context.socket(zmq.PUB)
-
-    try:
-        sub.connect(f"tcp://{sub_addr}:{sub_port}")
-        sub.setsockopt_string(zmq.SUBSCRIBE, Entity_name)
-        pub.bind(f"tcp://{pub_addr}:{pub_port}")
-        print(f"{Entity_name} Connected to the Host")
-    except zmq.ZMQError as e:
-        sub.close()
-        pub.close()
-        context.term()
-        print(f"{Entity_name} Connection Fail: {e}")
-        return
-
-    while True:
-        topic, cmd = sub.recv_multipart()
-        print(topic.decode(), cmd.decode())
-        cmd = cmd.decode()
-        if cmd == 'Home':
-            n92.home_robot()
-            pub.send_string(f'{Entity_name} Home Completed\n')
-            print(f'{Entity_name} Home Completed\n')
-        elif cmd == 'SelfHealing':
-            time.sleep(4)
-            n92.self_healing_wf()
-            pub.send_string(f'{Entity_name} SelfHealing Completed\n')
-        elif cmd == 'Snapshot':
-            folder = 'captured_photos'
-            interval = 30  # every 30mins
-            duration = 48   # last for 48h
-            n92.snapshot(folder, interval, duration)
-            pub.send_string(f'{Entity_name} Snapshot Completed\n')
-        else:
-            print('Error! Plz rerun this file. Exit in 3 secs')
-            pub.send_string(f'{Entity_name} Error in Host Command\n')
-            time.sleep(3)
-            sys.exit(1)
+    EntityN92(Entity_name, sub_addr, sub_port, pub_addr, pub_port).run()
 
 if __name__ == "__main__":
     Entity_name = "N92"
@@ -10,6 +10,8 @@ import os
 from TDaiGUIControl import *
 import glob
 
+from vino.Com import protocol
+
 def start_entity_GUIControl(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
     print(f"{Entity_name} Start")
 
@@ -30,9 +32,10 @@ def start_entity_GUIControl(Entity_name, sub_addr, sub_port, pub_addr, pub_port)
         return
 
     while True:
-        topic, cmd = sub.recv_multipart()
-        print(topic.decode(), cmd.decode())
-        cmd = cmd.decode()
+        msg = protocol.parse_command(sub.recv_multipart())
+        print(msg.entity, msg.cmd)
+        cmd = msg.cmd
+        pub.send_multipart(msg.reply(protocol.ACCEPTED))
         if cmd == 'Snap':
             
             time.sleep(1)
@@ -48,17 +51,17 @@ def start_entity_GUIControl(Entity_name, sub_addr, sub_port, pub_addr, pub_port)
                 if match:
                     match.click()
             
-            pub.send_string(f'{Entity_name} Snap Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} Snap Completed'))
             print(f'{Entity_name} Snap Completed\n')
         elif cmd == 'WF2':
             
-            pub.send_string(f'{Entity_name} CappingDemo Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} CappingDemo Completed'))
             print(f'{Entity_name} CappingDemo Completed\n')
         elif cmd == 'WF3':
-            pub.send_string(f'{Entity_name} 3 Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} 3 Completed'))
         else:
             print('Error! Plz rerun this file. Exit in 3 secs')
-            pub.send_string(f'{Entity_name} Error in Host Command\n')
+            pub.send_multipart(msg.reply(protocol.ERROR, f'{Entity_name} Error in Host Command'))
             time.sleep(3)
             sys.exit(1)
 
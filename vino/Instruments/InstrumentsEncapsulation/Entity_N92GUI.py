@@ -7,6 +7,8 @@ import zmq
 import requests
 import json
 
+from vino.Com import protocol
+
 ip = '192.168.12.20'
 host = 'http://' + ip + '/api/v2.0.0/'
 
@@ -100,9 +102,10 @@ def start_entity_MiR(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
         return
 
     while True:
-        topic, cmd = sub.recv_multipart()
-        print(topic.decode(), cmd.decode())
-        cmd = cmd.decode()
+        msg = protocol.parse_command(sub.recv_multipart())
+        print(msg.entity, msg.cmd)
+        cmd = msg.cmd
+        pub.send_multipart(msg.reply(protocol.ACCEPTED))
         if cmd == 'GPC':
                         
             mission_id = {"mission_id": "b0a59fbe-e87e-11ee-a42c-00012978ede1"} #TDaiGPC
@@ -112,7 +115,7 @@ def start_entity_MiR(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
             mission_complete_check(host)           
             time.sleep(1)
             
-            pub.send_string(f'{Entity_name}: To GPC Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name}: To GPC Completed'))
             print(f'{Entity_name} To GPC Completed\n')
         elif cmd == 'Charger':
             
@@ -123,7 +126,7 @@ def start_entity_MiR(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
             mission_complete_check(host)           
             time.sleep(1)
             
-            pub.send_string(f'{Entity_name}: To Charger Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name}: To Charger Completed'))
             print(f'{Entity_name} To Charger Completed\n')
         elif cmd == 'ChemSpeed':
             
@@ -134,12 +137,12 @@ def start_entity_MiR(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
             mission_complete_check(host)           
             time.sleep(1)
             
-            pub.send_string(f'{Entity_name}: To ChemSpeed Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name}: To ChemSpeed Completed'))
             print(f'{Entity_name} To ChemSpeed Completed\n')
             
         elif cmd == 'Exit':
             
-            pub.send_string(f'{Entity_name}: Exit Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name}: Exit Completed'))
             print(f'{Entity_name} Exit Completed\n')
             
             sub.close()
@@ -150,7 +153,7 @@ def start_entity_MiR(Entity_name, sub_addr, sub_port, pub_addr, pub_port):
             
         else:
             print('Error! Plz rerun this file. Exit in 3 secs')
-            pub.send_string(f'{Entity_name} Error in Host Command\n')
+            pub.send_multipart(msg.reply(protocol.ERROR, f'{Entity_name} Error in Host Command'))
             time.sleep(3)
             sys.exit(1)
 
@@ -0,0 +1,42 @@
+"""
+Per-packet cost of the NorthC9 CRC16 implementations, for packet sizes up to MAX_RESP_LEN.
+
+Run from the n92package folder:  python benchmarks/crc_bench.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import north.north_c9 as c9  # noqa: E402
+
+SIZES = (8, 16, 32, 64, 128, 256, 512, c9.GenericSerialControllerNetwork.MAX_RESP_LEN - 1)
+
+
+def backends():
+    result = {'bytewise': c9.crc16_bytewise, 'words': c9.crc16_words}
+    if c9.CRC_BACKEND == 'crcmod':
+        result['crcmod'] = c9.crc16
+    return result
+
+
+def per_call(func, data, repeat=5):
+    timer = timeit.Timer(lambda: func(data))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def main():
+    funcs = backends()
+    print(f'build_crc uses: {c9.CRC_BACKEND}')
+    print('bytes  ' + ''.join(f'{name:>12}' for name in funcs) + '   (us per packet)')
+    for size in SIZES:
+        data = os.urandom(size)
+        reference = c9.crc16_bytewise(data)
+        assert all(func(data) == reference for func in funcs.values())
+        print(f'{size:5d}  ' + ''.join(f'{per_call(func, data) * 1e6:12.2f}' for func in funcs.values()))
+
+
+if __name__ == "__main__":
+    main()
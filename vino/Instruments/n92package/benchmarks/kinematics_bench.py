@@ -0,0 +1,64 @@
+"""
+Scalar n9_kinematics (one point per call) against the numpy array versions, for grids of targets.
+
+Run from the n92package folder:  python benchmarks/kinematics_bench.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import north.n9_kinematics as n9  # noqa: E402
+
+SIZES = (24, 240, 2400, 24000)
+
+
+def grid(n, seed=0):
+    # targets spread over the reachable deck in front of the robot
+    rng = np.random.default_rng(seed)
+    radius = rng.uniform(80, 330, n)
+    angle = rng.uniform(-2.5, 2.5, n)
+    return radius * np.sin(angle), radius * np.cos(angle)
+
+
+def scalar_ik_counts(xs, ys):
+    result = []
+    for x, y in zip(xs, ys):
+        gripper, elbow, shoulder = n9.ik(x, y)
+        result.append((n9.rad_to_counts(n9.GRIPPER, gripper), n9.rad_to_counts(n9.ELBOW, elbow),
+                       n9.rad_to_counts(n9.SHOULDER, shoulder)))
+    return result
+
+
+def scalar_fk(counts):
+    return [n9.fk(gripper, elbow, shoulder) for gripper, elbow, shoulder in counts]
+
+
+def best(func, repeat=5):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def main():
+    print(f'{"points":>7}{"ik scalar":>12}{"ik array":>12}{"fk scalar":>12}{"fk array":>12}   (ms per batch)')
+    for n in SIZES:
+        xs, ys = grid(n)
+        xs_list, ys_list = xs.tolist(), ys.tolist()
+
+        counts = scalar_ik_counts(xs_list, ys_list)
+        gripper, elbow, shoulder, ok = n9.ik_counts_many(xs, ys)
+        assert np.array_equal(np.array(counts).T, np.array([gripper, elbow, shoulder]))
+        fk = np.array(scalar_fk(counts)).T
+        assert np.allclose(fk, np.array(n9.fk_many(gripper, elbow, shoulder)))
+
+        times = (best(lambda: scalar_ik_counts(xs_list, ys_list)), best(lambda: n9.ik_counts_many(xs, ys)),
+                 best(lambda: scalar_fk(counts)), best(lambda: n9.fk_many(gripper, elbow, shoulder)))
+        print(f'{n:>7}' + ''.join(f'{t * 1000:12.3f}' for t in times) + f'   ({ok.sum()} within limits)')
+
+
+if __name__ == "__main__":
+    main()
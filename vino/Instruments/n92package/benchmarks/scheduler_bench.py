@@ -0,0 +1,113 @@
+"""
+Scheduler slot planning: the former full rebuild of the schedule on every insertion against IntervalPlanner.
+
+Simulates a vial campaign: every vial schedules a child task (e.g. sampling after a reaction time) at a desired time
+with a duration, and a few of them run at a higher priority. Run from the n92package folder:
+
+    python benchmarks/scheduler_bench.py
+"""
+import os
+import random
+import sys
+from time import perf_counter
+
+from sortedcontainers import SortedList
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from north.north_tasks import IntervalPlanner  # noqa: E402
+
+SIZES = (96, 384, 1536, 6144)
+LEGACY_MAX = 1536  # the rebuild takes minutes beyond this
+
+
+class Slot:
+    """Stand-in for north_tasks.Task with only what the planners read."""
+
+    def __init__(self, desired_resume_t, max_t, priority):
+        self.desired_resume_t = self.resume_t = desired_resume_t
+        self.max_t = max_t
+        self.priority = priority
+
+    @property
+    def end_t(self):
+        return self.resume_t + self.max_t
+
+
+def campaign(n, seed=0):
+    rng = random.Random(seed)
+    slots = []
+    for vial in range(n):
+        desired = vial * 20.0 + rng.uniform(0, 600)  # one vial started every 20 s, ready 0-10 min later
+        priority = 2 if rng.random() < 0.1 else 1
+        slots.append(Slot(desired, rng.uniform(5, 30), priority))
+    return slots
+
+
+def legacy_schedule(scheduled, new_task):
+    # Scheduler._schedule_task before IntervalPlanner
+    scheduled.add(new_task)
+    priority_list = SortedList(key=lambda task: -task.priority, iterable=scheduled)
+    for task in priority_list:
+        task.resume_t = task.desired_resume_t
+    new_schedule = SortedList(key=lambda task: task.resume_t)
+    for task in priority_list:
+        for i, placed_task in enumerate(new_schedule):
+            if task.resume_t < placed_task.resume_t:
+                if i > 0:
+                    if task.resume_t < new_schedule[i - 1].end_t:
+                        task.resume_t = new_schedule[i - 1].end_t
+                if task.end_t > placed_task.resume_t:
+                    task.resume_t = placed_task.end_t
+                else:
+                    break
+        new_schedule.add(task)
+    return new_schedule
+
+
+def run_legacy(slots):
+    scheduled = SortedList(key=lambda task: task.resume_t)
+    for slot in slots:
+        scheduled = legacy_schedule(scheduled, slot)
+    return scheduled
+
+
+def run_planner(slots):
+    planner = IntervalPlanner()
+    for slot in slots:
+        planner.add(slot)
+    return planner
+
+
+def check(scheduled):
+    # no two slots overlap and nobody starts before it wanted to
+    previous_end = float('-inf')
+    for slot in scheduled:
+        assert slot.resume_t >= slot.desired_resume_t - 1e-9
+        if slot.max_t <= 0:
+            continue
+        assert slot.resume_t >= previous_end - 1e-9, 'overlapping slots'
+        previous_end = slot.end_t
+
+
+def timed(func, slots):
+    start = perf_counter()
+    result = func(slots)
+    return perf_counter() - start, result
+
+
+def main():
+    print(f'{"tasks":>7}{"rebuild s":>12}{"planner s":>12}{"speedup":>9}{"makespan":>10}')
+    for n in SIZES:
+        planner_s, planned = timed(run_planner, campaign(n))
+        check(planned)
+        makespan = max(slot.end_t for slot in planned)
+        if n <= LEGACY_MAX:
+            legacy_s, _ = timed(run_legacy, campaign(n))
+            print(f'{n:>7}{legacy_s:>12.4f}{planner_s:>12.4f}{legacy_s / planner_s:>8.0f}x{makespan:>10.0f}')
+        else:
+            print(f'{n:>7}{"-":>12}{planner_s:>12.4f}{"-":>9}{makespan:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
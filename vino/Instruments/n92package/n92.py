@@ -5,6 +5,8 @@ import cv2
 import os
 
 c9 = NorthC9('A', network_serial='AU06EWYQ')
+# solve the wafer grid once, the move_xy calls below then take joint counts from the cache
+c9.location_cache.warm(wafer_pos['pre_pos'] for wafer_pos in locations.selfhealing_wafers_loc.values())
 
 
 def home_robot():
@@ -17,7 +19,7 @@ def servo_on():
     c9.robot_servo(True)
     
 
-def snapshot(folder_path, interval_minutes, duration_hours):
+def snapshot(folder_path, interval_minutes, duration_hours, sleep=time.sleep):
     if not os.path.exists(folder_path):
         os.makedirs(folder_path)
 
@@ -43,7 +45,7 @@ def snapshot(folder_path, interval_minutes, duration_hours):
             filename = os.path.join(folder_path, f'Photo_{i+1:03d}.jpg')
             cv2.imwrite(filename, frame)
             print(f'Saved:{filename}')
-            time.sleep(interval_seconds)
+            sleep(interval_seconds)
     finally:
         cap.release()
         cv2.destroyAllWindows()
@@ -62,18 +64,11 @@ def self_healing_wf():
     
     # need to go to the first wafer in move xy mode then run the loop to cut different samples
     
-    # goto the 1th pos for the wafer:
-    time.sleep(1)
-    c9.move_robot_cts(265,31456,25005,12416)
-    time.sleep(1)
-    
+    # goto the 1th pos for the wafer, then cut every sample in one queued motion sequence
+    seq = c9.move_sequence([('move_robot_cts', 265, 31456, 25005, 12416)])
     for wafer_pos in locations.selfhealing_wafers_loc.values():
-        c9.move_xy(*wafer_pos['pre_pos'])
-        time.sleep(1)
-        c9.move_z(159.5)
-        time.sleep(1)
-        c9.move_z(168)
-        time.sleep(1)
+        seq.move_xy(*wafer_pos['pre_pos']).move_z(159.5).dwell(1).move_z(168)  # dwell: blade pressed on the wafer
+    seq.run()
     
     c9.move_robot_cts(45,30265,40010,10363)
         
@@ -19,6 +19,7 @@ def dist(p, q):
 # imports last to avoid cyclical importing (some of the below files depend on the constants above)
 import north.n9_kinematics
 from north.north_c9 import NorthC9, ADS1115
-from north.north_tasks import Scheduler
+from north.n9_async import AsyncNorthC9
+from north.north_tasks import Scheduler, MultiScheduler
 from north.n9_cam import NorthCamera
 from north.n9_data import NorthData
@@ -0,0 +1,108 @@
+"""
+asyncio front end for NorthC9.
+
+Every NorthC9 method is available as a coroutine on AsyncNorthC9. Calls run on one worker thread per controller
+network, so requests to a serial port never interleave, while the event loop stays free to drive other controllers.
+Methods that take a ``wait`` argument are sent with wait=False and their CmdToken is awaited on the loop instead of
+busy-polling a thread:
+
+    async def main():
+        a = AsyncNorthC9('A', network_serial='COM3')
+        b = AsyncNorthC9('A', network_serial='COM4')
+        await asyncio.gather(a.home_robot(), b.home_robot())
+        await asyncio.gather(a.goto_safe(vial_a), b.aspirate_ml(0, 1.5))
+        weight = await a.read_steady_scale()
+
+Pass wait=False to get the (awaitable) CmdToken back without waiting for it. Methods that accept ``wait`` but always
+block (ALWAYS_WAIT, e.g. goto_xy_safe) run as plain calls, and asking them for wait=False raises TypeError; use
+c9.move_sequence() for a safe move that can be awaited.
+"""
+
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+
+from north.north_c9 import NorthC9, CmdToken
+
+
+class AsyncNorthC9:
+
+    # methods that hand back a value instead of the token when they wait
+    VALUE_TOKENS = ('read_steady_scale', 'get_barcode')
+    # methods that take wait but finish their moves before returning None
+    ALWAYS_WAIT = ('goto_xy_safe',)
+
+    def __init__(self, addr=None, *args, c9: NorthC9 = None, **kwargs):
+        """
+        :param addr: controller address, as for NorthC9. Ignored if c9 is given.
+        :param c9: existing NorthC9 to drive, otherwise one is created from addr, args and kwargs
+        """
+        if c9 is None:
+            c9 = NorthC9(addr, *args, **kwargs)
+        self.c9 = c9
+
+        # controllers that share a network (daisy chained addresses) share its worker thread
+        executor = getattr(c9.network, 'executor', None)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='c9')
+            c9.network.executor = executor
+        self.executor = executor
+        c9.executor = executor
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking call on the controller's worker thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def call(self, name, *args, **kwargs):
+        func = getattr(self.c9, name)
+        signature = inspect.signature(func)
+        if 'wait' not in signature.parameters:
+            return await self.run(func, *args, **kwargs)
+
+        bound = signature.bind(*args, **kwargs)
+        wait = bound.arguments.pop('wait', True)
+        if name in self.ALWAYS_WAIT:
+            if not wait:
+                raise TypeError(f'{name} always waits for its moves, it has no CmdToken to return with wait=False')
+            return await self.run(func, *bound.args, **bound.kwargs)
+        result = await self.run(func, *bound.args, wait=False, **bound.kwargs)
+        if not isinstance(result, CmdToken):
+            if not wait and name not in self.VALUE_TOKENS:  # sim short-cuts return values directly
+                raise TypeError(f'{name} returned {result!r} instead of a CmdToken with wait=False')
+            return result
+        if not wait:
+            return result
+        await result.wait_async(self.executor)
+        if name in self.VALUE_TOKENS:
+            return result.return_value[0]
+        return result
+
+    async def wait_for(self, tkn: CmdToken = None):
+        if tkn is None:
+            tkn = self.c9.prev_cmd_token
+        return await tkn.wait_async(self.executor)
+
+    def __getattr__(self, name):
+        attr = getattr(self.c9, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            return await self.call(name, *args, **kwargs)
+        return method
+
+    def close(self):
+        """Stop the worker thread, which is shared by all AsyncNorthC9 on the same network."""
+        if getattr(self.c9.network, 'executor', None) is self.executor:
+            self.c9.network.executor = None
+        self.c9.executor = None
+        self.executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
@@ -0,0 +1,142 @@
+"""
+Durations of scheduled task steps, learned from real runs.
+
+Scheduler records how long every step (the code between two yields) of a task took, per task function and
+arguments and per step index, and keeps the last WINDOW samples of each step. Once the task ran MIN_SAMPLES times,
+add_task(max_t='auto') uses the p95 of its longest step instead of a dry run estimate, so max_t follows what the
+instruments actually do and tightens as runs accumulate. The samples persist to a JSON file next to the project:
+
+    sched = Scheduler(c9)                 # loads task_durations.json from the project directory
+    ...
+    sched.run()                           # records and saves
+    print(sched.durations.summary())
+"""
+
+import json
+import logging
+import math
+from collections import deque
+from pathlib import Path
+
+STORE_FILE = 'task_durations.json'
+
+
+def task_key(func, args=()):
+    """:return: str naming func and its arguments, e.g. 'n92.dispense(3,)'"""
+    return f'{func.__module__}.{func.__qualname__}{tuple(args)!r}'
+
+
+class DurationStats:
+
+    __slots__ = ('count', 'samples')
+
+    def __init__(self, window, samples=(), count=0):
+        self.count = count  # all samples ever recorded, the window only keeps the last ones
+        self.samples = deque(samples, maxlen=window)
+
+    def add(self, seconds):
+        self.count += 1
+        self.samples.append(seconds)
+
+    @property
+    def mean(self):
+        return sum(self.samples) / len(self.samples) if self.samples else None
+
+    def quantile(self, q):
+        """:return: nearest rank q-quantile of the window, None if empty"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'window': len(self.samples),
+            'mean_s': self.mean,
+            'p95_s': self.quantile(0.95),
+            'max_s': max(self.samples) if self.samples else None,
+        }
+
+
+class DurationStore:
+
+    WINDOW = 50  # samples kept per task, older runs stop counting
+    MIN_SAMPLES = 3  # fewer than this and add_task keeps using dry run estimates
+
+    def __init__(self, proj=None, path=None, window=None):
+        """
+        :param Project proj: project whose directory holds the store file
+        :param path: store file, defaults to task_durations.json in the project directory. Loaded if it exists.
+        :param int window: samples kept per task
+        """
+        self.window = window or self.WINDOW
+        if path is None and proj is not None:
+            path = Path(proj.dir) / STORE_FILE
+        self.path = Path(path) if path is not None else None
+        self._stats = {}  # task_key -> [DurationStats of step 0, step 1, ...]
+        if self.path is not None and self.path.exists():
+            self.load()
+
+    def record(self, func, args, step, seconds):
+        """
+        :param int step: index of the step in the task, 0 for the code before the first yield
+        """
+        steps = self._stats.setdefault(task_key(func, args), [])
+        while len(steps) <= step:
+            steps.append(DurationStats(self.window))
+        steps[step].add(seconds)
+
+    def stats(self, func, args=()):
+        """:return: list of DurationStats of func with args, one per step, None if never recorded"""
+        return self._stats.get(task_key(func, args))
+
+    def estimate(self, func, args=(), q=0.95):
+        """
+        :return: q-quantile of the longest step, None until the first step was recorded MIN_SAMPLES times
+        """
+        steps = self.stats(func, args)
+        if not steps or len(steps[0].samples) < self.MIN_SAMPLES:
+            return None
+        return max(stats.quantile(q) for stats in steps if stats.samples)
+
+    def forget(self, func=None, args=()):
+        """Drop what was learned about func with args (None: everything), e.g. after a hardware change."""
+        if func is None:
+            self._stats = {}
+        else:
+            self._stats.pop(task_key(func, args), None)
+
+    def summary(self):
+        lines = [f'{"task":<40}{"step":>5}{"runs":>7}{"mean s":>9}{"p95 s":>9}{"max s":>9}']
+        for key, steps in sorted(self._stats.items()):
+            for step, stats in enumerate(steps):
+                if not stats.samples:
+                    continue
+                info = stats.as_dict()
+                lines.append(f'{key[:39]:<40}{step:>5}{info["count"]:>7}{info["mean_s"]:>9.2f}'
+                             f'{info["p95_s"]:>9.2f}{info["max_s"]:>9.2f}')
+        return '\n'.join(lines)
+
+    def save(self, path=None):
+        path = Path(path) if path is not None else self.path
+        if path is None:
+            raise ValueError('DurationStore: no file to save to')
+        data = {key: {'steps': [{'count': stats.count, 'samples': list(stats.samples)} for stats in steps]}
+                for key, steps in self._stats.items()}
+        with open(path, 'w') as file:
+            json.dump(data, file, indent=1)
+
+    def load(self, path=None):
+        path = Path(path) if path is not None else self.path
+        try:
+            with open(path, 'r') as file:
+                data = json.load(file)
+            for key, entry in data.items():
+                if 'steps' not in entry:  # older files pooled the samples of all steps, they can't be split up
+                    logging.info(f'DurationStore: dropping the pooled step durations of {key}, learned again')
+                    continue
+                self._stats[key] = [DurationStats(self.window, step['samples'], step['count'])
+                                    for step in entry['steps']]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.warning(f'DurationStore: could not load {path}, starting empty ({e})')
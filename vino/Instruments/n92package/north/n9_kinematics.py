@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 GRIPPER = 0
 ELBOW = 1
 SHOULDER = 2
@@ -155,3 +157,133 @@ def ik(x, y, tool_length=0, tool_orientation=None, pipette_tip_offset=False, sho
     gripper_final = tool_orientation - (shoulder_final + elbow_final)  # 0 if tool_length == 0 else...
 
     return gripper_final, elbow_final, shoulder_final
+
+
+######################################
+##                                  ##
+##   ARRAY VERSIONS (many points)   ##
+##                                  ##
+######################################
+
+# Same conventions and rounding as the scalar functions above, applied to whole numpy arrays at once, e.g. to plan
+# a grid of wafer positions or to check that every position of a rack is reachable.
+
+_COUNTS_TO_RAD = {
+    GRIPPER: (-math.tau / GRIPPER_COUNTS_PER_REV, 0),
+    ELBOW: (-math.tau / ELBOW_COUNTS_PER_REV, ELBOW_OFFSET),
+    SHOULDER: (math.tau / SHOULDER_COUNTS_PER_REV, SHOULDER_OFFSET),
+}
+
+AXIS_LIMITS = {ELBOW: (0, ELBOW_MAX_COUNTS), SHOULDER: (0, SHOULDER_MAX_COUNTS), Z_AXIS: (0, Z_AXIS_MAX_COUNTS)}
+
+
+def _round_counts(values):
+    # int(value + 0.5) truncates towards zero, as in the scalar functions
+    return np.trunc(values + 0.5).astype(np.int64)
+
+
+def counts_to_rad_many(axis, counts):
+    if axis not in _COUNTS_TO_RAD:
+        raise RuntimeError("ERROR: Axis does not support measurements in radians")
+    scale, offset = _COUNTS_TO_RAD[axis]
+    return (np.asarray(counts, dtype=float) - offset) * scale
+
+
+def rad_to_counts_many(axis, rad):
+    rad = np.asarray(rad, dtype=float)
+    if axis == GRIPPER:
+        return -_round_counts((rad / math.tau) * GRIPPER_COUNTS_PER_REV)
+    elif axis == ELBOW:
+        return _round_counts(ELBOW_OFFSET - (rad / math.tau) * ELBOW_COUNTS_PER_REV)
+    elif axis == SHOULDER:
+        return _round_counts((rad / math.tau) * SHOULDER_COUNTS_PER_REV + SHOULDER_OFFSET)
+
+    raise RuntimeError("ERROR: Axis does not support measurements in radians")
+
+
+def mm_to_counts_many(axis, mm):
+    if axis == Z_AXIS:
+        return _round_counts(Z_AXIS_MAX_COUNTS - Z_AXIS_COUNTS_PER_MM * (np.asarray(mm, dtype=float) - Z_AXIS_OFFSET))
+
+    raise RuntimeError("ERROR: Axis does not support measurements in mm")
+
+
+def fk_many(gripper_cts, elbow_cts, shoulder_cts, tool_length=0, pipette_tip_offset=False):
+    """
+    :return: (x, y, theta) arrays, one entry per set of counts
+    """
+    theta_gripper = counts_to_rad_many(GRIPPER, gripper_cts)
+    theta_elbow = counts_to_rad_many(ELBOW, elbow_cts)
+    theta_shoulder = counts_to_rad_many(SHOULDER, shoulder_cts)
+
+    l1 = 170  # length of shoulder to elbow
+    l2 = 170 + pipette_tip_offset*44  # length of elbow to gripper, plus tool
+
+    theta_forearm = theta_shoulder + theta_elbow
+    theta = theta_forearm + theta_gripper
+    x3 = l1 * np.cos(theta_shoulder) + l2 * np.cos(theta_forearm) + tool_length * np.cos(theta)
+    y3 = l1 * np.sin(theta_shoulder) + l2 * np.sin(theta_forearm) + tool_length * np.sin(theta)
+
+    return -y3, x3, theta + math.pi/2
+
+
+def ik_many(x, y, tool_length=0, tool_orientation=None, pipette_tip_offset=False, shoulder_preference=None):
+    """
+    Array version of ik(). Points out of reach get NaN angles instead of raising, see ik_counts_many().
+
+    :param shoulder_preference: SHOULDER_CENTER, SHOULDER_OUT or an array with one preference per point
+    :return: (gripper, elbow, shoulder) angle arrays in radians
+    """
+    if shoulder_preference is None:
+        shoulder_preference = SHOULDER_CENTER
+
+    if tool_orientation is None:
+        tool_orientation = DEFAULT_TOOL_ORIENTATION
+
+    # swap x/y for IK convention, as in ik()
+    x, y = np.asarray(y, dtype=float), -np.asarray(x, dtype=float)
+    tool_orientation = np.asarray(tool_orientation, dtype=float) - math.pi/2
+
+    x = x - tool_length * np.cos(tool_orientation)
+    y = y - tool_length * np.sin(tool_orientation)
+
+    l1 = 170
+    l2 = 170 + pipette_tip_offset*44  # add pipette tip offset if True
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        elbow_angle_1 = math.pi - np.arccos((x ** 2 + y ** 2 - l1 ** 2 - l2 ** 2) / (-2 * l1 * l2))
+
+        pseudo_line = np.hypot(x, y)
+        pseudo_angle = np.arctan2(y, x)
+        shoulder_inside_angle = np.arccos((l1 ** 2 + pseudo_line ** 2 - (l2 ** 2)) / (2 * l1 * pseudo_line))
+
+    shoulder_angle_1 = pseudo_angle - shoulder_inside_angle
+    shoulder_angle_2 = pseudo_angle + shoulder_inside_angle
+
+    # solution 1 when it is the one closer to center and center is preferred, or the outer one and out is preferred
+    first = (np.abs(shoulder_angle_1) < np.abs(shoulder_angle_2)) == (np.asarray(shoulder_preference) == SHOULDER_CENTER)
+    shoulder_final = np.where(first, shoulder_angle_1, shoulder_angle_2)
+    elbow_final = np.where(first, elbow_angle_1, -elbow_angle_1)
+
+    gripper_final = tool_orientation - (shoulder_final + elbow_final)
+
+    return gripper_final, elbow_final, shoulder_final
+
+
+def ik_counts_many(x, y, tool_length=0, tool_orientation=None, pipette_tip_offset=False, shoulder_preference=None):
+    """
+    :return: (gripper, elbow, shoulder) count arrays and a bool array that is True where the point is reachable and
+        the counts are within the axis limits. Counts of rejected points are meaningless.
+    """
+    angles = ik_many(x, y, tool_length, tool_orientation, pipette_tip_offset, shoulder_preference)
+    ok = np.all(np.isfinite(angles), axis=0)
+    angles = [np.where(ok, angle, 0.0) for angle in angles]
+    counts = [rad_to_counts_many(axis, angle) for axis, angle in zip((GRIPPER, ELBOW, SHOULDER), angles)]
+    ok &= within_limits(ELBOW, counts[1]) & within_limits(SHOULDER, counts[2])
+    return counts[0], counts[1], counts[2], ok
+
+
+def within_limits(axis, counts):
+    low, high = AXIS_LIMITS[axis]
+    counts = np.asarray(counts)
+    return (counts >= low) & (counts <= high)
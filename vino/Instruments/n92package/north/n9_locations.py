@@ -0,0 +1,250 @@
+"""
+Cache of N9 joint counts for deck locations, so moves to known places skip inverse kinematics.
+
+Two kinds of entries are kept:
+
+- grid cells of the project's modules: all cells of a module are solved in one vectorized IK call the first time one
+  of them is needed, and solved again only when the module, its grid or the robot is moved;
+- arbitrary (x, y) targets handed to move_xy, memoized as they are used, or up front with warm().
+
+Both persist to a JSON file, so a restarted script loads the poses instead of recomputing them. When the cache has a
+file, warm() and precompute() save it as soon as they solved something new, and poses learned during moves are saved
+when the interpreter exits; call save() to write them earlier.
+"""
+
+import atexit
+import json
+import logging
+import math
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+import north.n9_kinematics as n9
+
+CACHE_FILE = 'location_cache.json'
+
+
+class LocationCache:
+
+    MAX_POINTS = 4096  # memoized (x, y) targets, the oldest are dropped first
+
+    def __init__(self, proj=None, robot=None, path=None, base_offset=(0.0, 0.0)):
+        """
+        :param Project proj: project whose module grids are cached, None for (x, y) targets only
+        :param robot: N9 module the grid cells are expressed relative to, defaults to the first N9 in the project
+        :param path: cache file, defaults to location_cache.json in the project directory. Loaded if it exists.
+        :param base_offset: (x, y) mm of the shoulder axis in the robot module's frame
+        """
+        self.proj = proj
+        self._robot = robot
+        self.base_offset = tuple(base_offset)
+        if path is None and proj is not None:
+            path = Path(proj.dir) / CACHE_FILE
+        self.path = Path(path) if path is not None else None
+        self._grids = {}  # module id -> {'key': fingerprint, 'counts': {(tip, preference): [[elbow, shoulder]...]}}
+        self._points = OrderedDict()  # (x, y, tip, preference) -> (elbow, shoulder)
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False  # solved poses the file does not have yet
+        if self.path is not None:
+            if self.path.exists():
+                self.load()
+            atexit.register(self._autosave)
+
+    @property
+    def robot(self):
+        if self._robot is None and self.proj is not None and self.proj.n9s:
+            self._robot = self.proj.n9s[0]
+        return self._robot
+
+    ######################################
+    ##          (x, y) TARGETS          ##
+    ######################################
+
+    def xy_counts(self, x, y, pipette_tip_offset=False, shoulder_preference=n9.SHOULDER_CENTER):
+        """
+        :return: (elbow_cts, shoulder_cts) for the target, from the cache when it was solved before
+        """
+        key = (float(x), float(y), bool(pipette_tip_offset), int(shoulder_preference))
+        counts = self._points.get(key)
+        if counts is not None:
+            self.hits += 1
+            return counts
+        self.misses += 1
+        _, theta_elbow, theta_shoulder = n9.ik(x, y, pipette_tip_offset=pipette_tip_offset,
+                                               shoulder_preference=shoulder_preference)
+        counts = (n9.rad_to_counts(n9.ELBOW, theta_elbow), n9.rad_to_counts(n9.SHOULDER, theta_shoulder))
+        self._remember(key, counts)
+        return counts
+
+    def warm(self, points, pipette_tip_offset=False, shoulder_preference=n9.SHOULDER_CENTER):
+        """
+        Solve many (x, y) targets in one vectorized call, e.g. every pre_pos of a locations dict at startup.
+
+        :return: number of targets that were not cached yet
+        """
+        keys = [(float(x), float(y), bool(pipette_tip_offset), int(shoulder_preference)) for x, y in points]
+        keys = [key for key in dict.fromkeys(keys) if key not in self._points]
+        if not keys:
+            return 0
+        xs, ys = np.array([key[0] for key in keys]), np.array([key[1] for key in keys])
+        _, elbow, shoulder, ok = n9.ik_counts_many(xs, ys, pipette_tip_offset=pipette_tip_offset,
+                                                   shoulder_preference=shoulder_preference)
+        for key, elbow_cts, shoulder_cts, valid in zip(keys, elbow.tolist(), shoulder.tolist(), ok.tolist()):
+            if valid:
+                self._remember(key, (elbow_cts, shoulder_cts))
+            else:
+                logging.warning(f'LocationCache: ({key[0]}, {key[1]}) is out of reach, not cached')
+        self._autosave()
+        return len(keys)
+
+    def _remember(self, key, counts):
+        self._points[key] = counts
+        self.dirty = True
+        if len(self._points) > self.MAX_POINTS:
+            self._points.popitem(last=False)
+
+    ######################################
+    ##           GRID CELLS             ##
+    ######################################
+
+    def _module(self, module):
+        if isinstance(module, (int, str)):
+            for candidate in self.proj.modules:
+                if module in (candidate.id, candidate.name, candidate.pyname):
+                    return candidate
+            raise KeyError(f'LocationCache: no module {module!r} in the project')
+        return module
+
+    def _fingerprint(self, module):
+        # everything the cell counts depend on, a changed value means the module (or robot) was moved
+        robot = self.robot
+        grid = module.grid
+        key = [*module.position, module.rotation, *grid['origin'], *grid['count'], *grid['pitch'], *self.base_offset]
+        if robot is not None:
+            key += [*robot.position, robot.rotation]
+        return tuple(float(value) for value in key)
+
+    def cell_positions(self, module):
+        """
+        :return: (x, y) mm arrays of every grid cell in the robot frame, in fill_range index order
+        """
+        module = self._module(module)
+        grid = module.grid
+        origin, pitch = grid['origin'], grid['pitch']
+        x_n, y_n, z_n = grid['count']
+        index = np.arange(x_n * y_n * z_n)  # same cell numbering as Project.update_moveables_list
+        local_x = origin[0] + pitch[0] * (index // (y_n * z_n))
+        local_y = origin[1] + pitch[1] * ((index % (y_n * z_n)) // z_n)
+        cos_r, sin_r = math.cos(module.rotation), math.sin(module.rotation)
+        deck_x = module.position[0] + local_x * cos_r - local_y * sin_r
+        deck_y = module.position[1] + local_x * sin_r + local_y * cos_r
+
+        robot = self.robot
+        if robot is not None:
+            deck_x = deck_x - robot.position[0]
+            deck_y = deck_y - robot.position[1]
+            cos_r, sin_r = math.cos(-robot.rotation), math.sin(-robot.rotation)
+            deck_x, deck_y = deck_x * cos_r - deck_y * sin_r, deck_x * sin_r + deck_y * cos_r
+        # project positions are in m, IK works in mm
+        return deck_x * 1000 - self.base_offset[0], deck_y * 1000 - self.base_offset[1]
+
+    def cell_counts(self, module, index, pipette_tip_offset=False, shoulder_preference=n9.SHOULDER_CENTER):
+        """
+        :param module: NorthModule, module id or name
+        :param int index: grid cell, numbered as in the module's fill_range
+        :return: (elbow_cts, shoulder_cts)
+        """
+        counts = self.grid_counts(module, pipette_tip_offset, shoulder_preference)[index]
+        if counts is None:
+            raise ValueError(f'LocationCache: cell {index} of {module} is out of reach')
+        return tuple(counts)
+
+    def grid_counts(self, module, pipette_tip_offset=False, shoulder_preference=n9.SHOULDER_CENTER):
+        """
+        :return: [[elbow_cts, shoulder_cts], ...] for every cell of the module, None for cells out of reach
+        """
+        module = self._module(module)
+        if module.grid is None:
+            raise ValueError(f'LocationCache: module {module.name} has no grid')
+        key = self._fingerprint(module)
+        entry = self._grids.get(module.id)
+        if entry is None or entry['key'] != key:
+            entry = self._grids[module.id] = {'key': key, 'counts': {}}
+        variant = (bool(pipette_tip_offset), int(shoulder_preference))
+        counts = entry['counts'].get(variant)
+        if counts is not None:
+            self.hits += 1
+            return counts
+        self.misses += 1
+        xs, ys = self.cell_positions(module)
+        _, elbow, shoulder, ok = n9.ik_counts_many(xs, ys, pipette_tip_offset=pipette_tip_offset,
+                                                   shoulder_preference=shoulder_preference)
+        counts = [[e, s] if valid else None for e, s, valid in zip(elbow.tolist(), shoulder.tolist(), ok.tolist())]
+        entry['counts'][variant] = counts
+        self.dirty = True
+        return counts
+
+    def precompute(self, pipette_tip_offset=False, shoulder_preference=n9.SHOULDER_CENTER):
+        """Solve the grid of every enabled module that has one, then save them if the cache has a file."""
+        for module in self.proj.modules:
+            if module.enabled and module.grid is not None:
+                self.grid_counts(module, pipette_tip_offset, shoulder_preference)
+        self._autosave()
+
+    ######################################
+    ##     INVALIDATION / PERSISTENCE   ##
+    ######################################
+
+    def invalidate(self, module=None):
+        """
+        Forget one module's grid (None: everything). Moved modules are noticed without this, it is for changes the
+        cache cannot see, such as a re-taught robot.
+        """
+        if module is None:
+            self._grids = {}
+            self._points = OrderedDict()
+        else:
+            self._grids.pop(self._module(module).id, None)
+        self.dirty = True
+
+    def save(self, path=None):
+        path = Path(path) if path is not None else self.path
+        if path is None:
+            raise ValueError('LocationCache: no file to save to')
+        data = {
+            'grids': {str(m_id): {'key': entry['key'],
+                                  'counts': [[tip, preference, counts]
+                                             for (tip, preference), counts in entry['counts'].items()]}
+                      for m_id, entry in self._grids.items()},
+            'points': [[*key, *counts] for key, counts in self._points.items()],
+        }
+        with open(path, 'w') as file:
+            json.dump(data, file)
+        if path == self.path:
+            self.dirty = False
+
+    def _autosave(self):
+        if self.dirty and self.path is not None:
+            try:
+                self.save()
+            except OSError as e:
+                logging.warning(f'LocationCache: could not save {self.path} ({e})')
+
+    def load(self, path=None):
+        path = Path(path) if path is not None else self.path
+        try:
+            with open(path, 'r') as file:
+                data = json.load(file)
+            for m_id, entry in data.get('grids', {}).items():
+                self._grids[int(m_id)] = {'key': tuple(entry['key']),
+                                          'counts': {(tip, preference): counts
+                                                     for tip, preference, counts in entry['counts']}}
+            for x, y, tip, preference, elbow_cts, shoulder_cts in data.get('points', []):
+                self._remember((x, y, tip, preference), (elbow_cts, shoulder_cts))
+            if path == self.path:
+                self.dirty = False
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.warning(f'LocationCache: could not load {path}, starting empty ({e})')
@@ -0,0 +1,168 @@
+"""
+Communication metrics for NorthC9.
+
+Every packet's round trip is recorded under its mnemonic (AXST, MOAX, SCAL, ...) in a histogram with doubling bucket
+widths, next to counters for controller errors, timeouts, CRC errors and retries. The numbers can be printed as a
+table, followed live during a run, or exported to JSON/CSV:
+
+    c9.metrics.live(interval=5)       # prints the table every 5 s until stopped
+    ...
+    c9.metrics.to_csv('c9_comm.csv')
+"""
+
+import csv
+import json
+import threading
+from bisect import bisect_left
+from time import time
+
+# upper bucket edges in seconds: 100 us doubling up to ~3.3 s, slower round trips land in an overflow bucket
+BUCKETS = tuple(0.0001 * 2 ** i for i in range(16))
+
+EVENTS = ('errors', 'timeouts', 'crc_errors', 'retries')
+
+
+class CommandStats:
+
+    __slots__ = ('count', 'total', 'min', 'max', 'hist') + EVENTS
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.hist = [0] * (len(BUCKETS) + 1)
+        for event in EVENTS:
+            setattr(self, event, 0)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.hist[bisect_left(BUCKETS, seconds)] += 1
+
+    def quantile(self, q):
+        """
+        :return: upper edge of the bucket holding the q-quantile (at most max), None if empty
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.hist):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_s': self.total,
+            'mean_s': self.total / self.count if self.count else None,
+            'min_s': self.min,
+            'p50_s': self.quantile(0.5),
+            'p95_s': self.quantile(0.95),
+            'p99_s': self.quantile(0.99),
+            'max_s': self.max if self.count else None,
+            **{event: getattr(self, event) for event in EVENTS},
+            'histogram': list(self.hist),
+        }
+
+
+class CommMetrics:
+
+    def __init__(self, enabled=True):
+        """
+        :param bool enabled: record nothing while False, the counters then cost a single attribute check
+        """
+        self.enabled = enabled
+        self.started = time()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _get(self, mnemonic):
+        stats = self._stats.get(mnemonic)
+        if stats is None:
+            stats = self._stats[mnemonic] = CommandStats()
+        return stats
+
+    def record(self, mnemonic, seconds):
+        """Add one round trip of `seconds` to the histogram of mnemonic."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._get(mnemonic).add(seconds)
+
+    def event(self, mnemonic, event):
+        """
+        :param str event: one of 'errors', 'timeouts', 'crc_errors' or 'retries'
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._get(mnemonic)
+            setattr(stats, event, getattr(stats, event) + 1)
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+            self.started = time()
+
+    def snapshot(self):
+        """
+        :return: {mnemonic: stats dict}, the mnemonics that took the most bus time first
+        """
+        with self._lock:
+            items = [(mnemonic, stats.as_dict()) for mnemonic, stats in self._stats.items()]
+        items.sort(key=lambda item: item[1]['total_s'], reverse=True)
+        return dict(items)
+
+    def summary(self):
+        snapshot = self.snapshot()
+        elapsed = time() - self.started
+        busy = sum(stats['total_s'] for stats in snapshot.values())
+        lines = [f'{"cmd":<6}{"count":>8}{"total s":>10}{"share":>7}{"mean ms":>9}{"p95 ms":>8}{"max ms":>8}'
+                 f'{"err":>5}{"tmo":>5}{"crc":>5}{"retry":>6}']
+        for mnemonic, stats in snapshot.items():
+            share = stats['total_s'] / elapsed * 100 if elapsed > 0 else 0.0
+            ms = lambda value: f'{value * 1000:.1f}' if value is not None else '-'
+            lines.append(f'{mnemonic:<6}{stats["count"]:>8}{stats["total_s"]:>10.3f}{share:>6.1f}%'
+                         f'{ms(stats["mean_s"]):>9}{ms(stats["p95_s"]):>8}{ms(stats["max_s"]):>8}'
+                         f'{stats["errors"]:>5}{stats["timeouts"]:>5}{stats["crc_errors"]:>5}{stats["retries"]:>6}')
+        lines.append(f'bus busy {busy:.3f}s of {elapsed:.3f}s ({busy / elapsed * 100 if elapsed > 0 else 0.0:.1f}%)')
+        return '\n'.join(lines)
+
+    def to_json(self, file_path):
+        with open(file_path, 'w') as file:
+            json.dump({'started': self.started, 'buckets_s': list(BUCKETS), 'commands': self.snapshot()}, file,
+                      indent=2)
+
+    def to_csv(self, file_path):
+        """One row per mnemonic, histogram buckets as le_<edge in ms> columns (le_inf is the overflow bucket)."""
+        columns = ['count', 'total_s', 'mean_s', 'min_s', 'p50_s', 'p95_s', 'p99_s', 'max_s', *EVENTS]
+        buckets = [f'le_{edge * 1000:g}ms' for edge in BUCKETS] + ['le_inf']
+        with open(file_path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['cmd'] + columns + buckets)
+            for mnemonic, stats in self.snapshot().items():
+                writer.writerow([mnemonic] + [stats[column] for column in columns] + stats['histogram'])
+
+    def live(self, interval=2.0, out=print):
+        """
+        Print summary() every `interval` seconds from a background thread.
+
+        :param out: callable taking the table text, e.g. a GUI text box setter
+        :return: threading.Event, set it to stop the view
+        """
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                out(self.summary())
+
+        threading.Thread(target=run, name='c9-metrics', daemon=True).start()
+        return stop
@@ -1,3 +1,7 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
 import logging
 import struct
 import math
@@ -9,13 +13,14 @@ import json
 import keyboard
 
 from sys import platform
+from concurrent.futures import Future, CancelledError, ProcessPoolExecutor
 from abc import ABC, abstractmethod, abstractproperty
 from pathlib import Path
 from typing import Callable
 from time import sleep, time, perf_counter
 from datetime import datetime
 from inputs import get_gamepad, UnpluggedError  # the keyboard interface from 'inputs' module interferes with Thonny
-from inspect import getframeinfo, stack, isgeneratorfunction
+from inspect import getframeinfo, stack, isgeneratorfunction, signature
 
 if platform == "win32":
     try:
@@ -27,6 +32,8 @@ import serial
 
 from north.north_project import Project, Controller  # this is here to avoid import loops from other modules that reference the API
 import north.n9_kinematics as n9
+from north.n9_metrics import CommMetrics
+from north.n9_locations import LocationCache
 
 class AxisState:
     OFF = 0
@@ -41,34 +48,176 @@ class AxisState:
     ERROR = 9
 
 
+class FixedPoll:
+    """Poll every `interval` seconds (0 polls back to back)."""
+
+    def __init__(self, interval=0.0):
+        self.interval = interval
+
+    def intervals(self):
+        return itertools.repeat(self.interval)
+
+
+class BackoffPoll:
+    """Poll quickly at first, then less and less often, up to `max_interval` between polls."""
+
+    def __init__(self, first=0.002, factor=1.5, max_interval=0.05):
+        self.first = first
+        self.factor = factor
+        self.max_interval = max_interval
+
+    def intervals(self):
+        interval = self.first
+        while True:
+            yield interval
+            interval = min(self.max_interval, interval * self.factor)
+
+
+class EtaPoll:
+    """
+    Sleep through most of the expected duration, then poll every `fast` seconds. The estimate can come from
+    the simulator, e.g. EtaPoll(c9_sim.get_time_est(func)), or from any callable evaluated when waiting starts.
+    """
+
+    def __init__(self, eta, fast=0.005, slow=0.5, window=0.1):
+        """
+        :param eta: expected seconds until done, or a callable returning them
+        :param window: fraction of eta before the expected end where polling turns fast
+        """
+        self.eta = eta
+        self.fast = fast
+        self.slow = slow
+        self.window = window
+
+    def intervals(self):
+        eta = self.eta() if callable(self.eta) else self.eta
+        arrival = time() + eta * (1 - self.window)
+        while True:
+            remaining = arrival - time()
+            yield self.fast if remaining <= 0 else max(self.fast, min(self.slow, remaining / 2))
+
+
 class CmdToken:
 
-    def __init__(self, status_func, value, axis=None, delay=0.0, sim=False):
+    def __init__(self, status_func, value, axis=None, delay=0.0, sim=False, executor=None, strategy=None):
+        """
+        :param delay: pause before the first and after the last poll, also the poll interval if no strategy is given
+        :param strategy: FixedPoll, BackoffPoll, EtaPoll or anything with an intervals() iterator
+        """
         self.wait_func = status_func
         self.wait_value = value
         self.wait_axis = axis
         self.return_value = None
         self.delay = delay
         self.sim = sim
+        self.executor = executor  # where `await token` polls, see wait_async()
+        self.strategy = strategy if strategy is not None else FixedPoll(delay)
 
     def is_done(self):
         if self.wait_axis is not None:
             result = self.wait_func(self.wait_axis)
         else:
             result = self.wait_func()
+        return self.check(result)
 
+    def check(self, result):
         if type(result) == tuple:  # this only handles the case for 2. todo: generalize
             self.return_value = result[1:]
             return result[0] == self.wait_value  # result[0]
 
         return result == self.wait_value
 
-    def wait(self):
+    def wait(self, strategy=None):
+        intervals = (strategy or self.strategy).intervals()
         sleep(self.delay)
         while not self.is_done():
-            sleep(self.delay)
+            sleep(next(intervals))
         sleep(self.delay)
 
+    async def wait_async(self, executor=None, strategy=None):
+        """
+        Coroutine version of wait(). The status polls run on executor (the default one if None), so the event
+        loop is free between them and tokens of several controllers can be awaited together.
+
+        :param executor: use the executor that owns the controller's serial port, so polls never interleave
+            with other requests to the same controller
+        """
+        loop = asyncio.get_running_loop()
+        intervals = (strategy or self.strategy).intervals()
+        await asyncio.sleep(self.delay)
+        while not await loop.run_in_executor(executor, self.is_done):
+            await asyncio.sleep(next(intervals))
+        await asyncio.sleep(self.delay)
+        return self
+
+    def __await__(self):
+        return self.wait_async(self.executor).__await__()
+
+
+# status functions a sweep can batch into one exchange per controller
+SWEEP_PACKETS = {'get_axis_status': 'AXST', 'get_sequence_status': 'SQST', 'get_robot_status': 'ROST'}
+
+
+def _sweep(tokens):
+    """
+    Poll every token once. Axis, sequence and robot status tokens of the same controller are read in one batch,
+    other tokens (pumps, scale, barcode) through their own status function.
+
+    :return: [bool] done flag per token
+    """
+    done = [False] * len(tokens)
+    groups = {}  # NorthC9 -> [(token index, mnemonic, args)]
+    for i, tkn in enumerate(tokens):
+        c9 = getattr(tkn.wait_func, '__self__', None)
+        mnemonic = SWEEP_PACKETS.get(getattr(tkn.wait_func, '__name__', None))
+        if mnemonic is not None and isinstance(c9, NorthC9):
+            args = [tkn.wait_axis] if tkn.wait_axis is not None else []
+            groups.setdefault(c9, []).append((i, mnemonic, args))
+        else:
+            done[i] = tkn.is_done()
+
+    for c9, items in groups.items():
+        with c9.batch() as b:
+            futures = [(i, b.send_packet(mnemonic, args)) for i, mnemonic, args in items]
+        for i, future in futures:
+            done[i] = tokens[i].check(future.result()[0])
+    return done
+
+
+def wait_all(tokens, strategy=None):
+    """
+    Wait until every token is done, checking all pending tokens in one sweep per poll.
+
+    :param strategy: poll spacing, BackoffPoll() by default. Never shorter than the largest token delay.
+    :return: the tokens
+    """
+    tokens = list(tokens)
+    pending = tokens
+    intervals = (strategy or BackoffPoll()).intervals()
+    min_interval = max((tkn.delay for tkn in tokens), default=0)
+    while pending:
+        done = _sweep(pending)
+        pending = [tkn for tkn, tkn_done in zip(pending, done) if not tkn_done]
+        if pending:
+            sleep(max(min_interval, next(intervals)))
+    return tokens
+
+
+def wait_any(tokens, strategy=None):
+    """
+    Wait until at least one token is done, checking all tokens in one sweep per poll.
+
+    :return: [CmdToken] the tokens found done by the last sweep
+    """
+    tokens = list(tokens)
+    intervals = (strategy or BackoffPoll()).intervals()
+    min_interval = max((tkn.delay for tkn in tokens), default=0)
+    while True:
+        done = [tkn for tkn, tkn_done in zip(tokens, _sweep(tokens)) if tkn_done]
+        if done:
+            return done
+        sleep(max(min_interval, next(intervals)))
+
 
 # TODO: consider simplifying cmdtokens with something similar to below: current problem was
 # that NorthC9.get_axis_status doesn't have a "self", isn't tied to an instance of NorthC9
@@ -185,6 +334,11 @@ class NorthC9:
 
     SERIAL_PUMP_DELAY = 0.03  # small delay between requests to pumps because they operate at 9600 baud
 
+    # commands that only read state, the only ones send_packet resends after a lost or corrupt response: any other
+    # command may already have run on the controller (a move, a pump dispense) when its response is lost
+    QUERIES = frozenset(('AXST', 'SQST', 'ROST', 'PMST', 'AXPS', 'GTGT', 'GHOO', 'GETI', 'GETA', 'GTPV', 'RDSC',
+                         'INFO', 'GADR'))
+
     maximum_pos = [63000, 63000, 63000, 63000]  # TODO: set these accurately and intelligently
 
     def __init__(self, addr, network=None, network_serial=None, kf_only=False, experiment_log=False, verbose=False,
@@ -204,6 +358,9 @@ class NorthC9:
                 self.log("Warning: Failed to load project settings, project specific commands may "
                          "not function as expected")
 
+        # joint counts of known locations, persisted next to the project file
+        self.location_cache = LocationCache(self.proj if self.has_project else None)
+
         self._sim = bool((type(addr) == str and addr.lower() == 'sim')
                          or '-c9_sim' in sys.argv)
 
@@ -278,7 +435,8 @@ class NorthC9:
                 self.network.__dict__['quickstop_enabled'] = True
                 keyboard.add_hotkey('ctrl+alt+=', self.quick_stop)
 
-        self._sending = False
+        # all real serial traffic goes through one I/O thread per network, the simulator is called directly
+        self.transport = None if self.sim else SerialTransport.of(self.network)
         self._stop_requested = False
 
         self.default_vel = self.DEFAULT_VEL
@@ -286,6 +444,8 @@ class NorthC9:
         self.safe_height = 292
 
         self.prev_cmd_token = None
+        self.wait_strategy = BackoffPoll()  # how tokens without a delay poll, FixedPoll(0) polls back to back
+        self.executor = None  # set by AsyncNorthC9, tokens are then awaited on the controller's own thread
 
         self.js_vel = [0, 0, 0, 0]
         self.key_speed = 1000  # counts/sec when key depressed
@@ -295,8 +455,11 @@ class NorthC9:
         self.version = 0.3  # apr_17_2023
 
         self._scheduler = None
+        self._time_ests = {}  # (module, qualname, code, args) -> dry run estimate, see estimate_times()
 
         # benchmarking stuff #
+        self.metrics = CommMetrics()  # per command latency histograms and error counters, see bench()
+        self.retries = 0  # resends after a lost or corrupt response, only for QUERIES
         self._benchmarks = {
             "num_send": 0,
             "first_send": -1.0,
@@ -383,48 +546,79 @@ class NorthC9:
         if self.verbose:
             print(*args)
 
-    """ # TODO this may be giving some out-dated metrics (need to revisit where benchmarks are aggregated)
-    def bench(self): # TODO should this stay public, become private, or be (re)moved?
+    def bench(self):
+        """
+        Print where the time went: overall send_packet split, then per command latencies and error counters.
+        """
         send_time = float(self._benchmarks["agg_comm"]+self._benchmarks["agg_calc"])
         print(f'C9 runtime:               {"%.5f"%(self._benchmarks["last_send"]-self._benchmarks["first_send"])}s')
         print(f'packets sent:             {self._benchmarks["num_send"]} packets')
         print(f'send_packet time:         {"%.5f"%send_time}s')
         if send_time > 0.0: # zero send time doesn't really need listed sub-categories anyhow!
-            print(f'  communication time:     {"%.5f"%(self._benchmarks["agg_comm"])}s ({"%.2f"%(self._benchmarks["agg_comm"]/send_time)}%)')
-            print(f'  calculations time:      {"%.5f"%(self._benchmarks["agg_calc"])}s ({"%.2f"%(self._benchmarks["agg_calc"]/send_time)}%)')
+            print(f'  communication time:     {"%.5f"%(self._benchmarks["agg_comm"])}s ({"%.2f"%(self._benchmarks["agg_comm"]/send_time*100)}%)')
+            print(f'  calculations time:      {"%.5f"%(self._benchmarks["agg_calc"])}s ({"%.2f"%(self._benchmarks["agg_calc"]/send_time*100)}%)')
             print(f'- - - - - - - - - - - - - - ')
-            print(f'  status time:            {"%.5f" % (self._benchmarks["agg_stat"])}s ({"%.2f"%(self._benchmarks["agg_stat"]/send_time)}%)')
+            print(f'  status time:            {"%.5f" % (self._benchmarks["agg_stat"])}s ({"%.2f"%(self._benchmarks["agg_stat"]/send_time*100)}%)')
         print(f'time outside send_packet: {"%.5f" % (self._benchmarks["agg_c9"])}s')
-        if self.has_simulator:
+        print(self.metrics.summary())
+        if self.has_simulator and hasattr(self._simulator, 'bench'):
             self._simulator.bench()
-    """
 
-    def send_packet(self, command, args_list =[], broadcast=False, stop_request=False, wait=True) -> [int]:
-        self._benchmarks["num_send"] += 1
+    def _build_request(self, command, args_list, broadcast=False, wait=True):
+        """
+        :return: (request bytes without CRC, whether the controller answers)
+        """
+        text = command + ' ' + ' '.join(map(str, args_list)) + ' ' if args_list else command + ' '
+        if self.exp_logging:
+            self.exp_log(chr(self.c9_addr) + ' ' + text[:-1], send=True)
+
+        addr = 0 if broadcast else self.c9_addr
+        request_bytes = bytes((addr, 0x20)) + text.encode(encoding='charmap')
+        if self.sim: # insert wait bool at head of request iff simming
+            request_bytes = (b'1' if wait else b'0') + request_bytes
+        return request_bytes, addr != 0
+
+    def _parse_response(self, response_bytes, expect_response):
+        """
+        Response layout: address, space, mnemonic, then each argument followed by a space. Arguments are parsed
+        straight from the bytes (int() takes ASCII digits), nothing is decoded unless it is logged.
+        """
+        if self.verbose:
+            self.log("Received", response_bytes)
+        if self.exp_logging:
+            self.exp_log(response_bytes.decode('charmap'), send=False)
+
+        if not expect_response:
+            return None
+
+        cmd_end = response_bytes.find(b' ', 2)
+        response_cmd = response_bytes[2:cmd_end]
+        if response_cmd == b'BUFF':
+            return [response_bytes[6:-1]]
+            # for i in range(0, len(response_data), 2):
+            #     data_point = response_data[i:i+2]
+            #     response_args += [int.from_bytes(data_point, byteorder='big')]
+
+        response_args = [int(arg) for arg in response_bytes[cmd_end + 1:].split()]
+        if response_cmd == b'ERR!':
+            print("Received", response_bytes)
+            raise RuntimeError(C9Errors(response_args[0], response_args[1]))
+        return response_args
+
+    def _bench_send_start(self, n=1):
+        self._benchmarks["num_send"] += n
 
         if self._benchmarks["last_send"] >= 0.0: # -1.0 on first runthrough
             self._benchmarks["agg_c9"] += perf_counter()-self._benchmarks["last_send"]
         else:
             self._benchmarks["first_send"] = perf_counter()
 
+    def send_packet(self, command, args_list =[], broadcast=False, stop_request=False, wait=True) -> [int]:
+        self._bench_send_start()
+
         # assemble packet:
         assemb_start = perf_counter()
-        request_buffer = [command]
-        for arg in args_list:
-            request_buffer += [str(arg)]
-        self.exp_log(chr(self.c9_addr) + ' ' + ' '.join(request_buffer), send=True)
-
-        if broadcast:
-            addr = b'\x00'
-        else:
-            addr = bytes([self.c9_addr])
-        expect_response = addr != b'\x00'
-        request_bytes = addr \
-                        + b'\x20' \
-                        + ' '.join(request_buffer).encode(encoding='charmap')
-        request_bytes += b'\x20'
-        if self.sim: # insert wait bool at head of request iff simming
-            request_bytes = (b'1' if wait else b'0') + request_bytes
+        request_bytes, expect_response = self._build_request(command, args_list, broadcast, wait)
         self._benchmarks["agg_calc"] += perf_counter()-assemb_start
 
         if self._stop_requested and not stop_request:
@@ -432,46 +626,112 @@ class NorthC9:
             sys.exit()
 
         # send packet and get response
-        self._sending = True
         self.log("Sent", request_bytes)
 
-        try:
-            comm_start = perf_counter()
-            response_bytes = self.network.send(request_bytes, expect_response=expect_response)
-            self._benchmarks["agg_comm"] += perf_counter()-comm_start
-        # except SerialReadTimeoutException as e: # doesn't work when can't import Serial
-        except Exception as e:
-            self._sending = False
-            logging.exception(e)
-            raise TimeoutError ("Communication with the controller timed out...")
-        self._sending = False
+        retries = self.retries if command in self.QUERIES and not stop_request else 0
+        while True:
+            try:
+                comm_start = perf_counter()
+                response_bytes = self._network_call(self.network.send, request_bytes, expect_response,
+                                                    priority=SerialTransport.STOP if stop_request else SerialTransport.NORMAL)
+                comm_time = perf_counter()-comm_start
+                break
+            except CancelledError:  # dropped from the queue by a quick stop
+                sleep(1.0)
+                sys.exit()
+            # except SerialReadTimeoutException as e: # doesn't work when can't import Serial
+            except Exception as e:
+                self.metrics.event(command, 'crc_errors' if isinstance(e, C9CrcError) else 'timeouts')
+                if retries > 0:
+                    retries -= 1
+                    self.metrics.event(command, 'retries')
+                    continue
+                logging.exception(e)
+                raise TimeoutError ("Communication with the controller timed out...")
+        self._benchmarks["agg_comm"] += comm_time
+        self.metrics.record(command, comm_time)
 
         calc_start = perf_counter()
-        self.log("Received", response_bytes)
-        self.exp_log(response_bytes.decode('charmap'), send=False)
-
-        response_args = None
+        try:
+            response_args = self._parse_response(response_bytes, expect_response)
+        except RuntimeError:
+            self.metrics.event(command, 'errors')
+            raise
         if expect_response:
-            response_terms = response_bytes.split(b' ')
-            response_cmd = response_terms[1]
-            response_args = response_terms[2:-1]
-            if response_cmd == b'BUFF':
-                response_data = response_bytes[6:-1]
-                response_args = [response_data]
-                # for i in range(0, len(response_data), 2):
-                #     data_point = response_data[i:i+2]
-                #     response_args += [int.from_bytes(data_point, byteorder='big')]
-            else:
-                response_args = [int(arg.decode()) for arg in response_args]
-
-            if response_cmd == b'ERR!':
-                print("Received", response_bytes)
-                raise RuntimeError(C9Errors(response_args[0], response_args[1]))
             self._benchmarks["agg_calc"] += perf_counter()-calc_start
 
         self._benchmarks["last_send"] = perf_counter()
         return response_args
 
+    def _network_call(self, func, *args, priority=None):
+        if self.transport is None:
+            return func(*args)
+        if priority is None:
+            priority = SerialTransport.NORMAL
+        return self.transport.call(func, *args, priority=priority)
+
+    def batch(self, max_batch=None):
+        """
+        Queue several commands and send them with as few line turnarounds as the network allows.
+
+        Usage::
+
+            with c9.batch() as b:
+                elbow = b.send_packet('AXST', [c9.ELBOW])
+                shoulder = b.send_packet('AXST', [c9.SHOULDER])
+            print(elbow.result()[0], shoulder.result()[0])
+
+        :param int max_batch: most requests written before their responses are read,
+                              defaults to the network's MAX_BATCH
+        :return: PacketBatch, flushed when the with-block exits
+        """
+        return PacketBatch(self, max_batch)
+
+    def _flush_batch(self, items, max_batch):
+        """
+        :param items: list of (request bytes, expect_response, Future, command)
+        """
+        if not items:
+            return
+        self._bench_send_start(len(items))
+        if self._stop_requested:
+            sleep(1.0)
+            sys.exit()
+
+        for start in range(0, len(items), max_batch):
+            chunk = items[start:start + max_batch]
+            for request_bytes, _, _, _ in chunk:
+                self.log("Sent", request_bytes)
+            comm_start = perf_counter()
+            try:
+                responses = self._network_call(self.network.send_many, [item[0] for item in chunk],
+                                               [item[1] for item in chunk])
+            except CancelledError:
+                for _, _, future, _ in items[start:]:
+                    future.cancel()
+                sleep(1.0)
+                sys.exit()
+            comm_time = perf_counter()-comm_start
+            self._benchmarks["agg_comm"] += comm_time
+
+            calc_start = perf_counter()
+            for (_, expect_response, future, command), response in zip(chunk, responses):
+                # the packets of a chunk share the line, each is charged its share of the round trip
+                self.metrics.record(command, comm_time / len(chunk))
+                if isinstance(response, Exception):
+                    self.metrics.event(command, 'crc_errors' if isinstance(response, C9CrcError) else 'timeouts')
+                    logging.exception(response)
+                    future.set_exception(TimeoutError("Communication with the controller timed out..."))
+                    continue
+                try:
+                    future.set_result(self._parse_response(response, expect_response))
+                except Exception as e:
+                    self.metrics.event(command, 'errors')
+                    future.set_exception(e)
+            self._benchmarks["agg_calc"] += perf_counter()-calc_start
+
+        self._benchmarks["last_send"] = perf_counter()
+
     def exp_log(self, msg, send=False):
         if not self.exp_logging:
             return
@@ -511,21 +771,51 @@ class NorthC9:
         self._benchmarks["agg_stat"] += perf_counter() - bench
         return args[0]
 
-    def _dry_run_func_est_time(self, func):
+    def get_axis_statuses(self, axes):
+        """
+        Read several axis states with one batched exchange.
+
+        :param [int] axes: axis numbers
+        :return: [int] AxisState per axis, in the same order
+        """
+        bench = perf_counter()
+        with self.batch() as b:
+            futures = [b.send_packet('AXST', [axis]) for axis in axes]
+        self._benchmarks["agg_stat"] += perf_counter() - bench
+        return [future.result()[0] for future in futures]
+
+    def _dry_run_func_est_time(self, func, args=()):
         """
         :param func: Function which (presumably) has axis simulation calls.
-        :return: Floating-pt time estimate.
+        :param args: arguments to run func with
+        :return: Floating-pt time estimate, memoized per function and arguments.
         """
         assert isinstance(func, Callable)
+        key = self._time_est_key(func, args)
+        if key not in self._time_ests:
+            self._time_ests[key] = self._dry_run(func, args)
+        return self._time_ests[key]
+
+    @staticmethod
+    def _time_est_key(func, args):
+        args = tuple(args)
+        try:
+            hash(args)
+        except TypeError:
+            args = repr(args)
+        # the code object tells apart a function redefined under the same name, e.g. in a notebook
+        return func.__module__, func.__qualname__, getattr(func, '__code__', None), args
+
+    def _dry_run(self, func, args=()):
         assert self.has_simulator
         self.simulator.start_dryrun()
         # run the function and calculate the added time
         time_pre = self.current_time
         try:
             if isgeneratorfunction(func):
-                next(func())
+                next(func(*args))
             else:
-                func()  # TODO: support args
+                func(*args)
         except Exception as e:
             logging.error('NorthC9: exception while estimating function time (below):')
             logging.exception(e)
@@ -547,11 +837,37 @@ class NorthC9:
         print(f"Estimated time for '{name}' is {estimate}s")
         return estimate
 
+    def estimate_times(self, funcs, processes=None):
+        """
+        Dry run time estimates of many functions at once, each in a worker process with its own simulator: the
+        simulated NorthC9 that the function's module creates (scripts must keep their workflow under
+        `if __name__ == '__main__':`). Only done for a simulated controller, a real one estimates serially. Results
+        are memoized per function and arguments, so a task repeated over a campaign is simulated once.
+
+        :param funcs: functions, or (function, args) pairs
+        :param processes: number of worker processes, os.cpu_count() if None, 0 to estimate serially here
+        :return: [float] estimate per function, in order
+        """
+        jobs = [(func[0], tuple(func[1])) if isinstance(func, (tuple, list)) else (func, ()) for func in funcs]
+        keys = [self._time_est_key(func, args) for func, args in jobs]
+        missing = {key: job for key, job in zip(keys, jobs) if key not in self._time_ests}
+
+        if processes != 0 and self.sim and len(missing) > 1:
+            try:
+                with ProcessPoolExecutor(processes) as pool:
+                    estimates = pool.map(_dry_run_worker, *zip(*missing.values()))
+                    self._time_ests.update(zip(missing, estimates))
+            except Exception as e:  # unpicklable function, no sim controller in its module, broken pool...
+                logging.warning(f'NorthC9: parallel time estimates failed ({e!r}), estimating serially')
+
+        for key, (func, args) in missing.items():
+            if key not in self._time_ests:
+                self._time_ests[key] = self._dry_run(func, args)
+        return [self._time_ests[key] for key in keys]
+
     def quick_stop(self):
+        # the transport sends the stop right after the packet in flight and drops everything queued behind it
         self._stop_requested = True
-        print('waiting to send stop request')
-        while self._sending:
-            pass
         print('sending stop request')
         self.send_packet('QSTP', broadcast=True, stop_request=True)
         print('Quick stop active, home robot before continuing, exiting...')
@@ -652,17 +968,32 @@ class NorthC9:
                 vel=None, accel=None, wait=True):
         # TODO: need move_sync_n in fw to move n axes synchronously (have to add gripper w/out z to this axis for tool
         #       support)
-        _, theta_elbow, theta_shoulder = self.n9_ik(x=x,
-                                                    y=y,
-                                                    tool_length=0,
-                                                    tool_orientation=None,
-                                                    pipette_tip_offset=pipette_tip_offset,
-                                                    shoulder_preference=shoulder_preference)
-        elbow_cts = self.rad_to_counts(self.ELBOW, theta_elbow)
-        shoulder_cts = self.rad_to_counts(self.SHOULDER, theta_shoulder)
+        elbow_cts, shoulder_cts = self.location_cache.xy_counts(x, y, pipette_tip_offset, shoulder_preference)
+        self.log(elbow_cts, shoulder_cts)
+        return self.move_sync(self.ELBOW, self.SHOULDER, elbow_cts, shoulder_cts, vel, accel, wait)
+
+    def move_cell(self, module, index, pipette_tip_offset=False, shoulder_preference=n9.SHOULDER_CENTER,
+                  vel=None, accel=None, wait=True):
+        """
+        Move over one grid cell of a project module, with joint counts from the location cache.
+
+        :param module: NorthModule, module id or name
+        :param int index: grid cell, numbered as in the module's fill_range
+        """
+        elbow_cts, shoulder_cts = self.location_cache.cell_counts(module, index, pipette_tip_offset,
+                                                                  shoulder_preference)
         self.log(elbow_cts, shoulder_cts)
         return self.move_sync(self.ELBOW, self.SHOULDER, elbow_cts, shoulder_cts, vel, accel, wait)
 
+    def move_sequence(self, waypoints=(), strategy=None):
+        """
+        Queue moves to run back to back under one token, see MotionSequence.
+
+        :param waypoints: [(method name, *args[, kwargs]), ...], more steps can be added to the result
+        :return: MotionSequence, start it with run()
+        """
+        return MotionSequence(self, waypoints, strategy)
+
     def move_xyz(self, x, y, z, tool_offset=None, tool_orientation=None,
                  pipette_tip_offset=False, shoulder_preference = n9.SHOULDER_CENTER, vel=None, accel=None, wait=True):
         if tool_offset is None: tool_offset = [0, 0, 0]
@@ -889,17 +1220,30 @@ class NorthC9:
     # This architecture is in place to allow the class to store the previous cmd token, so c9.wait_for() would
     # obviate the need to manually store the previous cmd
 
-    def new_cmd_token(self, func, value, axis=None, wait=True, delay=0):
-        tkn = CmdToken(func, value, axis, delay, self.sim)
+    def new_cmd_token(self, func, value, axis=None, wait=True, delay=0, strategy=None):
+        # tokens with a delay (pumps) keep polling at that delay, the rest use wait_strategy
+        if strategy is None and not delay:
+            strategy = self.wait_strategy
+        tkn = CmdToken(func, value, axis, delay, self.sim, self.executor, strategy)
         self.prev_cmd_token = tkn
         if wait:
             tkn.wait()
         return tkn
 
-    def wait_for(self, tkn: CmdToken = None):
+    def wait_for(self, tkn: CmdToken = None, strategy=None):
         if tkn is None:
             tkn = self.prev_cmd_token
-        tkn.wait()
+        tkn.wait(strategy)
+
+    @staticmethod
+    def wait_all(tokens, strategy=None):
+        """Wait for all tokens (of any controllers), polling them together, see north_c9.wait_all."""
+        return wait_all(tokens, strategy)
+
+    @staticmethod
+    def wait_any(tokens, strategy=None):
+        """Wait for the first of several tokens, see north_c9.wait_any."""
+        return wait_any(tokens, strategy)
 
     def cmd_done(self, token: CmdToken = None):
         if token is None:
@@ -1380,10 +1724,271 @@ class NorthC9:
         return int(math.copysign((MAX_JOINT_SPEED - MIN_JOINT_SPEED) / (MAX_JOY_VAL * (1 - DEADZONE_PERCENT)) * \
                                  (abs(val) - MAX_JOY_VAL * DEADZONE_PERCENT) + MIN_JOINT_SPEED, val))
 
+def _dry_run_worker(func, args):
+    """NorthC9.estimate_times job, run in a worker process with the simulated NorthC9 of func's module."""
+    for value in func.__globals__.values():
+        if isinstance(value, NorthC9) and value.has_simulator:
+            return value._dry_run(func, args)
+    raise LookupError(f'no simulated NorthC9 in the module of {func.__name__}')
+
+
+class PacketBatch:
+    """
+    Requests queued by NorthC9.batch(). Every send_packet returns a Future that is resolved with
+    the parsed response args (or the controller error) when the batch is flushed.
+    """
+
+    def __init__(self, c9, max_batch=None):
+        self.c9 = c9
+        self.max_batch = max_batch or getattr(c9.network, 'MAX_BATCH', 1)
+        self.items = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def send_packet(self, command, args_list=[], broadcast=False, wait=True) -> Future:
+        request_bytes, expect_response = self.c9._build_request(command, args_list, broadcast, wait)
+        future = Future()
+        self.items.append((request_bytes, expect_response, future, command))
+        return future
+
+    def flush(self):
+        items, self.items = self.items, []
+        self.c9._flush_batch(items, self.max_batch)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            for _, _, future, _ in self.items:
+                future.cancel()
+            self.items = []
+
+
+class MotionSequence:
+    """
+    Moves run back to back by a background thread, tracked by one token. Steps are recorded with the NorthC9
+    method names (any method with a `wait` argument) and each is sent the moment the previous one reports done,
+    so the script does not stop and poll between segments or sleep to let the robot settle:
+
+        seq = c9.move_sequence()
+        for wafer_pos in wafers:
+            seq.move_xy(*wafer_pos).move_z(159.5).move_z(168)
+        seq.run()                        # or tkn = seq.run(wait=False) ... c9.wait_for(tkn)
+
+    Intended pauses are explicit steps, see dwell().
+    """
+
+    def __init__(self, c9, waypoints=(), strategy=None):
+        """
+        :param waypoints: steps as (method name, *args), with an optional kwargs dict last,
+            e.g. [('move_xy', 100, 50), ('move_z', 160, {'vel': 5000})]
+        :param strategy: poll spacing while a segment moves, the controller's wait_strategy by default
+        """
+        self.c9 = c9
+        self.strategy = strategy
+        self.steps = []
+        self.current = None  # index of the step in progress
+        self.error = None
+        self.done = threading.Event()
+        self._thread = None
+        for waypoint in waypoints:
+            name, *args = waypoint
+            kwargs = args.pop() if args and isinstance(args[-1], dict) else {}
+            getattr(self, name)(*args, **kwargs)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __getattr__(self, name):
+        func = getattr(self.c9, name)
+        if not callable(func) or 'wait' not in signature(func).parameters:
+            raise AttributeError(f'MotionSequence: {name} is not a motion command')
+
+        def step(*args, **kwargs):
+            kwargs.pop('wait', None)
+            self.steps.append((name, args, kwargs))
+            return self
+        return step
+
+    def dwell(self, seconds):
+        """Pause between two moves, e.g. to let a tool act, without ending the sequence."""
+        self.steps.append(('dwell', (seconds,), {}))
+        return self
+
+    def _lookahead(self):
+        # solve the IK of every move_xy target in one vectorized call before the first segment starts
+        targets = {}
+        for name, args, kwargs in self.steps:
+            if name == 'move_xy' and len(args) == 2:
+                variant = (kwargs.get('pipette_tip_offset', False),
+                           kwargs.get('shoulder_preference', n9.SHOULDER_CENTER))
+                targets.setdefault(variant, []).append(args)
+        for (tip, preference), points in targets.items():
+            self.c9.location_cache.warm(points, tip, preference)
+
+    def _run(self):
+        try:
+            for self.current, (name, args, kwargs) in enumerate(self.steps):
+                if name == 'dwell':
+                    self.c9.delay(args[0])  # simulated time in sim, like the moves around it
+                    continue
+                tkn = getattr(self.c9, name)(*args, wait=False, **kwargs)
+                if isinstance(tkn, CmdToken):
+                    tkn.wait(self.strategy)
+        except BaseException as e:  # includes the SystemExit of a quick stop
+            self.error = e
+        finally:
+            self.done.set()
+
+    def _status(self):
+        if not self.done.is_set():
+            return False
+        if self.error is not None:
+            raise RuntimeError(f'MotionSequence stopped at step {self.current}: {self.error!r}') from self.error
+        return True
+
+    def run(self, wait=True):
+        """
+        Start the sequence. Can only be run once.
+
+        :return: CmdToken done once the last step is done; waiting on it raises if a step failed
+        """
+        if self._thread is not None:
+            raise RuntimeError('MotionSequence: already started')
+        self._lookahead()
+        # the context carries the caller's scheduler task, so the moves are simulated as part of that task
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run,), name='c9-motion',
+                                        daemon=True)
+        self._thread.start()
+        tkn = SequenceToken(self)
+        self.c9.prev_cmd_token = tkn
+        if wait:
+            tkn.wait()
+        return tkn
+
+
+class SequenceToken(CmdToken):
+    """Token of a MotionSequence. wait() blocks on the sequence's event instead of polling."""
+
+    def __init__(self, sequence):
+        super().__init__(sequence._status, True, sim=sequence.c9.sim, executor=sequence.c9.executor,
+                         strategy=BackoffPoll())
+        self.sequence = sequence
+
+    def wait(self, strategy=None):
+        self.sequence.done.wait()
+        self.is_done()
+
+
+class SerialTransport:
+    """
+    Owns all traffic on one controller network. Requests from any thread (user code, the quick stop hotkey,
+    the joystick loop, AsyncNorthC9 workers) are queued and performed in turn by a single I/O thread, so
+    packets never interleave and waiting callers block on a Future instead of spinning.
+
+    Requests are served by priority, then in order of arrival. A STOP request jumps the queue and fails every
+    request still waiting with CancelledError, so nothing queued before the stop is sent after it.
+    """
+
+    STOP = 0
+    NORMAL = 1
+
+    def __init__(self, network):
+        """
+        :param BaseControllerNetwork network:
+        """
+        self.network = network
+        self._cond = threading.Condition()
+        self._queue = []  # heap of (priority, seq, func, args, future)
+        self._seq = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='c9-io', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def of(cls, network):
+        """
+        :return: the transport of network, created on first use. Controllers sharing a network share it.
+        """
+        transport = getattr(network, 'transport', None)
+        if transport is None or transport._closed:
+            transport = cls(network)
+            network.transport = transport
+        return transport
+
+    def submit(self, func, *args, priority=NORMAL) -> Future:
+        """
+        Queue func(*args) to run on the I/O thread, e.g. submit(network.send, data, True).
+
+        :return: Future with the return value (or exception) of func
+        """
+        future = Future()
+        if threading.current_thread() is self._thread:  # re-entrant call, run it right away
+            self._call(func, args, future)
+            return future
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('NorthC9: transport is closed')
+            if priority == self.STOP:
+                for item in self._queue:
+                    item[4].cancel()
+                self._queue = []
+            heapq.heappush(self._queue, (priority, self._seq, func, args, future))
+            self._seq += 1
+            self._cond.notify()
+        return future
+
+    def call(self, func, *args, priority=NORMAL):
+        """Blocking version of submit()."""
+        return self.submit(func, *args, priority=priority).result()
+
+    @staticmethod
+    def _call(func, args, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                _, _, func, args, future = heapq.heappop(self._queue)
+            self._call(func, args, future)
+
+    def pending(self):
+        with self._cond:
+            return len(self._queue)
+
+    def close(self):
+        """Finish the queued requests, then stop the I/O thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
+
 class BaseControllerNetwork(ABC): # interface for network classes
     @abstractmethod
     def disconnect(self):
         raise NotImplementedError()
+
+    def close_transport(self):
+        """Stop the SerialTransport of this network once the requests already queued are sent, see disconnect()."""
+        transport = getattr(self, 'transport', None)
+        if transport is not None:
+            transport.close()
     @abstractmethod
     def time(self): raise NotImplementedError()
     @abstractmethod
@@ -1395,14 +2000,57 @@ class BaseControllerNetwork(ABC): # interface for network classes
         """
         raise NotImplementedError()
 
+    # requests written before reading their responses. More than 1 pipelines them, which is only safe when the
+    # controller firmware documents a request buffer of at least that depth: enable it per network with
+    # max_batch=... (or per call with NorthC9.batch(max_batch)) after checking the firmware release notes.
+    MAX_BATCH = 1
+
+    def send_many(self, requests, expect_responses):
+        """
+        :param [bytes] requests: Messages to controller, in order.
+        :param [bool] expect_responses: one flag per message
+        :return: one response (or the exception that prevented it) per message
+        """
+        results = []
+        for data, expect_response in zip(requests, expect_responses):
+            try:
+                results.append(self.send(data, expect_response=expect_response))
+            except Exception as e:
+                results.append(e)
+        return results
+
+def _read_responses(network, expect_responses, discard_input):
+    """
+    Read one response per request written by send_many. After a failed read the remaining
+    responses can no longer be matched to their requests, so they all get that error.
+    """
+    results = []
+    for expect_response in expect_responses:
+        if not expect_response:
+            results.append(b'')
+            continue
+        try:
+            results.append(network._read_response())
+        except Exception as e:
+            discard_input()
+            results += [e] * (len(expect_responses) - len(results))
+            break
+    return results
+
+
 class FTDISerialControllerNetwork(BaseControllerNetwork):
 
     MAX_RESP_LEN = 1024
     TIMEOUT = 0.6 # pumps need ~500ms timeout in FW, so this should be larger
 
-    def __init__(self, network=None, network_serial:str=None):
+    def __init__(self, network=None, network_serial:str=None, max_batch=None):
+        """
+        :param int max_batch: requests pipelined per write, see BaseControllerNetwork.MAX_BATCH
+        """
         if network_serial == '':
             network_serial = None
+        if max_batch is not None:
+            self.MAX_BATCH = max_batch
 
         self.network = network
         if self.network is None:
@@ -1412,6 +2060,7 @@ class FTDISerialControllerNetwork(BaseControllerNetwork):
                 logging.error('NorthC9: Tried to initialize network without FTDI support.')
 
     def disconnect(self):
+        self.close_transport()
         self.network.disconnect()
 
     @property
@@ -1432,24 +2081,35 @@ class FTDISerialControllerNetwork(BaseControllerNetwork):
         if not expect_response:
             return b''
 
+        return self._read_response()
+
+    def send_many(self, requests, expect_responses):
+        """
+        Write all requests in one go, then read the responses in order.
+        """
+        self.network.flush()
+        self.network.write(b''.join(data + build_crc(data) for data in requests))
+        return _read_responses(self, expect_responses, self.network.flush)
+
+    def _read_response(self) -> bytes:
         packet_len = self.network.read(1, self.TIMEOUT)
         response_bytes = packet_len + self.network.read(int.from_bytes(packet_len, 'big') - 1, 0.2)
 
         if not response_bytes:
             print("No response...")
-            raise IOError
+            raise C9NoResponse('No response from controller')
 
         if len(response_bytes) >= self.MAX_RESP_LEN:
             print("Response overflow")
-            raise IOError
+            raise C9CommError('Response overflow')
 
         resp_crc = response_bytes[-2:]
-        calc_crc = build_crc(response_bytes[:-2])  # CRC check excludes only CRC bytes
+        calc_crc = build_crc(memoryview(response_bytes)[:-2])  # CRC check excludes only CRC bytes
 
         if calc_crc != resp_crc:
             print("CRC Error...")
             print(response_bytes)
-            raise IOError
+            raise C9CrcError('Response CRC mismatch')
 
         #print(response_bytes[1:-2])
 
@@ -1460,16 +2120,21 @@ class GenericSerialControllerNetwork(BaseControllerNetwork):
     MAX_RESP_LEN = 1024
     TIMEOUT = 0.6 # pumps need ~500ms timeout in FW, so this should be larger
 
-    def __init__(self, network=None, network_serial: str = None):
+    def __init__(self, network=None, network_serial: str = None, max_batch=None):
+        """
+        :param int max_batch: requests pipelined per write, see BaseControllerNetwork.MAX_BATCH
+        """
         if network_serial is None:
             raise RuntimeError ('Network serial parameter required for Generic Serial connections')
+        if max_batch is not None:
+            self.MAX_BATCH = max_batch
 
         self.network = network
         if self.network is None:
             self.network = serial.Serial(network_serial, 115200, timeout=0, parity=serial.PARITY_NONE)
 
     def disconnect(self):
-        pass # TODO?
+        self.close_transport()
 
     @property
     def time(self):
@@ -1484,6 +2149,19 @@ class GenericSerialControllerNetwork(BaseControllerNetwork):
 
         self.network.write(data)
 
+        if not expect_response:  # broadcasts (e.g. the quick stop) are not answered
+            return b''
+
+        return self._read_response()
+
+    def send_many(self, requests, expect_responses):
+        """
+        Write all requests in one go, then read the responses in order.
+        """
+        self.network.write(b''.join(data + build_crc(data) for data in requests))
+        return _read_responses(self, expect_responses, self.network.reset_input_buffer)
+
+    def _read_response(self) -> bytes:
         self.network.timeout = self.TIMEOUT
         packet_len = self.network.read(1)
         self.network.timeout = 0.2
@@ -1491,19 +2169,19 @@ class GenericSerialControllerNetwork(BaseControllerNetwork):
 
         if not response_bytes:
             print("No response...")
-            raise IOError
+            raise C9NoResponse('No response from controller')
 
         if len(response_bytes) >= self.MAX_RESP_LEN:
             print("Response overflow")
-            raise IOError
+            raise C9CommError('Response overflow')
 
         resp_crc = response_bytes[-2:]
-        calc_crc = build_crc(response_bytes[:-2])  # CRC check excludes only CRC bytes
+        calc_crc = build_crc(memoryview(response_bytes)[:-2])  # CRC check excludes only CRC bytes
 
         if calc_crc != resp_crc:
             print("CRC Error...")
             print(response_bytes)
-            raise IOError
+            raise C9CrcError('Response CRC mismatch')
 
         return response_bytes[1:-2] # response excludes leading packet len byte and trailing CRC
 
@@ -1580,16 +2258,75 @@ def build_crc16_table():
     return result
 
 
+def build_crc16_word_table(table):
+    # entry i is the register after all 16 bits of i were shifted through, so one lookup consumes two bytes
+    result = []
+    for word in range(0x10000):
+        crc = (word >> 8) ^ table[word & 0xff]
+        result.append((crc >> 8) ^ table[crc & 0xff])
+    return result
+
+
 crc16_table = build_crc16_table()
+crc16_word_table = None  # 64K entries, built on the first crc16_words call so crcmod users never pay for it
 
 
-def build_crc(data: bytes) -> bytes:
+def crc16_bytewise(data: bytes) -> int:
     crc = 0xffff
     for a in data:
         idx = crc16_table[(crc ^ a) & 0xff]
         crc = ((crc >> 8) & 0xff) ^ idx
+    return crc
+
+
+def crc16_words(data: bytes) -> int:
+    """
+    CRC16 (Modbus) of data, reading it two bytes at a time through a memoryview.
+    """
+    global crc16_word_table
+    view = memoryview(data)
+    even = len(view) & ~1
+    crc = 0xffff
+    if even:
+        table = crc16_word_table
+        if table is None:  # two threads racing here just build the same table twice
+            table = crc16_word_table = build_crc16_word_table(crc16_table)
+        for word in view[:even].cast('H'):  # native order, little endian only (see CRC_BACKEND)
+            crc = table[crc ^ word]
+    for a in view[even:]:
+        crc = (crc >> 8) ^ crc16_table[(crc ^ a) & 0xff]
+    return crc
+
+
+# pick the fastest CRC implementation available on this machine
+try:
+    from crcmod import mkCrcFun
+    import crcmod._crcfunext  # only crcmod's C extension is faster than crc16_words
+    crc16 = mkCrcFun(0x18005, rev=True, initCrc=0xffff, xorOut=0x0000)
+    CRC_BACKEND = 'crcmod'
+except ImportError:
+    if sys.byteorder == 'little':
+        crc16 = crc16_words
+        CRC_BACKEND = 'words'
+    else:
+        crc16 = crc16_bytewise
+        CRC_BACKEND = 'bytewise'
+
+
+def build_crc(data: bytes) -> bytes:
+    return crc16(data).to_bytes(2, 'little')
+
+
+class C9CommError(IOError):
+    pass
+
+
+class C9NoResponse(C9CommError):
+    pass
+
 
-    return crc.to_bytes(2, 'little')
+class C9CrcError(C9CommError):
+    pass
 
 
 class C9Errors:
@@ -1,22 +1,34 @@
-from collections import deque
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import heapq
 import inspect
+import itertools
 import logging
+import threading
 from sortedcontainers import SortedList
+from time import time
 
 from typing import Callable
 
 from north import NorthC9
+from north.n9_durations import DurationStore
+
+# Task whose step runs in this context. A context var rather than a thread local, so threads started from a step
+# with the step's context (MotionSequence) still report the task.
+current_task = contextvars.ContextVar('current_task', default=None)
 
 class Task:
 
     # todo: support *args, **kwargs
-    def __init__(self, task_id, func, max_t=-1, priority=1, child=False, args=None):
+    def __init__(self, task_id, func, max_t=-1, priority=1, child=False, args=None, resources=()):
         """
 
         :param int task_id:
         :param Callable func:
         :param int max_t:
         :param priority:
+        :param resources: names of the controllers/entities the task uses, see MultiScheduler
         """
         self.name = func.__name__
         self.task_id = task_id
@@ -27,13 +39,16 @@ class Task:
         if args is None:
             args = []
 
+        self.args = args
         self.gen = self.gen_func(*args)
+        self.step = -1  # index of the last step started, see DurationStore
 #        else:
 #            self.func = func
 #            self.gen = None
         self._max_t = max_t
         self.times_hist = []
         self.priority = priority
+        self.resources = tuple(resources)
         self.resume_t = None
         self._desired_resume_t = None
 
@@ -44,6 +59,7 @@ class Task:
 #            return self.func(*self.args)
         self._desired_resume_t = 0
         self.resume_t = 0
+        self.step += 1
         return next(self.gen)
 
     def __repr__(self):
@@ -85,66 +101,474 @@ class Task:
             yield func(*args, **kwargs)
         return wrapped
 
-#todo - scheduler should be able to schedule schedulers
+class IntervalPlanner:
+    """
+    Scheduled tasks as non-overlapping [resume_t, end_t) slots, kept sorted by resume_t.
+
+    A task gets the first free slot from its desired_resume_t on, ignoring tasks of lower priority: those are displaced
+    and placed again after it. Every priority level keeps the free gaps between the tasks of that priority or higher,
+    so placing a task only steps over gaps that are too short for it, never over every scheduled task.
+    Placed tasks keep their slot until they are displaced or removed, they are not pulled earlier when one frees up.
+    """
+
+    INF = float('inf')
+
+    def __init__(self):
+        self._entries = SortedList()  # (resume_t, seq, end_t, task)
+        self._by_task = {}  # task -> its entry
+        self._gaps = {}  # priority -> SortedList of free (start, end) between tasks of that priority or higher
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return (entry[3] for entry in self._entries)
+
+    def __getitem__(self, i):
+        return self._entries[i][3]
 
-class Scheduler:
-    
-    def __init__(self, c9, verbose=False):
+    def __delitem__(self, i):
+        self.remove(self._entries[i][3])
+
+    def __contains__(self, task):
+        return task in self._by_task
+
+    def add(self, task):
         """
-        Scheduler class.
+        Place task from its desired_resume_t, displacing lower priority tasks in the way.
 
-        :param NorthC9 c9: The controller object you'd like to schedule over.
+        :param Task task:
         """
-        assert isinstance(c9, NorthC9)
-        assert not c9.has_scheduler
-        self.controller = c9
-        c9._scheduler = self
+        pending = [(-task.priority, task.desired_resume_t, next(self._seq), task)]
+        while pending:
+            _, _, _, task = heapq.heappop(pending)
+            for displaced in self.reserve(task, self.earliest(task, task.desired_resume_t)):
+                heapq.heappush(pending, (-displaced.priority, displaced.desired_resume_t, next(self._seq), displaced))
+
+    def earliest(self, task, t):
+        """
+        :return: start of the first slot from t that is long enough for task, among tasks it cannot displace
+        """
+        return self._first_fit(self._level(task.priority), t, self._duration(task))
+
+    def remove(self, task):
+        start, _, end, _ = entry = self._by_task.pop(task)
+        self._entries.remove(entry)
+        if end > start:
+            for priority, gaps in self._gaps.items():
+                if priority <= task.priority:
+                    self._release(gaps, start, end)
+
+    def reserve(self, task, start):
+        """
+        Put task at start, which must come from earliest().
+
+        :return: [Task] lower priority tasks overlapping the new slot, already removed
+        """
+        duration = self._duration(task)
+        end = start + duration
+        displaced = self._overlapping(start, end)
+        for other in displaced:
+            self.remove(other)
+
+        task.resume_t = start
+        entry = (start, next(self._seq), end, task)
+        self._entries.add(entry)
+        self._by_task[task] = entry
+        if duration:
+            for priority, gaps in self._gaps.items():
+                if priority <= task.priority:
+                    self._occupy(gaps, start, end)
+        return displaced
+
+    @staticmethod
+    def _duration(task):
+        return max(task.max_t or 0, 0)  # children scheduled without a max_t take no time
+
+    def _level(self, priority):
+        gaps = self._gaps.get(priority)
+        if gaps is None:  # first task of this priority, collect the gaps left by the tasks it cannot displace
+            gaps = self._gaps[priority] = SortedList()
+            free_from = -self.INF
+            for start, _, end, task in self._entries:
+                if task.priority >= priority and end > start:
+                    if start > free_from:
+                        gaps.add((free_from, start))
+                    free_from = end
+            gaps.add((free_from, self.INF))
+        return gaps
+
+    def _first_fit(self, gaps, t, duration):
+        i = max(gaps.bisect_right((t, self.INF)) - 1, 0)  # the gap holding t, or the first one after it
+        while True:
+            gap_start, gap_end = gaps[i]
+            start = max(gap_start, t)
+            if start + duration <= gap_end and start < gap_end:
+                return start
+            i += 1
+
+    def _overlapping(self, start, end):
+        # slots never overlap each other, so walk back from the last one starting before `end`. Zero length slots
+        # take no time, they may sit inside any other slot and are never displaced.
+        tasks = []
+        i = self._entries.bisect_left((end,)) - 1
+        while i >= 0:
+            entry_start, _, entry_end, task = self._entries[i]
+            if entry_end > entry_start:
+                if entry_end <= start:
+                    break
+                tasks.append(task)
+            i -= 1
+        return tasks
+
+    @staticmethod
+    def _occupy(gaps, start, end):
+        i = gaps.bisect_right((start, IntervalPlanner.INF)) - 1
+        gap_start, gap_end = gaps.pop(i)
+        if gap_start < start:
+            gaps.add((gap_start, start))
+        if end < gap_end:
+            gaps.add((end, gap_end))
+
+    @staticmethod
+    def _release(gaps, start, end):
+        i = gaps.bisect_left((end,))
+        if i < len(gaps) and gaps[i][0] == end:
+            end = gaps.pop(i)[1]
+        i = gaps.bisect_left((start,)) - 1
+        if i >= 0 and gaps[i][1] == start:
+            start = gaps.pop(i)[0]
+        gaps.add((start, end))
+
+
+class BackgroundQueue:
+    """
+    Background tasks grouped by max_t. They are run round-robin: with no deadline ahead the oldest one, before a
+    scheduled task the oldest one that still fits the idle window, as Scheduler always did. The max_t index only
+    spares walking the tasks that do not fit.
+    """
+
+    def __init__(self, seq=None):
+        """
+        :param seq: itertools.count to number the queued tasks with, share one to compare oldest() across queues
+        """
+        self._max_ts = SortedList()  # max_t of every non-empty bucket
+        self._buckets = {}  # max_t -> deque of (max_t, seq, task), oldest first
+        self._by_seq = OrderedDict()  # seq -> entry, in queue order
+        self._seq = seq if seq is not None else itertools.count()
+
+    def __len__(self):
+        return len(self._by_seq)
+
+    def __iter__(self):
+        return (entry[2] for entry in self._by_seq.values())
+
+    def oldest(self):
+        """:return: number of the task queued longest, inf if empty"""
+        return next(iter(self._by_seq), float('inf'))
+
+    def append(self, task):
+        entry = (task.max_t or 0, next(self._seq), task)
+        bucket = self._buckets.get(entry[0])
+        if bucket is None:
+            bucket = self._buckets[entry[0]] = deque()
+            self._max_ts.add(entry[0])
+        bucket.append(entry)
+        self._by_seq[entry[1]] = entry
+
+    def _pop_head(self, max_t):
+        bucket = self._buckets[max_t]
+        entry = bucket.popleft()
+        if not bucket:
+            del self._buckets[max_t]
+            self._max_ts.remove(max_t)
+        del self._by_seq[entry[1]]
+        return entry[2]
+
+    def popleft(self):
+        return self._pop_head(next(iter(self._by_seq.values()))[0])
+
+    def pop_fitting(self, window):
+        """
+        :param float window: seconds until the next scheduled task
+        :return: the oldest task with max_t < window, None if none fits
+        """
+        fitting = self._max_ts[:self._max_ts.bisect_left(window)]
+        if not fitting:
+            return None
+        return self._pop_head(min(fitting, key=lambda max_t: self._buckets[max_t][0][1]))
+
+
+class BaseScheduler:
+
+    def __init__(self, durations, verbose=False):
+        """
+        State shared by Scheduler and MultiScheduler: the tasks, their ids and max_t estimates, and run()'s flags.
+
+        :param DurationStore durations: step durations learned from real runs
+        """
+        self.durations = durations
 
         self._tasks = {}
-        self._scheduled = SortedList(key=lambda task: task.resume_t)  # tasks to resume, sorted by increasing resume_t
-        self._bg_q = deque()  # a queue of background tasks run in round-robin style as they fit
+        self._auto = []  # (task, controller, safe_factor) still waiting for a max_t estimate
         self._running = False
+        self._wake = threading.Event()  # cuts an idle wait short, see stop() and add_task()
         self._next_id = 0
+        self._lock = threading.Lock()  # guards _inbox and the task ids, add_task may be called from other threads
+        self._inbox = []  # (task, controller, safe_factor) added while running, taken in by the run loop
+        self._looping = False  # run() owns the queues, stays set after stop() until the loop has returned
 
         self._id_name_d = {}
 
-        self._cur_task = None
-
-        self.verbose=verbose
+        self.verbose = verbose
 
     def vprint(self, *args):
         if self.verbose:
             print(*args)
 
     def _get_next_id(self, func_name=None):
-        if func_name is None:
+        with self._lock:
+            if func_name is None:
+                self._next_id += 1
+                return self._next_id
+
+            if func_name in self._id_name_d:
+                return self._id_name_d[func_name]
+
             self._next_id += 1
+            self._id_name_d[func_name] = self._next_id
             return self._next_id
 
-        if func_name in self._id_name_d:
-            return self._id_name_d[func_name]
+    def _submit(self, task, controller, safe_factor):
+        """
+        Add a task made by add_task. While run() is looping only the loop touches the queues, so the task waits in
+        the inbox until the loop takes it in (see _take_inbox), whichever thread add_task was called from.
+        """
+        with self._lock:
+            if self._looping:
+                self._inbox.append((task, controller, safe_factor))
+                self._wake.set()
+                return task
+            self._add(task, controller, safe_factor)
+        return task
+
+    def _add(self, task, controller, safe_factor):
+        self._tasks[task.task_id] = task
+        if controller is not None:
+            self._auto.append((task, controller, safe_factor))
+
+    def _take_inbox(self):
+        """Add the tasks add_task received while running and queue them. Run loop only."""
+        with self._lock:
+            added, self._inbox = self._inbox, []
+        for task, controller, safe_factor in added:
+            self._add(task, controller, safe_factor)
+        if added:
+            self.estimate_pending()
+            for task, _, _ in added:
+                if not task.child:
+                    self._requeue(task)
+
+    def _start_loop(self):
+        with self._lock:
+            self._running = self._looping = True
+        self._wake.clear()
+
+    def _end_loop(self):
+        with self._lock:
+            self._running = self._looping = False
+            added, self._inbox = self._inbox, []
+        for task, controller, safe_factor in added:  # kept for the next run
+            self._add(task, controller, safe_factor)
+
+    def estimate_pending(self, processes=None):
+        """
+        Give every task added with max_t='auto' its max_t: the p95 duration of its longest step in real runs once
+        enough were recorded (see DurationStore), otherwise a dry run estimate. The dry runs of all tasks are done at once (in
+        parallel processes and memoized, see NorthC9.estimate_times). run() calls this, call it earlier to see the
+        estimates.
+
+        :param processes: number of worker processes, None for one per CPU, 0 to estimate serially
+        """
+        pending, self._auto = self._auto, []
+        by_controller = {}
+        for task, controller, safe_factor in pending:
+            learned = self.durations.estimate(task.func, task.args)
+            if learned is not None:
+                task.max_t = learned + safe_factor * learned
+                print(f"Assigned task {task.task_id}: {task.name} a max_t of {task.max_t}s "
+                      f"(from {self.durations.stats(task.func, task.args)[0].count} recorded runs)")
+                continue
+            by_controller.setdefault(controller, []).append((task, safe_factor))
+        for controller, items in by_controller.items():
+            estimates = controller.estimate_times([(task.func, task.args) for task, _ in items], processes)
+            for (task, safe_factor), estimate in zip(items, estimates):
+                task.max_t = estimate + safe_factor * estimate
+                print(f"Assigned task {task.task_id}: {task.name} a max_t of {task.max_t}s")
+
+    @staticmethod
+    def duplicate_task(task, new_args=None):
+        if new_args is None:
+            new_args = []
+        return Task(task_id=task.task_id,
+                    func=task.func,
+                    max_t=task.max_t,
+                    priority=task.priority,
+                    child=task.child,
+                    args=new_args,
+                    resources=task.resources)
+
+    def stop(self):
+        """Stop run() after the current task step, e.g. from another thread."""
+        self._running = False
+        self._wake.set()
+
+    def _save_durations(self):
+        if self.durations.path is not None:
+            try:
+                self.durations.save()
+            except OSError as e:
+                logging.warning(f'Scheduler: could not save task durations ({e})')
+
+    def _record(self, task, seconds, finished=False):
+        # the step that ends a plain function task only raises StopIteration, there is nothing to learn from it
+        if finished and task.func is not task.gen_func:
+            return
+        self.durations.record(task.func, task.args, task.step, seconds)
+
+    def _handle_result(self, task, result):
+        """
+        :param Task task: task that just yielded
+        :param result: what it yielded, signals are acted upon
+        """
+        #parse response
+        try:
+            len(result)
+        except TypeError:
+            result = [result]
+
+        is_scheduled = False
+
+        for r in result:
+            if isinstance(r, ResumeInSignal):
+                resume_t = r.wait_t + self._get_time()
+                self._schedule_task(resume_t, task)  # add as scheduled task
+                is_scheduled = True
+                self.vprint(f'scheduling {task.name} at time {"%.3f" % resume_t}')
+            elif isinstance(r, MaxTimeSignal):
+                task.max_t = r.max_t
+            elif isinstance(r, ScheduleChild):
+                resume_t = r.wait_t + self._get_time()
+                child_id = self._get_next_id(r.func.__name__)
+                if child_id in self._tasks:
+                    self.vprint(f"using previous task with id {child_id}")
+                    child_task = self.duplicate_task(self._tasks[child_id], new_args=r.args)
+                    child_task.priority = task.priority
+                    if r.max_t is not None:
+                        child_task.max_t = r.max_t
+                else:
+                    child_task = Task(child_id, r.func, r.max_t, task.priority, child=True, args=r.args)
+                child_task.resources = tuple(r.resources) if r.resources is not None else task.resources
+                self._schedule_task(resume_t, child_task)
+                self.vprint(f'scheduling {child_task.name} at time {"%.3f" % resume_t}')
+
+
+        # TODO: can child be scheduled in bg queue?
+        if not is_scheduled and not task.child:
+            self._requeue(task)  # requeue as background task
+           # self.vprint(f'BG queue added {task.name}')
+
+    def get_task(self):
+        """
+        :return: id of the task whose step runs in the caller's context (also on threads a step started with its
+            context, see current_task), -1 outside of tasks
+        """
+        task = current_task.get()
+        return task.task_id if task is not None else -1
+
+    # implemented by the schedulers, used by the methods above
+
+    def _requeue(self, task):
+        raise NotImplementedError()
+
+    def _schedule_task(self, new_resume_t, new_task):
+        raise NotImplementedError()
+
+    def _get_time(self):
+        raise NotImplementedError()
+
+    @staticmethod
+    def resume_in(secs):
+        """
+        :param float secs: Seconds to resume in.
+        :return: Resume in signal.
+        """
+        if secs < 0:
+            secs = 0
+        return ResumeInSignal(secs)
+
+    @staticmethod
+    def max_t(secs):
+        """
+        Update the max_t property of the current task
+
+        :param float secs: the maximum time before the next yield in seconds.
+        :return: Max time signal.
+        """
+        if secs < 0:
+            secs = 0
+        return MaxTimeSignal(secs)
+
+    @staticmethod
+    def schedule_child(*, func, max_t=None, resume_in, args=None, resources=None):
+        """
+        :param resources: for MultiScheduler, the resources of the child if not the same as the parent's
+        """
+        return ScheduleChild(func, max_t, resume_in, args, resources)
 
-        self._next_id += 1
-        self._id_name_d[func_name] = self._next_id
-        return self._next_id
+
+#todo - scheduler should be able to schedule schedulers
+
+class Scheduler(BaseScheduler):
+
+    def __init__(self, c9, verbose=False, durations=None):
+        """
+        Scheduler class.
+
+        :param NorthC9 c9: The controller object you'd like to schedule over.
+        :param DurationStore durations: step durations learned from real runs, by default the project's
+            task_durations.json (kept in memory only without a project)
+        """
+        assert isinstance(c9, NorthC9)
+        assert not c9.has_scheduler
+        super().__init__(durations if durations is not None else DurationStore(c9.proj if c9.has_project else None),
+                         verbose)
+        self.controller = c9
+        c9._scheduler = self
+
+        self._scheduled = IntervalPlanner()  # tasks to resume, sorted by increasing resume_t
+        self._bg_q = BackgroundQueue()  # background tasks, run round-robin style as they fit
 
     def add_task(self, func, max_t='auto', safe_factor=0.1, priority=1, child=False):
         """
         Add task to schedule.
 
         :param Callable func:
-        :param max_t:
+        :param max_t: seconds a step of the task may take, or 'auto' to estimate it
         :param float safe_margin:
         :param int priority:
+        :return: the Task. With max_t='auto' its max_t is None until estimate_pending() runs, which run() does for
+            all such tasks at once; call estimate_pending() first to read max_t before running.
+
+        Can be called while running, from a task or another thread: run() takes the task in before its next step.
         """
         assert isinstance(func, Callable)
         # handle automatic time estimates
         task_id = self._get_next_id()
 
         if max_t == 'auto':
-            max_t = self.controller._dry_run_func_est_time(func)
-            max_t += safe_factor * max_t
-            print(f"Assigned task {task_id}: {func.__name__} a max_t of {max_t}s")
+            max_t = None  # estimated with the other 'auto' tasks, see estimate_pending()
         else:
             #todo: maybe we want to set the default safe_factor to a string like 'default', so if it is explicitly set
             #      as 0.1 this warning will still be thrown out?
@@ -152,30 +576,18 @@ class Scheduler:
             if safe_factor != 0.1:
                 logging.warning("add_task: setting 'safe_margin' only affects automatic time estimates (max_t='auto')")
 
-        self._tasks[task_id] = Task(task_id, func, max_t=max_t, priority=priority, child=child)
-        return self._tasks[task_id]
-
-    @staticmethod
-    def duplicate_task(task, new_args=None):
-        if new_args is None:
-            new_args = []
-        return Task(task_id=task.task_id,
-                    func=task.func,
-                    max_t=task.max_t,
-                    priority=task.priority,
-                    child=task.child,
-                    args=new_args)
-
-    def get_task(self):
-        return self._cur_task.task_id if self._cur_task is not None else -1
+        task = Task(task_id, func, max_t=max_t, priority=priority, child=child)
+        return self._submit(task, self.controller if max_t is None else None, safe_factor)
 
     def run(self):
-        self._running = True
+        self.estimate_pending()
+        self._start_loop()
         for task in self._tasks.values():
             if not task.child:
                 self._bg_q.append(task)  # everything starts as a background task
 
         while self._running:
+            self._take_inbox()  # added while running, e.g. from within a task or another thread
             cur_t = self._get_time()
 
             #try running a scheduled task
@@ -191,27 +603,22 @@ class Scheduler:
 
             # try running a background task
             if self._bg_q:
-                if resume_t:  # see if any tasks can be run before the next scheduled task
-                    found_candidate = False
-                    for i in range(len(self._bg_q)):
-                        if self._bg_q[0].max_t + cur_t >= resume_t:
-                            self._bg_q.rotate(-1)  # rotate left
-                        else:
-                            found_candidate = True
-                            break
-                    if not found_candidate:
+                if resume_t:  # only a task that is done before the next scheduled task
+                    task = self._bg_q.pop_fitting(resume_t - cur_t)
+                    if task is None:
                         self._delay(resume_t - cur_t)  # wait until there's something ready to run
                         continue
-                task = self._bg_q.popleft()
+                else:
+                    task = self._bg_q.popleft()
                 self._do(task)
-            else:  # bg deque is empty
+            else:  # bg queue is empty
                 if not self._scheduled:  # if no scheduled tasks
                     break
                 else:
                     self._delay(resume_t - cur_t)   # wait until there's something ready to run
 
-        self._cur_task = None
-        self._running = False   # todo - some way to externally stop the scheduler
+        self._end_loop()
+        self._save_durations()
 
     def _do(self, task):
         """
@@ -220,51 +627,23 @@ class Scheduler:
 
         st = self._get_time()
 
+        token = current_task.set(task)
         try:
-            self._cur_task = task
             result = next(task)
-            self._cur_task = None
         except StopIteration:
-            self._cur_task = None
+            if not self.controller.sim:
+                self._record(task, self._get_time() - st, finished=True)
             return
+        finally:
+            current_task.reset(token)
 
+        if not self.controller.sim:  # simulated time says nothing new about the instruments
+            self._record(task, self._get_time() - st)
         self.vprint(f'Started {task.name}: {task} at time {"%.3f" % st}')
+        self._handle_result(task, result)
 
-        #parse response
-        try:
-            len(result)
-        except TypeError:
-            result = [result]
-
-        is_scheduled = False
-
-        for r in result:
-            if isinstance(r, ResumeInSignal):
-                resume_t = r.wait_t + self._get_time()
-                self._schedule_task(resume_t, task)  # add as scheduled task
-                is_scheduled = True
-                self.vprint(f'scheduling {task.name} at time {"%.3f" % resume_t}')
-            elif isinstance(r, MaxTimeSignal):
-                task.max_t = r.max_t
-            elif isinstance(r, ScheduleChild):
-                resume_t = r.wait_t + self._get_time()
-                child_id = self._get_next_id(r.func.__name__)
-                if child_id in self._tasks:
-                    self.vprint(f"using previous task with id {child_id}")
-                    child_task = self.duplicate_task(self._tasks[child_id], new_args=r.args)
-                    child_task.priority = task.priority
-                    if r.max_t is not None:
-                        child_task.max_t = r.max_t
-                else:
-                    child_task = Task(child_id, r.func, r.max_t, task.priority, child=True, args=r.args)
-                self._schedule_task(resume_t, child_task)
-                self.vprint(f'scheduling {child_task.name} at time {"%.3f" % resume_t}')
-
-
-        # TODO: can child be scheduled in bg queue?
-        if not is_scheduled and not task.child:
-            self._bg_q.append(task)  # requeue as background task
-           # self.vprint(f'BG queue added {task.name}')
+    def _requeue(self, task):
+        self._bg_q.append(task)
 
     def _schedule_task(self, new_resume_t, new_task):
         """
@@ -277,67 +656,228 @@ class Scheduler:
         new_task.desired_resume_t = new_resume_t
         self._scheduled.add(new_task)
 
-        #reorder all tasks according to resume time, respecting conflicts according to priority:
+    def _get_time(self):
+        return self.controller.current_time
 
-        priority_list = SortedList(key=lambda task: -task.priority, iterable=self._scheduled)  # todo: should this be maintained or made new every time?
-        for task in priority_list:
-            task.resume_t = task.desired_resume_t
+    def _delay(self, secs):
+        """
+        :param float secs: Seconds to delay for. A real wait ends early on stop() or a task added meanwhile.
+        """
 
-        new_schedule = SortedList(key=lambda task: task.resume_t)
+        self.vprint("waiting:", secs)
+        if self.controller.sim:
+            self.controller.delay(secs)  # advances the simulated clock
+            return
+        self._wake.wait(secs)
+        self._wake.clear()
 
-        # place tasks in the new schedule:
-        for task in priority_list:
-            for i, placed_task in enumerate(new_schedule):
-                if task.resume_t < placed_task.resume_t: # two cases: resume_t conflicts or not. If not, does end_t conflict?
-                    if i > 0:
-                        if task.resume_t < new_schedule[i-1].end_t: #if resume_t conflicts, push back the resume_t til higher priority task is done
-                            task.resume_t = new_schedule[i-1].end_t
-                    if task.end_t > placed_task.resume_t: # if end_t conflicts, push the resume_t further back and check next placed task
-                        task.resume_t = placed_task.end_t
-                    else:
-                        break
 
-            new_schedule.add(task)
+class MultiScheduler(BaseScheduler):
 
-        self._scheduled = new_schedule
+    def __init__(self, resources, verbose=False, durations=None):
+        """
+        Scheduler over several resources: NorthC9 controllers, and anything else a task must have to itself, such as
+        the MiR250 or UR5e entities. Tasks are written as for Scheduler and declare the resources they use; steps of
+        tasks that share no resource run at the same time on worker threads, so every instrument is kept busy
+        instead of one arm at a time. Each resource has its own IntervalPlanner, a task on several resources gets
+        the first slot that is free on all of them. Time is wall clock time.
+
+            sched = MultiScheduler({'n9_a': c9_a, 'n9_b': c9_b, 'ur5e': None})
+            sched.add_task(prep_vials, resources=['n9_a'], max_t=60)
+            sched.add_task(hand_over, resources=['n9_b', 'ur5e'], max_t=90)
+            sched.run()
+
+        :param resources: {name: NorthC9 or None for other resources}, or a list of names
+        :param DurationStore durations: step durations learned from real runs, by default the task_durations.json
+            of the first controller's project
+        """
+        if not isinstance(resources, dict):
+            resources = {name: None for name in resources}
+        self.resources = dict(resources)
+        if durations is None:
+            projects = [resource.proj for resource in self.resources.values()
+                        if isinstance(resource, NorthC9) and resource.has_project]
+            durations = DurationStore(projects[0] if projects else None)
+        super().__init__(durations, verbose)
+        for resource in self.resources.values():
+            if isinstance(resource, NorthC9):
+                assert not resource.has_scheduler
+                resource._scheduler = self
+
+        self._plans = {name: IntervalPlanner() for name in self.resources}  # scheduled tasks per resource
+        self._bg_qs = {}  # resources tuple -> BackgroundQueue of the tasks using exactly those
+        self._bg_seq = itertools.count()  # shared by the queues, so the longest waiting group goes first
+        self._seq = itertools.count()
+        self._busy = set()  # resources with a step in flight
+        self._steps = {}  # Future -> task, steps in flight
+
+    def add_task(self, func, resources, max_t='auto', safe_factor=0.1, priority=1, child=False, args=None):
+        """
+        Add task to schedule.
 
-    def _get_time(self):
-        return self.controller.current_time
+        :param Callable func:
+        :param resources: names of the resources the task uses. max_t='auto' needs exactly one NorthC9 among them.
+        :param max_t: seconds a step of the task may take, or 'auto' to estimate it
+        :param float safe_factor:
+        :param int priority:
+        :param args: arguments for func
+        :return: the Task, with max_t None until estimated when max_t='auto' (see Scheduler.add_task)
 
-    def _delay(self, secs):
-        """
-        :param float secs: Seconds to delay for.
+        Can be called from a running task: the task is handed to the run loop, which estimates its max_t and
+        queues it before starting the next steps.
         """
+        assert isinstance(func, Callable)
+        resources = tuple(resources)
+        unknown = [name for name in resources if name not in self.resources]
+        if not resources or unknown:
+            raise ValueError(f'MultiScheduler: task {func.__name__} needs known resources, got {list(resources)}')
+        task_id = self._get_next_id()
 
-        self.vprint("waiting:", secs)
-        self.controller.delay(secs)
+        controller = None
+        if max_t == 'auto':
+            controllers = [self.resources[name] for name in resources if isinstance(self.resources[name], NorthC9)]
+            if len(controllers) != 1:
+                raise ValueError(f"MultiScheduler: max_t='auto' needs one NorthC9 among the resources of "
+                                 f"{func.__name__}, give max_t instead")
+            controller = controllers[0]
+            max_t = None  # estimated with the other 'auto' tasks, see estimate_pending()
+        else:
+            assert type(max_t) in [int, float]
 
+        task = Task(task_id, func, max_t=max_t, priority=priority, child=child, args=args, resources=resources)
+        return self._submit(task, controller, safe_factor)  # steps run on worker threads, see _submit
 
-    @staticmethod
-    def resume_in(secs):
+    def run(self):
         """
-        :param float secs: Seconds to resume in.
-        :return: Resume in signal.
+        Run until no task is left, or stop() is called.
+        Raises the first exception of a task once the steps in flight are done.
         """
-        if secs < 0:
-            secs = 0
-        return ResumeInSignal(secs)
+        self.estimate_pending()
+        self._start_loop()
+        for task in self._tasks.values():
+            if not task.child:
+                self._requeue(task)  # everything starts as a background task
+
+        error = None
+        with ThreadPoolExecutor(max_workers=len(self.resources), thread_name_prefix='sched') as pool:
+            while True:
+                self._wake.clear()  # before collecting, so a step finishing from here on still wakes the wait below
+                self._take_inbox()
+                for future in [future for future in self._steps if future.done()]:
+                    task = self._steps.pop(future)
+                    self._busy.difference_update(task.resources)
+                    try:
+                        result, seconds = future.result()
+                    except Exception as e:
+                        error = error or e
+                        self._running = False
+                        continue
+                    if not self._simulated(task):  # simulated time says nothing new about the instruments
+                        self._record(task, seconds, finished=result is StopIteration)
+                    if result is not StopIteration:
+                        self._handle_result(task, result)
 
-    @staticmethod
-    def max_t(secs):
+                if self._running and self._dispatch(pool):
+                    continue
+                if not self._steps and (not self._running or not self._has_work()):
+                    break
+                self._wake.wait(self._idle_time() if self._running else None)
+
+        self._end_loop()
+        self._save_durations()
+        if error is not None:
+            raise error
+
+    def _simulated(self, task):
+        return any(isinstance(self.resources[name], NorthC9) and self.resources[name].sim for name in task.resources)
+
+    def _has_work(self):
+        return any(self._plans.values()) or any(self._bg_qs.values())
+
+    def _dispatch(self, pool):
         """
-        Update the max_t property of the current task
+        Start every step that can run now: due scheduled tasks first (earliest first), then background tasks
+        that are done before the next scheduled task on each of their resources.
 
-        :param float secs: the maximum time before the next yield in seconds.
-        :return: Max time signal.
+        :return: True if anything was started
         """
-        if secs < 0:
-            secs = 0
-        return MaxTimeSignal(secs)
+        now = self._get_time()
+        started = False
+        heads = {plan[0] for plan in self._plans.values() if plan and plan[0].resume_t <= now}
+        for task in sorted(heads, key=lambda task: task.resume_t):
+            if self._busy.isdisjoint(task.resources):
+                for name in task.resources:
+                    self._plans[name].remove(task)
+                self._start(pool, task)
+                started = True
+
+        for resources, queue in sorted(self._bg_qs.items(), key=lambda item: item[1].oldest()):
+            if not queue or not self._busy.isdisjoint(resources):
+                continue
+            window = min((self._plans[name][0].resume_t for name in resources if self._plans[name]),
+                         default=None)
+            task = queue.popleft() if window is None else queue.pop_fitting(window - now)
+            if task is not None:
+                self._start(pool, task)
+                started = True
+        return started
+
+    def _start(self, pool, task):
+        self._busy.update(task.resources)
+        self.vprint(f'Started {task.name}: {task} on {", ".join(task.resources)} at time {"%.3f" % self._get_time()}')
+        future = pool.submit(self._step, task)
+        self._steps[future] = task
+        future.add_done_callback(lambda _: self._wake.set())
+
+    def _step(self, task):
+        """:return: (what the task yielded or StopIteration, seconds the step took)"""
+        token = current_task.set(task)
+        st = self._get_time()
+        try:
+            result = next(task)
+        except StopIteration:
+            result = StopIteration
+        finally:
+            current_task.reset(token)
+        return result, self._get_time() - st
+
+    def _idle_time(self):
+        """:return: seconds until the next scheduled task is due, None to wait for a step to finish"""
+        now = self._get_time()
+        resume_ts = [plan[0].resume_t for plan in self._plans.values() if plan and plan[0].resume_t > now]
+        return min(resume_ts) - now if resume_ts else None  # due tasks wait for their resources to be freed
+
+    def _requeue(self, task):
+        queue = self._bg_qs.get(task.resources)
+        if queue is None:
+            queue = self._bg_qs[task.resources] = BackgroundQueue(self._bg_seq)
+        queue.append(task)
 
-    @staticmethod
-    def schedule_child(*, func, max_t=None, resume_in, args=None):
-        return ScheduleChild(func, max_t, resume_in, args)
+    def _schedule_task(self, new_resume_t, new_task):
+        """
+        Reserve the first slot from new_resume_t that is free on all resources of the task, displacing lower
+        priority tasks in the way (from all of their resources).
+        """
+        new_task.desired_resume_t = new_resume_t
+        pending = [(-new_task.priority, new_task.desired_resume_t, next(self._seq), new_task)]
+        while pending:
+            _, _, _, task = heapq.heappop(pending)
+            plans = [self._plans[name] for name in task.resources]
+            start = task.desired_resume_t
+            while True:
+                latest = max(plan.earliest(task, start) for plan in plans)
+                if latest == start:
+                    break
+                start = latest
+            displaced = dict.fromkeys(other for plan in plans for other in plan.reserve(task, start))
+            for other in displaced:
+                for name in other.resources:
+                    if other in self._plans[name]:
+                        self._plans[name].remove(other)
+                heapq.heappush(pending, (-other.priority, other.desired_resume_t, next(self._seq), other))
+
+    def _get_time(self):
+        return time()
 
 
 class ResumeInSignal:
@@ -351,10 +891,11 @@ class MaxTimeSignal:
         self.max_t = float(secs)
 
 class ScheduleChild:
-    def __init__(self, func, max_t, resume_in, args):
+    def __init__(self, func, max_t, resume_in, args, resources=None):
         assert type(resume_in) in [float, int]
         self.func = func
         self.max_t = max_t
         self.wait_t = resume_in
         self.args = args
+        self.resources = resources
 
@@ -0,0 +1,127 @@
+"""REST client for the MiR250 (API v2.0.0).
+
+One requests.Session per robot keeps the TCP connection alive between status polls, every
+call has a (connect, read) timeout, and failed connections are retried with exponential
+backoff. Only idempotent calls (GET, PUT, DELETE) are retried after the request reached
+the robot, so a mission is never queued twice.
+
+AsyncMiRClient wraps the same calls for asyncio, so one process can drive several robots
+concurrently:
+
+    async with AsyncMiRClient('192.168.12.20') as mir1, AsyncMiRClient('192.168.12.21') as mir2:
+        await asyncio.gather(mir1.queue_mission(a), mir2.queue_mission(b))
+"""
+import asyncio
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+AUTH = 'Basic RGlzdHJpYnV0b3I6NjJmMmYwZjFlZmYxMGQzMTUyYzk1ZjZmMDU5NjU3NmU0ODJiYjhlNDQ4MDY0MzNmNGNmOTI5NzkyODM0YjAxNA=='
+
+
+class MiRError(Exception):
+    pass
+
+
+class MiRClient:
+
+    def __init__(self, ip, auth=AUTH, timeout=(3, 10), retries=3, backoff=0.5, pool_size=4, base_url=None):
+        """
+        :param ip: robot address, e.g. '192.168.12.20' or '127.0.0.1:8080' for the mock
+        :param timeout: (connect, read) seconds for every request
+        :param retries: attempts after the first one
+        :param backoff: retry n waits backoff * 2 ** (n - 1) seconds
+        :param base_url: overrides http://<ip>/api/v2.0.0/
+        """
+        self.host = base_url or f'http://{ip}/api/v2.0.0/'
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['Content-Type'] = 'application/json'
+        self.session.headers['Authorization'] = auth
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                      backoff_factor=backoff, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset(['GET', 'PUT', 'DELETE']), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, url, **kwargs):
+        try:
+            response = self.session.request(method, self.host + url, timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise MiRError(f'MiR {method} {url} failed: {e}') from e
+        if not response.ok:
+            raise MiRError(f'MiR {method} {url} returned {response.status_code}: {response.text[:200]}')
+        return response.json() if response.content else None
+
+    def get(self, url):
+        return self.request('GET', url)
+
+    def post(self, url, body):
+        return self.request('POST', url, json=body)
+
+    def put(self, url, body):
+        return self.request('PUT', url, json=body)
+
+    def delete(self, url):
+        return self.request('DELETE', url)
+
+    def status(self):
+        """:return: robot status dict, e.g. state_text, battery_percentage, mission_text"""
+        return self.get('status')
+
+    def queue_mission(self, mission_id):
+        """:return: the new mission_queue entry, its 'id' identifies this run of the mission"""
+        return self.post('mission_queue', {'mission_id': mission_id})
+
+    def mission_queue_entry(self, entry_id):
+        """:return: dict with 'state' (Pending, Executing, Done, Aborted, ...) and 'message'"""
+        return self.get(f'mission_queue/{entry_id}')
+
+    def clear_mission_queue(self):
+        """Abort the running mission and drop the queued ones."""
+        return self.delete('mission_queue')
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncMiRClient:
+    """
+    asyncio front end of MiRClient. Each call runs on the default executor, so calls to
+    different robots (or a status poll next to a mission post) overlap instead of queueing.
+    """
+
+    def __init__(self, ip, **kwargs):
+        self.client = MiRClient(ip, **kwargs)
+
+    async def _call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def status(self):
+        return await self._call(self.client.status)
+
+    async def queue_mission(self, mission_id):
+        return await self._call(self.client.queue_mission, mission_id)
+
+    async def mission_queue_entry(self, entry_id):
+        return await self._call(self.client.mission_queue_entry, entry_id)
+
+    async def clear_mission_queue(self):
+        return await self._call(self.client.clear_mission_queue)
+
+    async def close(self):
+        self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -0,0 +1,92 @@
+"""Follow one MiR mission_queue entry until it is Done, Aborted or Failed.
+
+Instead of reading /status every 3 s, the tracker reads the queue entry of the mission it
+posted. Polls are spaced by the expected duration of the mission: while arrival is still
+far away it sleeps half of the remaining time (at most ``slow``), inside the arrival
+window it polls every ``fast`` seconds. Without an estimate it starts fast and backs off.
+Battery is read from /status only every ``status_every`` seconds.
+"""
+import time
+
+from vino.Mir.MiRClient import MiRError
+
+DONE = 'Done'
+FAILED_STATES = ('Aborted', 'Failed', 'Error')
+
+
+class MissionFailed(MiRError):
+    pass
+
+
+class MissionTracker:
+
+    def __init__(self, mir, fast=0.5, slow=5.0, window=0.2, status_every=10.0,
+                 sleep=time.sleep, report=print, smoothing=0.3):
+        """
+        :param mir: MiRClient
+        :param window: fraction of the expected duration before arrival where polling is fast
+        :param sleep: waits between polls, e.g. Entity.sleep so the host can cancel
+        :param report: callback(text) for progress and battery
+        :param smoothing: weight of the newest run in the expected duration estimate
+        """
+        self.mir = mir
+        self.fast = fast
+        self.slow = slow
+        self.window = window
+        self.status_every = status_every
+        self.sleep = sleep
+        self.report = report
+        self.smoothing = smoothing
+        self.expected = {}  # mission key -> estimated seconds
+        self.polls = 0
+
+    def interval(self, elapsed, expected, n):
+        if expected is None:
+            return min(self.slow, self.fast * 1.5 ** n)
+        arrival = expected * (1 - self.window)
+        if elapsed >= arrival:
+            return self.fast
+        return max(self.fast, min(self.slow, (arrival - elapsed) / 2))
+
+    def learn(self, key, seconds):
+        previous = self.expected.get(key)
+        if previous is None:
+            self.expected[key] = seconds
+        else:
+            self.expected[key] = previous + self.smoothing * (seconds - previous)
+
+    def track(self, entry_id, key=None, label=None):
+        """
+        Block until the mission_queue entry finishes.
+
+        :param key: mission identity used for the duration estimate, e.g. the mission id
+        :param label: name used in progress reports
+        :return: seconds the mission took
+        :raises MissionFailed: if the robot aborted or failed the mission
+        """
+        label = label or key or entry_id
+        expected = self.expected.get(key)
+        start = time.time()
+        last_status = None
+        n = 0
+        while True:
+            entry = self.mir.mission_queue_entry(entry_id)
+            self.polls += 1
+            state = entry.get('state')
+            elapsed = time.time() - start
+            if state == DONE:
+                self.learn(key, elapsed)
+                return elapsed
+            if state in FAILED_STATES:
+                raise MissionFailed(f'Mission {label} {state}: {entry.get("message", "")}')
+
+            now = time.time()
+            if last_status is None or now - last_status >= self.status_every:
+                last_status = now
+                battery = self.mir.status().get('battery_percentage')
+                self.polls += 1
+                eta = f'/~{expected:.0f}s' if expected else ''
+                battery = f'{float(battery):.0f}%' if battery is not None else 'unknown'
+                self.report(f'{label} {state} {elapsed:.0f}s{eta}, battery {battery}')
+            self.sleep(self.interval(elapsed, expected, n))
+            n += 1
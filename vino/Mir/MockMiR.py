@@ -0,0 +1,151 @@
+"""Local stand-in for the MiR250 REST API, enough for MiRClient and the MiR entity.
+
+Missions run one at a time from the queue and take ``mission_time`` seconds each.
+GET status reports state_text 'Executing' while one runs and 'Ready' otherwise, and the
+battery drains a little per mission. Run this file to serve on localhost:8080 and point
+the entity at MiRClient('127.0.0.1:8080').
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockMiR:
+
+    def __init__(self, host='127.0.0.1', port=0, mission_time=1.0, missions=None):
+        """
+        :param mission_time: seconds a mission executes, or dict mission_id -> seconds
+        :param missions: known mission ids, None accepts any
+        """
+        self.mission_time = mission_time
+        self.missions = missions
+        self.lock = threading.Lock()
+        self.queue = []  # mission_queue entries, oldest first
+        self.battery = 95.0
+        self.requests = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url = f'http://{host}:{self.port}/api/v2.0.0/'
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def duration(self, mission_id):
+        if isinstance(self.mission_time, dict):
+            return self.mission_time.get(mission_id, 1.0)
+        return self.mission_time
+
+    def _advance(self):
+        # move the queue forward to the current time, one mission at a time
+        now = time.time()
+        start = None
+        for entry in self.queue:
+            if entry['state'] in ('Done', 'Aborted'):
+                start = max(start or 0, entry['_finished'])
+                continue
+            if entry['state'] == 'Pending':
+                begin = max(entry['_queued'], start or entry['_queued'])
+                if begin > now:
+                    break
+                entry['state'] = 'Executing'
+                entry['started'] = begin
+            end = entry['started'] + self.duration(entry['mission_id'])
+            if end > now:
+                break
+            entry['state'] = 'Done'
+            entry['finished'] = entry['_finished'] = end
+            entry['message'] = 'Mission finished'
+            self.battery = max(0.0, self.battery - 0.5)
+            start = end
+
+    def status(self):
+        running = [entry for entry in self.queue if entry['state'] == 'Executing']
+        return {
+            'state_text': 'Executing' if running else 'Ready',
+            'mission_text': running[0]['message'] if running else 'Waiting for new missions...',
+            'battery_percentage': self.battery,
+            'mission_queue_id': running[0]['id'] if running else None,
+        }
+
+    @staticmethod
+    def public(entry):
+        return {key: value for key, value in entry.items() if not key.startswith('_')}
+
+    def handle(self, method, path, body):
+        with self.lock:
+            self.requests += 1
+            self._advance()
+            if method == 'GET' and path == 'status':
+                return 200, self.status()
+            if method == 'POST' and path == 'mission_queue':
+                mission_id = (body or {}).get('mission_id')
+                if self.missions is not None and mission_id not in self.missions:
+                    return 400, {'error_code': '400', 'error_human': f'Unknown mission {mission_id}'}
+                entry = {'id': len(self.queue) + 1, 'mission_id': mission_id, 'state': 'Pending',
+                         'message': 'Mission queued', 'started': None, 'finished': None,
+                         '_queued': time.time(), '_finished': None}
+                self.queue.append(entry)
+                self._advance()
+                return 201, self.public(entry)
+            match = re.fullmatch(r'mission_queue/(\d+)', path)
+            if method == 'GET' and match:
+                entry_id = int(match.group(1))
+                if not 0 < entry_id <= len(self.queue):
+                    return 404, {'error_code': '404', 'error_human': 'Not found'}
+                return 200, self.public(self.queue[entry_id - 1])
+            if method == 'DELETE' and path == 'mission_queue':
+                for entry in self.queue:
+                    if entry['state'] in ('Pending', 'Executing'):
+                        entry['state'] = 'Aborted'
+                        entry['message'] = 'Aborted by user'
+                        entry['finished'] = entry['_finished'] = time.time()
+                return 204, None
+            return 404, {'error_code': '404', 'error_human': f'No route {method} {path}'}
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the robot
+
+            def _respond(self, method):
+                path = self.path.split('/api/v2.0.0/', 1)[-1].strip('/')
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                code, reply = mock.handle(method, path, body)
+                payload = json.dumps(reply).encode() if reply is not None else b''
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+            def do_DELETE(self):
+                self._respond('DELETE')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    mock = MockMiR(port=8080, mission_time=10)
+    print(f'Mock MiR250 on {mock.url}, Ctrl+C to stop')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        mock.close()
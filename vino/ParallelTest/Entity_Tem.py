@@ -3,6 +3,8 @@ import time
 import zmq
 import multiprocessing
 
+from vino.Com import protocol
+
 
 def init(entity_name):
     print(f"{entity_name} Start")
@@ -27,24 +29,29 @@ def monitorHost(sub, pub, context, entity_name, entity_state):
 
     print(f"{entity_name} Ready")
     while True:
-        topic, cmd = sub.recv_multipart()
-        print(topic.decode(), cmd.decode())
-        cmd = cmd.decode()
+        msg = protocol.parse_command(sub.recv_multipart())
+        print(msg.entity, msg.cmd)
+        cmd = msg.cmd
+        pub.send_multipart(msg.reply(protocol.ACCEPTED))
         if cmd == '1':
             entity_state.value = 'Executing'
-            pub.send_string(entity_state.value)
-            time.sleep(3)
+            pub.send_multipart([entity_name.encode(), entity_state.value.encode()])
+            try:
+                time.sleep(3)
+                pub.send_multipart(msg.reply(protocol.COMPLETED, f'{entity_name} {cmd} Done'))
+            except Exception as e:
+                pub.send_multipart(msg.reply(protocol.ERROR, f'{entity_name} {cmd} Failed: {e}'))
             entity_state.value = 'Ready'
-            pub.send_string(entity_state.value)
+            pub.send_multipart([entity_name.encode(), entity_state.value.encode()])  # host 收到 Ready 后立即下发下一条指令
         elif cmd == 'Exit':
             time.sleep(2)
-            pub.send_string(f'{entity_name} Exit, Communication Close\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{entity_name} Exit, Communication Close'))
             pub.close()
             sub.close()
             context.term()
         else:
             print('Error! Plz rerun this file. Exit in 5 secs')
-            pub.send_string(f'{entity_name} Error in Host Command\n')
+            pub.send_multipart(msg.reply(protocol.ERROR, f'{entity_name} Error in Host Command'))
             time.sleep(5)
             sys.exit(1)
 
@@ -58,7 +65,7 @@ def pubState(sub, pub, entity_state):
         if sub is None or pub is None:
             break
         time.sleep(60)
-        pub.send_string(entity_state.value)
+        pub.send_multipart([entity_name.encode(), entity_state.value.encode()])
 
 
 if __name__ == '__main__':
@@ -1,10 +1,18 @@
 import zmq
-import time
 import tkinter as tk
 from tkinter import filedialog
 import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from vino.Com import protocol
+from vino.Com.entity import Entity
+from vino.Com.host import HostLink
+from vino.Com.workflow import Workflow, WorkflowError, WorkflowExecutor
 
 class HostApp:
+
+    REPLY_TIMEOUT = 3600  # 秒, 等待一条指令最终回复的上限, 超时视为该步骤失败
+
     def __init__(self, master):
         self.master = master
         self.master.title("Host Control Panel")
@@ -30,10 +38,10 @@ class HostApp:
         self.sub_socket.setsockopt_string(zmq.SUBSCRIBE, "")  # 订阅所有消息
 
         self.entity_states = {}  # 存储每个 entity 的状态
+        self.state_cond = threading.Condition()  # entity 状态变化时通知等待的线程
 
-        # 启动接收实体状态更新的线程
-        self.state_thread = threading.Thread(target=self.receive_entity_states)
-        self.state_thread.start()
+        # 启动接收实体状态更新的线程, 每条指令带 cmd_id, 回复按 cmd_id 匹配
+        self.link = HostLink(self.pub_socket, self.sub_socket, on_message=self.receive_entity_state)
 
     # 单独发送指令窗口
     def open_single_command_window(self):
@@ -45,6 +53,13 @@ class HostApp:
         entity_entry = tk.Entry(single_command_window, width=40)
         entity_entry.pack(pady=5)
 
+        def show_reply(future):
+            if future.cancelled():
+                return
+            reply = future.result()
+            output_text.insert(tk.END, f"{reply.entity}: {reply.detail} ({reply.status})\n")
+            output_text.see(tk.END)
+
         def send_specific_command():
             user_input = entity_entry.get()
             if ';' in user_input:
@@ -52,12 +67,19 @@ class HostApp:
                 entity = entity.strip()
                 cmd = cmd.strip()
 
+                if cmd.split(' ', 1)[0] in (Entity.STATUS, Entity.HEARTBEAT, Entity.CANCEL):
+                    # 查询/取消不必等待 entity 空闲, entity 执行动作时也会立即回复
+                    future = self.link.submit(entity, cmd)
+                    output_text.insert(tk.END, f"Sent command to {entity}: {cmd}\n")
+                    output_text.see(tk.END)
+                    future.add_done_callback(lambda f: self.master.after(0, show_reply, f))
                 # 检查 entity 状态
-                if self.entity_states.get(entity, 'Ready') == 'Ready':
+                elif self.is_ready(entity):
                     # 发送指令
-                    self.pub_socket.send_multipart([entity.encode(), cmd.encode()])
+                    future = self.dispatch(entity, cmd)
                     output_text.insert(tk.END, f"Sent command to {entity}: {cmd}\n")
                     output_text.see(tk.END)
+                    future.add_done_callback(lambda f: self.master.after(0, show_reply, f))
                 else:
                     output_text.insert(tk.END, f"{entity} is not ready. Current state: {self.entity_states.get(entity, 'Unknown')}\n")
                     output_text.see(tk.END)
@@ -83,51 +105,91 @@ class HostApp:
         def open_file():
             file_path = filedialog.askopenfilename(title="Select Command File", filetypes=(("Text Files", "*.txt"),))
             if file_path:
-                with open(file_path, 'r') as file:
-                    commands = [line.strip().split(';') for line in file.readlines()]
-                output_text.insert(tk.END, f"Loaded {len(commands)} commands from {file_path}\n")
+                try:
+                    workflow = Workflow.load(file_path)  # 旧的 entity;command 文件按顺序串联
+                except WorkflowError as e:
+                    output_text.insert(tk.END, f"Invalid command file: {e}\n")
+                    return
+                output_text.insert(tk.END, f"Loaded {len(workflow)} commands from {file_path}\n")
+
+                def log(msg):
+                    output_text.insert(tk.END, msg)
+                    output_text.see(tk.END)
 
-                start_button.config(state=tk.NORMAL)
+                def log_step(*args):
+                    self.master.after(0, log, ' '.join(str(arg) for arg in args))
+
+                def run_step(step):
+                    # 等待 entity 空闲, 发送指令, 再等待 entity 重新发布 Ready
+                    if not self.is_ready(step.entity):
+                        self.master.after(0, log, f"{step.entity} is working. Waiting...\n")
+                        self.wait_until_ready(step.entity)
+                    future = self.dispatch(step.entity, step.cmd)
+                    self.master.after(0, log, f"Broadcasted to {step.entity}: {step.cmd}\n")
+                    try:
+                        reply = future.result(self.REPLY_TIMEOUT)  # 等待与本条指令 cmd_id 对应的回复
+                    except FutureTimeout:
+                        self.link.discard(future)
+                        self.master.after(0, log, f"{step.entity} did not reply to {step.cmd} in {self.REPLY_TIMEOUT}s\n")
+                        return False
+                    self.master.after(0, log, f"{reply.detail} ({reply.status})\n")
+                    return reply.status == protocol.COMPLETED
 
                 def batch_send():
-                    for entity, cmd in commands:
-                        # 等待 entity 状态变为 Ready
-                        while self.entity_states.get(entity, 'Ready') != 'Ready':
-                            output_text.insert(tk.END, f"{entity} is working. Waiting...\n")
-                            output_text.see(tk.END)
-                            time.sleep(60)  # 等待 1 分钟再检查
-
-                        # 发送指令给 entity
-                        self.pub_socket.send_multipart([entity.encode(), cmd.encode()])
-                        output_text.insert(tk.END, f"Broadcasted to {entity}: {cmd}\n")
-                        output_text.see(tk.END)
-                        time.sleep(1)  # 模拟广播频率
-
-                    output_text.insert(tk.END, "Batch broadcasting completed.\n")
+                    # 没有依赖关系的 entity 并行执行
+                    WorkflowExecutor(workflow, run_step, inline=(), log=log_step).run()
+                    self.master.after(0, log, "Batch broadcasting completed.\n")
+
+                def start_batch():
+                    # 在后台线程中执行，避免等待时阻塞界面
                     start_button.config(state=tk.DISABLED)
+                    threading.Thread(target=batch_send, daemon=True).start()
 
-                start_button = tk.Button(batch_command_window, text="Start Broadcasting", state=tk.DISABLED, command=batch_send)
+                start_button = tk.Button(batch_command_window, text="Start Broadcasting", state=tk.NORMAL, command=start_batch)
                 start_button.pack(pady=5)
 
         open_button = tk.Button(batch_command_window, text="Open Command File", command=open_file)
         open_button.pack(pady=5)
 
-    # 监听并接收所有 entity 的状态更新
-    def receive_entity_states(self):
-        while True:
-            try:
-                entity, state = self.sub_socket.recv_multipart()
-                entity = entity.decode()
-                state = state.decode()
-                self.entity_states[entity] = state  # 更新 entity 的状态
-                print(f"Received {entity} state: {state}")  # 输出到控制台便于调试
-            except zmq.ZMQError as e:
-                print(f"Error receiving entity state: {e}")
-                break
+    # 监听并接收所有 entity 的状态更新 (在 HostLink 的接收线程中调用)
+    def receive_entity_state(self, msg):
+        if msg.entity is None or (msg.cmd or '').split(' ', 1)[0] in (Entity.STATUS, Entity.HEARTBEAT, Entity.CANCEL):
+            return  # 查询类指令不改变 entity 的状态
+        if msg.status in (protocol.ACCEPTED, protocol.PROGRESS):
+            state = 'Executing'
+        elif msg.is_final:
+            state = 'Ready'
+        else:
+            state = msg.detail  # entity 直接发布的状态, 如 Ready / Executing
+        with self.state_cond:
+            self.entity_states[msg.entity] = state  # 更新 entity 的状态
+            self.state_cond.notify_all()  # 唤醒等待该 entity 的线程
+        print(f"Received {msg.entity} state: {state}")  # 输出到控制台便于调试
+
+    def is_ready(self, entity):
+        with self.state_cond:
+            return self.entity_states.get(entity, 'Ready') == 'Ready'
+
+    def wait_until_ready(self, entity, timeout=None):
+        """
+        阻塞直到 entity 发布 Ready 状态
+        :return: True if the entity is ready, False on timeout
+        """
+        with self.state_cond:
+            return self.state_cond.wait_for(lambda: self.entity_states.get(entity, 'Ready') == 'Ready', timeout)
+
+    def dispatch(self, entity, cmd):
+        """
+        发送指令并将 entity 标记为 Dispatched，直到它再次发布 Ready
+        (避免下一条指令在 entity 切换到 Executing 之前就被发出)
+        :return: Future, 完成时返回该指令的最终回复
+        """
+        with self.state_cond:
+            self.entity_states[entity] = 'Dispatched'
+        return self.link.submit(entity, cmd)
 
     def on_closing(self):
-        self.pub_socket.close()
-        self.sub_socket.close()
+        self.link.close()
         self.context.term()
         self.master.destroy()
 
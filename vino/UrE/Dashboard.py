@@ -2,52 +2,115 @@
    to stop running and close the socket.
 """
 import socket
-import sys
 import logging
+import threading
 
 # Enter robot IP address here.
 host = '192.168.12.249'
 
 
 class Dashboard:
-    def __init__(self, robotIP):
+    """
+    Line based client for the UR dashboard server (port 29999).
+
+    Replies are read in chunks into a buffer and split on newlines, so a status poll is
+    one send and usually one recv. A lost or timed out connection is re-opened and the
+    command sent again, up to ``retries`` times, before ConnectionError is raised. Only
+    read-only queries (QUERIES) are sent twice: once a command like 'play' or 'load' may
+    have reached the robot, the connection is re-opened for the next call and
+    ConnectionError is raised instead of running it again.
+    The client is thread safe: one command (or one pipelined batch) at a time.
+    """
+
+    CHUNK = 4096
+    # dashboard commands that only read state, safe to repeat after a lost reply
+    QUERIES = ('programState', 'robotmode', 'safetymode', 'safetystatus', 'running',
+               'is in remote control', 'is program saved', 'get loaded program',
+               'get operational mode', 'get serial number', 'get robot model',
+               'get user role', 'PolyscopeVersion', 'version')
+
+    def __init__(self, robotIP, port=29999, timeout=5, retries=3):
         self.robotIP = robotIP
-        self.port = 29999
-        self.timeout = 5
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.sock = None
+        self.buffer = bytearray()
+        self.lock = threading.RLock()
         logging.getLogger().setLevel(logging.INFO)
 
     def connect(self):
-        self.sock.settimeout(self.timeout)
-        self.sock.connect((self.robotIP, self.port))
-        # Receive initial "Connected" Header
-        self.sock.recv(1096)
-
-    def sendAndReceive(self, command):
-        try:
-            self.sock.sendall((command + '\n').encode())
-            return self.get_reply()
-        except (ConnectionResetError, ConnectionAbortedError):
-            logging.warning('The connection was lost to the robot. Please connect and try running again.')
+        with self.lock:
             self.close()
-            sys.exit()
+            self.sock = socket.create_connection((self.robotIP, self.port), self.timeout)
+            # Receive initial "Connected" Header
+            return self.get_reply()
 
     def get_reply(self):
         """
         read one line from the socket
         :return: text until new line
         """
-        collected = b''
         while True:
-            part = self.sock.recv(1)
-            if part != b"\n":
-                collected += part
-            elif part == b"\n":
-                break
-        return collected.decode("utf-8")
+            end = self.buffer.find(b'\n')
+            if end >= 0:
+                line = self.buffer[:end]
+                del self.buffer[:end + 1]
+                return line.decode('utf-8').rstrip('\r')
+            part = self.sock.recv(self.CHUNK)
+            if not part:
+                raise ConnectionResetError('Dashboard server closed the connection')
+            self.buffer += part
+
+    @classmethod
+    def is_query(cls, command):
+        return command.strip().startswith(cls.QUERIES)
+
+    def _request(self, commands):
+        repeatable = all(self.is_query(command) for command in commands)
+        with self.lock:
+            for attempt in range(self.retries + 1):
+                sent = False
+                try:
+                    if self.sock is None:
+                        self.connect()
+                    sent = True  # from here on the robot may have run the commands
+                    self.sock.sendall(''.join(command + '\n' for command in commands).encode())
+                    return [self.get_reply() for _ in commands]
+                except OSError as e:  # reset, aborted, refused and socket.timeout
+                    self.close()
+                    if sent and not repeatable:
+                        self._reconnect()
+                        raise ConnectionError(f'Dashboard {self.robotIP}:{self.port} lost the reply to '
+                                              f'{list(commands)}, not sent again: {e}') from e
+                    if attempt == self.retries:
+                        raise ConnectionError(f'Dashboard {self.robotIP}:{self.port} unreachable: {e}') from e
+                    logging.warning(f'Dashboard connection lost ({e}), retry {attempt + 1}/{self.retries}')
+
+    def _reconnect(self):
+        """Open a fresh connection for the next command, a stale reply must not answer it."""
+        try:
+            self.connect()
+        except OSError as e:
+            self.close()
+            logging.warning(f'Dashboard reconnect failed ({e}), the next command will try again')
+
+    def sendAndReceive(self, command):
+        return self._request([command])[0]
+
+    def pipeline(self, *commands):
+        """
+        Send several commands in one write and read the replies in order.
+        :return: list of replies, one per command
+        """
+        return self._request(commands)
 
     def close(self):
-        self.sock.close()
+        with self.lock:
+            if self.sock is not None:
+                self.sock.close()
+                self.sock = None
+            self.buffer.clear()
 
 
 if __name__ == "__main__":
@@ -1,53 +1,19 @@
 # SDL in ANL Entity UR5e Version 1.0 by TDai
 
-import sys
 import time
-import zmq
-import os
-import socket
 import logging
 
+from vino.Com.entity import Entity, EntityError
+from vino.UrE.Dashboard import Dashboard
+from vino.UrE.RTDE import RTDEStream
+
 # UR5eIP default ip = '192.168.12.249'
 
-class UR5eRemote:
-    def __init__(self, robotIP):
-        self.robotIP = robotIP
-        self.port = 29999
-        self.timeout = 5
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        logging.getLogger().setLevel(logging.INFO)
-
-    def connect(self):
-        self.sock.settimeout(self.timeout)
-        self.sock.connect((self.robotIP, self.port))
-        self.sock.recv(1096)
-
-    def sendAndReceive(self, command):
-        try:
-            self.sock.sendall((command + '\n').encode())
-            return self.get_reply()
-        except (ConnectionResetError, ConnectionAbortedError):
-            logging.warning('The connection was lost to the robot. Please connect and try running again.')
-            self.close()
-            sys.exit()
-
-    def get_reply(self):
-        """
-        read one line from the socket
-        :return: text until new line
-        """
-        collected = b''
-        while True:
-            part = self.sock.recv(1)
-            if part != b"\n":
-                collected += part
-            elif part == b"\n":
-                break
-        return collected.decode("utf-8")
-    
-    def program_complete_check(self):
+class UR5eRemote(Dashboard):
+
+    def program_complete_check(self, sleep=time.sleep):
         while True:
-            time.sleep(3)
+            sleep(3)
             state = self.sendAndReceive('programState')
             
             if 'STOPPED' in state:
@@ -55,78 +21,71 @@ class UR5eRemote:
             else:
                 continue
 
-    def close(self):
-        self.sock.close()
 
+class EntityUR5e(Entity):
 
+    # command -> .urp program on the robot, edit the JSON file to add programs
+    table = 'UR5eCommands.json'
 
-def start_entity_UR5e(Entity_name, sub_addr, sub_port, pub_addr, pub_port, ur5e_ip):
-    print(f"{Entity_name} Start")
-
-    context = zmq.Context()
-    sub = context.socket(zmq.SUB)
-    pub = context.socket(zmq.PUB)
-    
-    ur5eremote = UR5eRemote(ur5e_ip)
-
-    try:
-        sub.connect(f"tcp://{sub_addr}:{sub_port}")
-        sub.setsockopt_string(zmq.SUBSCRIBE, Entity_name)
-        pub.bind(f"tcp://{pub_addr}:{pub_port}")
-        print(f"{Entity_name} Connected to the Host")
-        
-        ur5eremote.connect()
-        remoteCheck = ur5eremote.sendAndReceive('is in remote control')
+    def __init__(self, Entity_name, sub_addr, sub_port, pub_addr, pub_port, ur5e_ip, rtde_port=30004):
+        """
+        :param rtde_port: RTDE stream used to see programs finish, None polls programState instead
+        """
+        super().__init__(Entity_name, sub_addr, sub_port, pub_addr, pub_port)
+        self.ur5eremote = UR5eRemote(ur5e_ip)
+        self.rtde_port = rtde_port
+        self.stream = None
+
+    def setup(self):
+        self.ur5eremote.connect()
+        remoteCheck = self.ur5eremote.sendAndReceive('is in remote control')
         if 'false' in remoteCheck:
             logging.warning('Robot is in local mode. Some commands may not function.')
-        
-    except zmq.ZMQError as e:
-        sub.close()
-        pub.close()
-        context.term()
-        
-        ur5eremote.close()
-        
-        print(f"{Entity_name} Connection Fail: {e}")
-        return
-
-    while True:
-        topic, cmd = sub.recv_multipart()
-        print(topic.decode(), cmd.decode())
-        cmd = cmd.decode()
-        if cmd == 'TDai':
-            
-            ur5eremote.sendAndReceive('load TDai.urp')
-            time.sleep(2)
-            ur5eremote.sendAndReceive('play')
-            ur5eremote.program_complete_check()
-            time.sleep(1)
-            
-            pub.send_string(f'{Entity_name} Action TDai Completed\n')
-            print(f'{Entity_name} Action TDai Completed\n')
-        elif cmd == 'ToolChangeDemo':
-            ur5eremote.sendAndReceive('load TDaiToolChangeDemo.urp')
-            time.sleep(2)
-            ur5eremote.sendAndReceive('play')
-            ur5eremote.program_complete_check()
-            time.sleep(1)
-            
-            pub.send_string(f'{Entity_name} Action ToolChangeDemo Completed\n')
-            print(f'{Entity_name} Action ToolChangeDemo Completed\n')
-        elif cmd == 'LoadVial2ChemS':
-            ur5eremote.sendAndReceive('load TDaiLoadVial2ChemS.urp')
-            time.sleep(2)
-            ur5eremote.sendAndReceive('play')
-            ur5eremote.program_complete_check()
-            time.sleep(1)
-            
-            pub.send_string(f'{Entity_name} Action TDaiLoadVial2ChemS Completed\n')
-            print(f'{Entity_name} Action TDaiLoadVial2ChemS Completed\n')
-        else:
-            print('Error! Plz rerun this file. Exit in 3 secs')
-            pub.send_string(f'{Entity_name} Error in Host Command\n')
-            time.sleep(3)
-            sys.exit(1)
+        if self.rtde_port is not None:
+            stream = RTDEStream(self.ur5eremote.robotIP, self.rtde_port)
+            try:
+                stream.connect()
+                self.stream = stream
+            except (OSError, ValueError) as e:
+                stream.close()
+                logging.warning(f'RTDE unavailable ({e}), polling programState instead')
+
+    def teardown(self):
+        if self.stream is not None:
+            self.stream.close()
+        self.ur5eremote.close()
+
+    def wait_program(self, mark):
+        if self.stream is not None and self.stream.alive:
+            try:
+                while not self.stream.wait_stopped(mark, 0.5):
+                    self.sleep(0)  # raises Cancelled if the host cancelled
+                return
+            except ConnectionError:
+                logging.warning('RTDE stream lost, polling programState instead')
+        self.ur5eremote.program_complete_check(self.sleep)
+
+    def run_program(self, urp):
+        self.ur5eremote.sendAndReceive(f'load {urp}')
+        self.sleep(2)
+        mark = self.stream.mark() if self.stream is not None else None
+        reply = self.ur5eremote.sendAndReceive('play')
+        if not reply.startswith('Starting program'):
+            raise EntityError(f'{self.name} {urp}: {reply}')
+        self.wait_program(mark)
+        self.sleep(1)
+
+    def run_row(self, cmd, urp):
+        self.run_program(urp)
+        return f'{self.name} Action {cmd} Completed'
+
+    def on_cancel(self):
+        # the client serialises requests, so stop goes out between two programState polls
+        self.ur5eremote.sendAndReceive('stop')
+
+
+def start_entity_UR5e(Entity_name, sub_addr, sub_port, pub_addr, pub_port, ur5e_ip):
+    EntityUR5e(Entity_name, sub_addr, sub_port, pub_addr, pub_port, ur5e_ip).run()
 
 if __name__ == "__main__":
     Entity_name = "UR5e"
@@ -0,0 +1,297 @@
+"""Subscriber for the UR Real-Time Data Exchange (RTDE, port 30004).
+
+The robot pushes its state at up to 500 Hz, so the end of a program is seen within one
+frame instead of after the next 3 s programState poll. Frames are read with recv_into into
+one preallocated buffer and decoded with a precompiled struct, nothing is allocated per
+frame apart from the decoded numbers.
+
+RTDEReplayServer speaks the same handshake and replays recorded frames, so the subscriber
+and the UR5e entity can be exercised without a robot.
+"""
+import json
+import socket
+import struct
+import logging
+import threading
+import time
+
+# Enter robot IP address here.
+host = '192.168.12.249'
+
+PROTOCOL_VERSION = 2
+
+# message types
+REQUEST_PROTOCOL_VERSION = ord('V')
+CONTROL_PACKAGE_SETUP_OUTPUTS = ord('O')
+CONTROL_PACKAGE_START = ord('S')
+CONTROL_PACKAGE_PAUSE = ord('P')
+DATA_PACKAGE = ord('U')
+TEXT_MESSAGE = ord('M')
+
+# runtime_state values
+STOPPING, STOPPED, PLAYING, PAUSING, PAUSED, RESUMING = range(6)
+
+FORMATS = {
+    'BOOL': '?', 'UINT8': 'B', 'UINT32': 'I', 'UINT64': 'Q', 'INT32': 'i', 'DOUBLE': 'd',
+    'VECTOR3D': '3d', 'VECTOR6D': '6d', 'VECTOR6INT32': '6i', 'VECTOR6UINT32': '6I',
+}
+
+HEADER = struct.Struct('>HB')
+VARIABLES = ('timestamp', 'runtime_state', 'robot_mode', 'safety_mode')
+
+
+def _recv_exact(sock, view):
+    got = 0
+    while got < len(view):
+        n = sock.recv_into(view[got:])
+        if n == 0:
+            raise ConnectionResetError('RTDE server closed the connection')
+        got += n
+
+
+def _send(sock, msg_type, payload=b''):
+    sock.sendall(HEADER.pack(HEADER.size + len(payload), msg_type) + payload)
+
+
+def _data_struct(types):
+    return struct.Struct('>B' + ''.join(FORMATS[t] for t in types))
+
+
+class RTDEStream:
+    """
+    Background subscriber to the robot state stream.
+
+    ``stopped`` is an Event set while no program runs. For "wait until the program I just
+    started is over" take mark() before sending play and pass it to wait_stopped(); it
+    returns once the program has been seen stopping after the mark.
+    """
+
+    MAX_FRAME = 4096
+
+    def __init__(self, robotIP, port=30004, frequency=125, variables=VARIABLES, timeout=5):
+        self.robotIP = robotIP
+        self.port = port
+        self.frequency = frequency
+        self.variables = tuple(variables)
+        self.timeout = timeout
+        self.sock = None
+        self.recipe = None
+        self.data = None  # struct for the data package of our recipe
+        self.buffer = bytearray(self.MAX_FRAME)
+        self.view = memoryview(self.buffer)
+        self.state = dict.fromkeys(self.variables)
+        self.frames = 0
+        self.stops = 0  # number of times the runtime state entered STOPPED
+        self.stopped = threading.Event()
+        self.cond = threading.Condition()
+        self.alive = False
+        self._thread = None
+        self._recording = None
+
+    def _request(self, msg_type, payload=b''):
+        _send(self.sock, msg_type, payload)
+        while True:
+            size, reply_type = self._read_frame()
+            if reply_type == msg_type:
+                return self.view[HEADER.size:size]
+
+    def _read_frame(self):
+        _recv_exact(self.sock, self.view[:HEADER.size])
+        size, msg_type = HEADER.unpack_from(self.buffer)
+        if size > self.MAX_FRAME:
+            raise ValueError(f'RTDE frame of {size} bytes exceeds the buffer')
+        _recv_exact(self.sock, self.view[HEADER.size:size])
+        return size, msg_type
+
+    def connect(self):
+        self.sock = socket.create_connection((self.robotIP, self.port), self.timeout)
+        if not self._request(REQUEST_PROTOCOL_VERSION, struct.pack('>H', PROTOCOL_VERSION))[0]:
+            raise ConnectionError(f'RTDE protocol version {PROTOCOL_VERSION} refused')
+        reply = self._request(CONTROL_PACKAGE_SETUP_OUTPUTS,
+                              struct.pack('>d', self.frequency) + ','.join(self.variables).encode())
+        self.recipe = reply[0]
+        types = bytes(reply[1:]).decode().split(',')
+        if 'NOT_FOUND' in types:
+            raise ConnectionError(f'RTDE variables not available: {dict(zip(self.variables, types))}')
+        self.data = _data_struct(types)
+        if not self._request(CONTROL_PACKAGE_START)[0]:
+            raise ConnectionError('RTDE start refused')
+        self.sock.settimeout(None)
+        self.alive = True
+        self._thread = threading.Thread(target=self._receive, daemon=True)
+        self._thread.start()
+
+    def _update(self, values):
+        with self.cond:
+            state = self.state
+            previous = state.get('runtime_state')
+            for name, value in zip(self.variables, values):
+                state[name] = value
+            self.frames += 1
+            runtime_state = state.get('runtime_state')
+            if runtime_state == STOPPED:
+                if previous != STOPPED:
+                    self.stops += 1
+                    self.stopped.set()
+                    self.cond.notify_all()
+            elif runtime_state is not None:
+                self.stopped.clear()
+        if self._recording is not None:
+            self._recording.write(json.dumps(dict(zip(self.variables, values))) + '\n')
+
+    def _receive(self):
+        try:
+            while self.alive:
+                size, msg_type = self._read_frame()
+                if msg_type == DATA_PACKAGE and self.buffer[HEADER.size] == self.recipe:
+                    values = self.data.unpack_from(self.buffer, HEADER.size)[1:]
+                    self._update(values)
+                elif msg_type == TEXT_MESSAGE:
+                    logging.info(f'RTDE: {bytes(self.view[HEADER.size:size]).decode(errors="replace")}')
+        except (OSError, ValueError) as e:
+            if self.alive:
+                logging.warning(f'RTDE stream lost: {e}')
+        finally:
+            with self.cond:
+                self.alive = False
+                self.cond.notify_all()
+
+    def mark(self):
+        with self.cond:
+            return self.stops
+
+    def wait_stopped(self, mark, timeout=None):
+        """
+        :param mark: value of mark() taken before the program was started
+        :return: True once the program stopped after the mark, False on timeout
+        :raises ConnectionError: if the stream is lost while waiting
+        """
+        with self.cond:
+            done = self.cond.wait_for(lambda: self.stops > mark or not self.alive, timeout)
+            if self.stops > mark:
+                return True
+            if not self.alive:
+                raise ConnectionError('RTDE stream lost')
+            return done
+
+    def record(self, file_path):
+        """Append every decoded frame to file_path as one JSON object per line."""
+        self._recording = open(file_path, 'a')
+
+    def close(self):
+        self.alive = False
+        if self.sock is not None:
+            try:
+                _send(self.sock, CONTROL_PACKAGE_PAUSE)
+                self.sock.shutdown(socket.SHUT_RDWR)  # wakes the receive thread
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(1)
+            self._thread = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        if self._recording is not None:
+            self._recording.close()
+            self._recording = None
+
+
+class RTDEReplayServer:
+    """
+    Stand-in for the robot's RTDE server. After the usual handshake it sends the recorded
+    frames (dicts as written by RTDEStream.record) at the requested frequency, then keeps
+    repeating the last frame until the client disconnects.
+    """
+
+    TYPES = {'timestamp': 'DOUBLE', 'runtime_state': 'UINT32', 'robot_mode': 'INT32', 'safety_mode': 'INT32'}
+
+    def __init__(self, frames, host='127.0.0.1', port=0):
+        self.frames = list(frames)
+        self.server = socket.create_server((host, port))
+        self.port = self.server.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def load(cls, file_path, **kwargs):
+        with open(file_path, 'r') as file:
+            return cls([json.loads(line) for line in file if line.strip()], **kwargs)
+
+    @staticmethod
+    def program(seconds=1.0, frequency=125, idle=0.2):
+        """Frames of one program run: idle STOPPED, PLAYING for ``seconds``, then STOPPED."""
+        frames = []
+        for state, duration in ((STOPPED, idle), (PLAYING, seconds), (STOPPED, idle)):
+            for _ in range(max(1, int(duration * frequency))):
+                frames.append({'timestamp': len(frames) / frequency, 'runtime_state': state,
+                               'robot_mode': 7, 'safety_mode': 1})
+        return frames
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._session, args=(conn,), daemon=True).start()
+
+    def _session(self, conn):
+        buffer = bytearray(RTDEStream.MAX_FRAME)
+        view = memoryview(buffer)
+        frequency, data, variables = 125, None, ()
+        try:
+            with conn:
+                while True:
+                    _recv_exact(conn, view[:HEADER.size])
+                    size, msg_type = HEADER.unpack_from(buffer)
+                    _recv_exact(conn, view[HEADER.size:size])
+                    payload = bytes(view[HEADER.size:size])
+                    if msg_type == REQUEST_PROTOCOL_VERSION:
+                        _send(conn, msg_type, b'\x01')
+                    elif msg_type == CONTROL_PACKAGE_SETUP_OUTPUTS:
+                        frequency = struct.unpack_from('>d', payload)[0]
+                        variables = payload[8:].decode().split(',')
+                        types = [self.TYPES.get(name, 'NOT_FOUND') for name in variables]
+                        if 'NOT_FOUND' not in types:
+                            data = _data_struct(types)
+                        _send(conn, msg_type, b'\x01' + ','.join(types).encode())
+                    elif msg_type == CONTROL_PACKAGE_START:
+                        _send(conn, msg_type, b'\x01' if data else b'\x00')
+                        self._stream(conn, data, variables, frequency)
+                        return
+        except OSError:
+            return
+
+    def close(self):
+        try:
+            self.server.shutdown(socket.SHUT_RDWR)  # wakes the accept loop
+        except OSError:
+            pass
+        self.server.close()
+
+    def _stream(self, conn, data, variables, frequency):
+        period = 1 / frequency
+        frames = self.frames or [{'runtime_state': STOPPED}]
+        i = 0
+        while True:
+            frame = frames[min(i, len(frames) - 1)]
+            payload = data.pack(1, *(frame.get(name, 0) for name in variables))
+            _send(conn, DATA_PACKAGE, payload)
+            i += 1
+            time.sleep(period)
+
+
+if __name__ == "__main__":
+    stream = RTDEStream(host)
+    stream.connect()
+    stream.record('rtde_frames.jsonl')
+    logging.getLogger().setLevel(logging.INFO)
+    logging.info('Recording RTDE frames to rtde_frames.jsonl, Ctrl+C to stop')
+    try:
+        while True:
+            mark = stream.mark()
+            stream.wait_stopped(mark)
+            logging.info(f'Program stopped after {stream.frames} frames')
+    except KeyboardInterrupt:
+        stream.close()
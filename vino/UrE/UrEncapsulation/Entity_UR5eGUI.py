@@ -4,50 +4,18 @@ import PySimpleGUI as sg
 import sys
 import time
 import zmq
-import socket
 import logging
 
+from vino.Com import protocol
+from vino.UrE.Dashboard import Dashboard
+
 # UR5eIP default ip = '192.168.12.249'
 
-class UR5eRemote:
-    def __init__(self, robotIP):
-        self.robotIP = robotIP
-        self.port = 29999
-        self.timeout = 5
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        logging.getLogger().setLevel(logging.INFO)
-
-    def connect(self):
-        self.sock.settimeout(self.timeout)
-        self.sock.connect((self.robotIP, self.port))
-        self.sock.recv(1096)
-
-    def sendAndReceive(self, command):
-        try:
-            self.sock.sendall((command + '\n').encode())
-            return self.get_reply()
-        except (ConnectionResetError, ConnectionAbortedError):
-            logging.warning('The connection was lost to the robot. Please connect and try running again.')
-            self.close()
-            sys.exit()
+class UR5eRemote(Dashboard):
 
-    def get_reply(self):
-        """
-        read one line from the socket
-        :return: text until new line
-        """
-        collected = b''
-        while True:
-            part = self.sock.recv(1)
-            if part != b"\n":
-                collected += part
-            elif part == b"\n":
-                break
-        return collected.decode("utf-8")
-    
-    def program_complete_check(self):
+    def program_complete_check(self, sleep=time.sleep):
         while True:
-            time.sleep(3)
+            sleep(3)
             state = self.sendAndReceive('programState')
             
             if 'STOPPED' in state:
@@ -55,10 +23,6 @@ class UR5eRemote:
             else:
                 continue
 
-    def close(self):
-        self.sock.close()
-
-
 
 def configuration():
 
@@ -124,9 +88,10 @@ def start_entity_UR5e(Entity_name, sub_addr, sub_port, pub_addr, pub_port, ur5e_
         return
 
     while True:
-        topic, cmd = sub.recv_multipart()
-        print(topic.decode(), cmd.decode())
-        cmd = cmd.decode()
+        msg = protocol.parse_command(sub.recv_multipart())
+        print(msg.entity, msg.cmd)
+        cmd = msg.cmd
+        pub.send_multipart(msg.reply(protocol.ACCEPTED))
         if cmd == 'TDai':
             
             ur5eremote.sendAndReceive('load TDai.urp')
@@ -135,7 +100,7 @@ def start_entity_UR5e(Entity_name, sub_addr, sub_port, pub_addr, pub_port, ur5e_
             ur5eremote.program_complete_check()
             time.sleep(1)
             
-            pub.send_string(f'{Entity_name} Action TDai Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} Action TDai Completed'))
             print(f'{Entity_name} Action TDai Completed\n')
         elif cmd == 'ToolChangeDemo':
             ur5eremote.sendAndReceive('load TDaiToolChangeDemo.urp')
@@ -144,7 +109,7 @@ def start_entity_UR5e(Entity_name, sub_addr, sub_port, pub_addr, pub_port, ur5e_
             ur5eremote.program_complete_check()
             time.sleep(1)
             
-            pub.send_string(f'{Entity_name} Action ToolChangeDemo Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} Action ToolChangeDemo Completed'))
             print(f'{Entity_name} Action ToolChangeDemo Completed\n')
         elif cmd == 'LoadVial2ChemS':
             ur5eremote.sendAndReceive('load TDaiLoadVial2ChemS.urp')
@@ -153,11 +118,11 @@ def start_entity_UR5e(Entity_name, sub_addr, sub_port, pub_addr, pub_port, ur5e_
             ur5eremote.program_complete_check()
             time.sleep(1)
             
-            pub.send_string(f'{Entity_name} Action TDaiLoadVial2ChemS Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name} Action TDaiLoadVial2ChemS Completed'))
             print(f'{Entity_name} Action TDaiLoadVial2ChemS Completed\n')
             
         elif cmd == 'Exit':          
-            pub.send_string(f'{Entity_name}: Exit Completed\n')
+            pub.send_multipart(msg.reply(protocol.COMPLETED, f'{Entity_name}: Exit Completed'))
             print(f'{Entity_name} Exit Completed\n')
             
             sub.close()
@@ -169,7 +134,7 @@ def start_entity_UR5e(Entity_name, sub_addr, sub_port, pub_addr, pub_port, ur5e_
             
         else:
             print('Error! Plz rerun this file. Exit in 3 secs')
-            pub.send_string(f'{Entity_name} Error in Host Command\n')
+            pub.send_multipart(msg.reply(protocol.ERROR, f'{Entity_name} Error in Host Command'))
             time.sleep(3)
             sys.exit(1)
 